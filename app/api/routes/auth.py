@@ -1,6 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends
 from app.schemas.user import UserCreate, User, UserLogin, Token
 from app.services.auth_service import create_user, login_user
 from app.utils.dependencies import get_current_user
@@ -8,14 +6,14 @@ from app.utils.dependencies import get_current_user
 router = APIRouter()
 
 @router.post("/register", response_model=User)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate):
     """Register a new user"""
-    return create_user(db=db, user=user)
+    return await create_user(user=user)
 
 @router.post("/login", response_model=Token)
-def login(user_login: UserLogin, db: Session = Depends(get_db)):
+async def login(user_login: UserLogin):
     """Login user"""
-    return login_user(db=db, username=user_login.username, password=user_login.password)
+    return await login_user(username=user_login.username, password=user_login.password)
 
 @router.get("/me", response_model=User)
 def get_current_user_info(current_user: User = Depends(get_current_user)):
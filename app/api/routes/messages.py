@@ -0,0 +1,14 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+from app.services.message_service import get_message_page
+
+router = APIRouter()
+
+@router.get("/rooms/{room_id}/messages")
+async def get_room_messages(
+    room_id: str,
+    before: Optional[int] = Query(None, ge=1, description="Return messages with an id below this cursor"),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Page backwards through a room's message history"""
+    return await get_message_page(room_id, before, limit)
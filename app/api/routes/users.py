@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from app.schemas.user import User, UserUpdate
+from app.services.user_service import deactivate_user, update_user
+from app.utils.dependencies import get_current_user
+
+router = APIRouter()
+
+@router.get("/users/me", response_model=User)
+async def get_me(current_user: User = Depends(get_current_user)):
+    """Get the authenticated user, served from the user cache"""
+    return current_user
+
+@router.patch("/users/me", response_model=User)
+async def update_me(update: UserUpdate, current_user: User = Depends(get_current_user)):
+    """Change the authenticated user's name, email or password"""
+    return await update_user(current_user.id, update)
+
+@router.delete("/users/me", response_model=User)
+async def deactivate_me(current_user: User = Depends(get_current_user)):
+    """Deactivate the authenticated user's account"""
+    return await deactivate_user(current_user.id)
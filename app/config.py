@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -16,6 +16,95 @@ class Settings(BaseSettings):
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Verified WebSocket tokens kept to skip re-verification on reconnect
+    token_cache_size: int = 10_000
+    token_cache_ttl: float = 300.0
+    # Users resolved from tokens on REST requests; writes on this worker invalidate at once
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 60.0
+    # bcrypt runs on its own threads; beyond max_pending queued calls, requests get a 503
+    auth_hash_workers: int = 2
+    auth_hash_max_pending: int = 32
+    
+    # WebSocket
+    ws_send_timeout: float = 5.0
+    # Outbound queue per socket; policy is drop_oldest, drop_typing or disconnect
+    ws_queue_size: int = 256
+    ws_queue_policy: str = "drop_typing"
+    # Handlers registered as concurrent may run this many at once per socket
+    ws_max_concurrent_handlers: int = 4
+    # chat.msgpack.deflate frames smaller than this many bytes go uncompressed
+    ws_compression_min_size: int = 512
+    ws_compression_level: int = 6
+    # Transport-level permessage-deflate offered by the server (uvicorn)
+    ws_per_message_deflate: bool = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
+    # Heartbeat: sockets silent for ws_ping_interval seconds get a ping, and are
+    # closed after ws_idle_timeout; checked every ws_heartbeat_tick, at most
+    # ws_reap_batch closed per tick
+    ws_ping_interval: float = 30.0
+    ws_idle_timeout: float = 75.0
+    ws_heartbeat_tick: float = 1.0
+    ws_reap_batch: int = 500
+    # Graceful drain on SIGTERM: clients get a reconnect hint spread over
+    # ws_drain_window seconds; sockets close ws_drain_batch_size at a time,
+    # ws_drain_batch_interval seconds apart, once their queued frames are sent
+    # (waiting at most ws_drain_flush_timeout)
+    ws_drain_on_sigterm: bool = True
+    ws_drain_window: float = 10.0
+    ws_drain_batch_size: int = 200
+    ws_drain_batch_interval: float = 0.05
+    ws_drain_flush_timeout: float = 2.0
+    # Typing indicators: seconds between aggregated frames, repeat debounce, expiry
+    typing_tick_interval: float = 0.5
+    typing_debounce: float = 1.0
+    typing_timeout: float = 5.0
+    
+    # Inbound rate limits per message type: [tokens per second, burst]; "*" is the default
+    rate_limits_per_user: Dict[str, List[float]] = {
+        "send_message": [5, 10],
+        "typing": [5, 10],
+        "resume": [1, 3],
+        "*": [10, 20]
+    }
+    rate_limits_per_room: Dict[str, List[float]] = {
+        "send_message": [50, 100]
+    }
+    # "memory" (per process) or "redis" (shared by all workers)
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    rate_limit_max_keys: int = 100_000
+    
+    # Message history: ring buffer size per room, total messages kept across rooms
+    message_history_size: int = 200
+    message_history_budget: int = 100_000
+    # Most messages replayed per room on resume before asking the client to refetch
+    resume_max_gap: int = 500
+    
+    # Write-behind message persistence: rows per INSERT batch, seconds between flushes
+    persistence_batch_size: int = 500
+    persistence_flush_interval: float = 0.5
+    persistence_max_backlog: int = 100_000
+    # Failed writes of a batch before it is split and its failing rows dead-lettered
+    persistence_max_retries: int = 3
+    
+    # Presence: seconds between batched presence frames, how long a user must stay
+    # disconnected to go offline, seconds between bulk is_online/last_seen writes
+    presence_tick_interval: float = 1.0
+    presence_offline_debounce: float = 10.0
+    presence_persist_interval: float = 30.0
+    
+    # Repository for users, rooms, memberships and messages: "sql" or "memory"
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "sql")
+    # Seconds connecting users wait to share one membership query
+    membership_load_window: float = 0.01
+    # Seconds between writes of room joins and leaves
+    membership_flush_interval: float = 0.5
+    
+    # Cross-process broadcast backplane: "memory" (single process) or "redis"
+    backplane: str = os.getenv("BACKPLANE", "memory")
+    redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    # Connections per Redis command pool, seconds allowed to connect or get a reply
+    redis_pool_size: int = 4
+    redis_timeout: float = 1.0
     
     class Config:
         env_file = ".env"
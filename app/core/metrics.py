@@ -0,0 +1,242 @@
+"""Prometheus-style metrics with cheap, pre-bound label children.
+
+``labels(...)`` formats a child's label string once and caches the child,
+so hot paths bind their children up front and only ever call ``inc`` or
+``observe``: an attribute update, plus a bisect for histograms. Gauges
+backed by a function are read at scrape time and cost nothing in between.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Starlette appends the utf-8 charset to text responses
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds, from 50 us to 10 s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+# Recipients of one fan-out
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_string(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+
+def _braces(labels: str) -> str:
+    return "{" + labels + "}" if labels else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class CounterChild:
+    __slots__ = ("labels", "value")
+    
+    def __init__(self, labels: str):
+        self.labels = labels
+        self.value = 0
+    
+    def inc(self, amount: float = 1):
+        self.value += amount
+    
+    def samples(self, name: str) -> List[str]:
+        return [f"{name}_total{_braces(self.labels)} {_number(self.value)}"]
+
+class GaugeChild:
+    __slots__ = ("labels", "value", "function")
+    
+    def __init__(self, labels: str, function: Optional[Callable[[], float]] = None):
+        self.labels = labels
+        self.value = 0
+        self.function = function
+    
+    def set(self, value: float):
+        self.value = value
+    
+    def inc(self, amount: float = 1):
+        self.value += amount
+    
+    def dec(self, amount: float = 1):
+        self.value -= amount
+    
+    def samples(self, name: str) -> List[str]:
+        value = self.function() if self.function is not None else self.value
+        return [f"{name}{_braces(self.labels)} {_number(value)}"]
+
+class HistogramChild:
+    __slots__ = ("labels", "bounds", "counts", "sum")
+    
+    def __init__(self, labels: str, bounds: Tuple[float, ...]):
+        self.labels = labels
+        self.bounds = bounds
+        # Per-bucket counts, the last one for values above every bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+    
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+    
+    def samples(self, name: str) -> List[str]:
+        prefix = self.labels + "," if self.labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{_number(float(bound))}"}} {cumulative}')
+        lines.append(f"{name}_sum{_braces(self.labels)} {_number(self.sum)}")
+        lines.append(f"{name}_count{_braces(self.labels)} {cumulative}")
+        return lines
+
+class Metric:
+    """A metric family; without label names it is also its own only child"""
+    
+    type = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+    
+    def labels(self, *values):
+        """The child for these label values, created once and then reused"""
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self.children[values] = self._child(_label_string(self.labelnames, values))
+        return child
+    
+    def _child(self, labels: str):
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for child in list(self.children.values()):
+            lines.extend(child.samples(self.name))
+        return lines
+
+class Counter(Metric):
+    type = "counter"
+    
+    def _child(self, labels: str) -> CounterChild:
+        return CounterChild(labels)
+    
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+class Gauge(Metric):
+    type = "gauge"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None
+    ):
+        self.function = function
+        super().__init__(name, documentation, labelnames)
+    
+    def _child(self, labels: str) -> GaugeChild:
+        return GaugeChild(labels, self.function if not self.labelnames else None)
+    
+    def set(self, value: float):
+        self._default.set(value)
+
+class Histogram(Metric):
+    type = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+    
+    def _child(self, labels: str) -> HistogramChild:
+        return HistogramChild(labels, self.bounds)
+    
+    def observe(self, value: float):
+        self._default.observe(value)
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+    
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global metrics registry instance
+registry = Registry()
+
+# WebSocket pipeline
+FRAME_DECODE_SECONDS = registry.histogram(
+    "chat_ws_frame_decode_seconds", "Time to decode and validate an inbound frame", ["format"]
+)
+DISPATCH_SECONDS = registry.histogram(
+    "chat_ws_dispatch_seconds", "Time to run an inbound frame through the pipeline and its handler, by frame type", ["type"]
+)
+FANOUT_SECONDS = registry.histogram(
+    "chat_ws_fanout_seconds", "Time to queue one event for all of its local recipients"
+)
+FANOUT_RECIPIENTS = registry.histogram(
+    "chat_ws_fanout_recipients", "Local recipients of one fanned-out event", buckets=SIZE_BUCKETS
+)
+SEND_SECONDS = registry.histogram(
+    "chat_ws_send_seconds", "Time for one frame to be written to a socket", ["format"]
+)
+CONNECTS = registry.counter("chat_ws_connects", "WebSocket connections accepted")
+DISCONNECTS = registry.counter("chat_ws_disconnects", "WebSocket connections closed")
+SEND_FAILURES = registry.counter(
+    "chat_ws_send_failures", "Sockets dropped by their outbound queue", ["reason"]
+)
+ERROR_FRAMES = registry.counter("chat_ws_error_frames", "Error frames sent to clients")
+HEARTBEAT_PINGS = registry.counter("chat_ws_heartbeat_pings", "Pings sent to quiet WebSocket connections")
+REAPED_SOCKETS = registry.counter("chat_ws_reaped", "WebSocket connections closed for being idle")
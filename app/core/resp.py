@@ -0,0 +1,118 @@
+from typing import List, Tuple
+from urllib.parse import urlparse
+import asyncio
+
+def encode_command(*args: str) -> bytes:
+    """Encode a command as a RESP array of bulk strings"""
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg.encode()
+        parts.append(f"${len(data)}\r\n".encode())
+        parts.append(data)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+class RespError(ValueError):
+    """Error reply sent by the server"""
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Read one RESP reply; bulk strings are returned as bytes"""
+    line = await reader.readuntil(b"\r\n")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode()
+    if prefix == b"-":
+        raise RespError(body.decode())
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ValueError(f"Unexpected RESP reply: {line!r}")
+
+def parse_url(url: str) -> tuple:
+    """Split a redis:// URL into (host, port, password, db)"""
+    parsed = urlparse(url)
+    return (
+        parsed.hostname or "localhost",
+        parsed.port or 6379,
+        parsed.password,
+        int(parsed.path.lstrip("/") or 0)
+    )
+
+async def open_connection(host: str, port: int, password: str = None, db: int = 0):
+    """Open a Redis connection, authenticating and selecting the database"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        if password:
+            writer.write(encode_command("AUTH", password))
+            await read_reply(reader)
+        if db:
+            writer.write(encode_command("SELECT", str(db)))
+            await read_reply(reader)
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+class RedisPool:
+    """A few Redis connections shared by concurrent callers.
+    
+    Each command borrows an idle connection, opening one while fewer than
+    ``size`` are in use, so one slow round trip does not hold up the
+    others. Connecting and each round trip are bounded by ``timeout``. A
+    connection that failed, timed out or was cancelled is closed instead of
+    reused, since a late reply would otherwise answer the next command;
+    error replies (``RespError``) leave the connection usable.
+    """
+    
+    def __init__(self, url: str, size: int = 4, timeout: float = 1.0):
+        self.host, self.port, self.password, self.db = parse_url(url)
+        self.timeout = timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(size)
+    
+    async def execute(self, *args: str):
+        """Send one command and return its reply"""
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(
+                        open_connection(self.host, self.port, self.password, self.db), self.timeout
+                    )
+                reply = await asyncio.wait_for(self._round_trip(connection, encode_command(*args)), self.timeout)
+            except RespError:
+                if connection is not None:
+                    self._idle.append(connection)
+                raise
+            except BaseException:
+                if connection is not None:
+                    connection[1].close()
+                raise
+            self._idle.append(connection)
+            return reply
+    
+    async def _round_trip(self, connection, command: bytes):
+        reader, writer = connection
+        writer.write(command)
+        await writer.drain()
+        return await read_reply(reader)
+    
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
@@ -1,9 +1,15 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+import asyncio
 import os
+import time
+
+from app.config import get_settings
 
 # Get secret key from environment
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -12,6 +18,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+settings = get_settings()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -44,3 +51,94 @@ def verify_token(token: str) -> dict:
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, bounded thread pool.
+    
+    bcrypt costs hundreds of milliseconds of CPU per call and releases the
+    GIL while it works, so it belongs on threads of its own rather than on
+    the event loop or the default threadpool. At most ``max_pending``
+    calls may be running or waiting; past that, callers get an immediate
+    503 instead of joining an ever longer queue.
+    """
+    
+    def __init__(self, workers: int = 2, max_pending: int = 32):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+    
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+    
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+# Global password hasher instance
+password_hasher = PasswordHasher(settings.auth_hash_workers, settings.auth_hash_max_pending)
+
+class VerifiedTokenCache:
+    """Bounded LRU of tokens that already passed ``verify_token``.
+    
+    Reconnecting clients present the same token again and again; a hit
+    skips the HMAC check and JSON decoding. Entries live for ``ttl``
+    seconds and never past the token's own ``exp``. Failures are not
+    cached.
+    """
+    
+    def __init__(self, max_size: int = 10_000, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # token -> (claims, time the entry stops being trusted)
+        self.entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def verify(self, token: str) -> dict:
+        """Claims of a valid token; raises like ``verify_token`` otherwise"""
+        now = time.time()
+        entry = self.entries.get(token)
+        if entry is not None:
+            if entry[1] > now:
+                self.entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+            del self.entries[token]
+        
+        self.misses += 1
+        payload = verify_token(token)
+        expires = now + self.ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires = min(expires, payload["exp"])
+        self.entries[token] = (payload, expires)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return payload
+    
+    def get_stats(self) -> dict:
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -1,8 +1,9 @@
 from typing import Dict, List, Optional
 from datetime import datetime
-import json
 
 class SimpleUser:
+    __slots__ = ("id", "username", "email", "hashed_password", "is_active", "is_online", "last_seen", "created_at")
+    
     def __init__(self, id: int, username: str, email: str, hashed_password: str):
         self.id = id
         self.username = username
@@ -10,11 +11,24 @@ class SimpleUser:
         self.hashed_password = hashed_password
         self.is_active = True
         self.is_online = False
+        self.last_seen: Optional[datetime] = None
         self.created_at = datetime.utcnow()
 
 class SimpleRoom:
-    def __init__(self, id: int, name: str, description: str, created_by: int, is_private: bool = False):
+    __slots__ = ("id", "slug", "name", "description", "created_by", "is_private", "created_at")
+    
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        description: str,
+        created_by: Optional[int],
+        is_private: bool = False,
+        slug: Optional[str] = None
+    ):
         self.id = id
+        # Room id used on the WebSocket
+        self.slug = slug or name.lower().replace(" ", "_")
         self.name = name
         self.description = description
         self.created_by = created_by
@@ -22,6 +36,8 @@ class SimpleRoom:
         self.created_at = datetime.utcnow()
 
 class SimpleMessage:
+    __slots__ = ("id", "content", "sender_id", "room_id", "created_at")
+    
     def __init__(self, id: int, content: str, sender_id: int, room_id: int):
         self.id = id
         self.content = content
@@ -30,42 +46,117 @@ class SimpleMessage:
         self.created_at = datetime.utcnow()
 
 class InMemoryStorage:
+    """Dict-backed storage with secondary indexes for the common lookups.
+    
+    Usernames and emails are unique, as in the database, and are indexed;
+    public rooms are kept as an insertion-ordered id set. Indexes are
+    maintained by the create and delete methods, so records should not be
+    renamed in place.
+    """
+    
     def __init__(self):
         self.users: Dict[int, SimpleUser] = {}
         self.rooms: Dict[int, SimpleRoom] = {}
         self.messages: Dict[int, SimpleMessage] = {}
+        # Secondary indexes
+        self.users_by_username: Dict[str, int] = {}
+        self.users_by_email: Dict[str, int] = {}
+        self.rooms_by_slug: Dict[str, int] = {}
+        # Public room ids in creation order (dict used as an ordered set)
+        self.public_room_ids: Dict[int, None] = {}
         self.user_counter = 1
         self.room_counter = 1
         self.message_counter = 1
     
     # User methods
     def create_user(self, username: str, email: str, hashed_password: str) -> SimpleUser:
+        if username in self.users_by_username:
+            raise ValueError(f"Username already registered: {username}")
+        if email in self.users_by_email:
+            raise ValueError(f"Email already registered: {email}")
         user = SimpleUser(self.user_counter, username, email, hashed_password)
-        self.users[self.user_counter] = user
+        self.users[user.id] = user
+        self.users_by_username[username] = user.id
+        self.users_by_email[email] = user.id
         self.user_counter += 1
         return user
     
     def get_user_by_username(self, username: str) -> Optional[SimpleUser]:
-        for user in self.users.values():
-            if user.username == username:
-                return user
-        return None
+        user_id = self.users_by_username.get(username)
+        return self.users[user_id] if user_id is not None else None
+    
+    def get_user_by_email(self, email: str) -> Optional[SimpleUser]:
+        user_id = self.users_by_email.get(email)
+        return self.users[user_id] if user_id is not None else None
     
     def get_user_by_id(self, user_id: int) -> Optional[SimpleUser]:
         return self.users.get(user_id)
     
+    def update_user(self, user_id: int, **changes) -> Optional[SimpleUser]:
+        """Set user attributes, keeping the username and email indexes in step"""
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        username = changes.get("username", user.username)
+        email = changes.get("email", user.email)
+        if self.users_by_username.get(username, user_id) != user_id:
+            raise ValueError(f"Username already registered: {username}")
+        if self.users_by_email.get(email, user_id) != user_id:
+            raise ValueError(f"Email already registered: {email}")
+        
+        del self.users_by_username[user.username]
+        del self.users_by_email[user.email]
+        for name, value in changes.items():
+            setattr(user, name, value)
+        self.users_by_username[user.username] = user_id
+        self.users_by_email[user.email] = user_id
+        return user
+    
+    def delete_user(self, user_id: int) -> bool:
+        user = self.users.pop(user_id, None)
+        if user is None:
+            return False
+        del self.users_by_username[user.username]
+        del self.users_by_email[user.email]
+        return True
+    
     # Room methods
-    def create_room(self, name: str, description: str, created_by: int, is_private: bool = False) -> SimpleRoom:
-        room = SimpleRoom(self.room_counter, name, description, created_by, is_private)
-        self.rooms[self.room_counter] = room
+    def create_room(
+        self,
+        name: str,
+        description: str,
+        created_by: Optional[int],
+        is_private: bool = False,
+        slug: Optional[str] = None
+    ) -> SimpleRoom:
+        room = SimpleRoom(self.room_counter, name, description, created_by, is_private, slug)
+        if room.slug in self.rooms_by_slug:
+            raise ValueError(f"Room already exists: {room.slug}")
+        self.rooms[room.id] = room
+        self.rooms_by_slug[room.slug] = room.id
+        if not is_private:
+            self.public_room_ids[room.id] = None
         self.room_counter += 1
         return room
     
     def get_room_by_id(self, room_id: int) -> Optional[SimpleRoom]:
         return self.rooms.get(room_id)
     
+    def get_room_by_slug(self, slug: str) -> Optional[SimpleRoom]:
+        room_id = self.rooms_by_slug.get(slug)
+        return self.rooms[room_id] if room_id is not None else None
+    
+    def delete_room(self, room_id: int) -> bool:
+        room = self.rooms.pop(room_id, None)
+        if room is None:
+            return False
+        del self.rooms_by_slug[room.slug]
+        self.public_room_ids.pop(room_id, None)
+        return True
+    
     def get_public_rooms(self) -> List[SimpleRoom]:
-        return [room for room in self.rooms.values() if not room.is_private]
+        rooms = self.rooms
+        return [rooms[room_id] for room_id in self.public_room_ids]
 
 # Global storage instance
 storage = InMemoryStorage()
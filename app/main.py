@@ -1,21 +1,33 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
-import json
 import os
-from typing import Dict
 from datetime import datetime
-import hashlib
 
 from .config import get_settings
+from .api.routes import messages as messages_routes, users as users_routes
+from .services.message_service import message_store
+from .services.message_writer import message_writer
+from .services.room_service import membership_loader, membership_writer
+from .services.online_service import online_counter
+from .services.sequence_service import sequences
+from .core.database import async_engine, get_pool_stats
+from .core.metrics import CONTENT_TYPE, registry
+from .core.security import create_access_token, password_hasher
+from .repositories import DuplicateError, repository
+from .services.user_service import user_cache
+from .websocket.auth import POLICY_VIOLATION, authenticate, token_cache
 from .websocket.connection_manager import manager
-from .websocket.handlers.message_handler import (
-    handle_send_message, 
-    handle_join_room, 
-    handle_leave_room,
-    handle_typing_indicator
-)
+from .websocket.drain import SERVICE_RESTART, drain
+from .websocket.events import FrameContext, dispatcher
+from .websocket.middleware import frame_metrics, rate_limit, validate
+from .websocket.presence import presence
+from .websocket.rate_limiter import rate_limiter
+# Handler modules register themselves with the dispatcher on import
+from .websocket.handlers import heartbeat_handler, message_handler, room_handler  # noqa: F401
+from .websocket.handlers.typing_handler import typing_coalescer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,17 +35,76 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Inbound frame pipeline, outermost first
+dispatcher.use(frame_metrics)
+dispatcher.use(validate)
+dispatcher.use(rate_limit)
+
+# Gauges read at scrape time, so nothing on the hot path maintains them
+registry.gauge("chat_ws_connections", "Open WebSocket connections", function=lambda: len(manager.outbound))
+registry.gauge("chat_ws_users", "Users with at least one open connection", function=lambda: len(manager.active_connections))
+registry.gauge("chat_ws_rooms", "Rooms with at least one local member", function=lambda: len(manager.room_connections))
+registry.gauge(
+    "chat_ws_room_members", "Local room memberships across all rooms",
+    function=lambda: sum(len(users) for users in manager.room_connections.values())
+)
+registry.gauge(
+    "chat_ws_queued_frames", "Frames waiting in outbound queues",
+    function=lambda: sum(queue.depth for queue in manager.outbound.values())
+)
+registry.gauge(
+    "chat_ws_max_queue_depth", "Deepest outbound queue",
+    function=lambda: max((queue.depth for queue in manager.outbound.values()), default=0)
+)
+registry.gauge("chat_persistence_backlog", "Messages waiting to be persisted", function=lambda: message_writer.backlog)
+registry.gauge("chat_presence_online_users", "Users counted in as online from this worker", function=lambda: len(presence.online))
+registry.gauge("chat_ws_draining", "1 while this worker drains its WebSocket connections", function=lambda: int(drain.draining))
+
+# Rooms every deployment starts with: (id, name, description)
+DEFAULT_ROOMS = [
+    ("general", "General", "General chat room"),
+    ("random", "Random", "Random discussions"),
+]
+
+async def seed_rooms():
+    for slug, name, description in DEFAULT_ROOMS:
+        if await repository.get_room(slug) is None:
+            try:
+                await repository.create_room(slug, name, description)
+            except DuplicateError:
+                # Another worker seeded it first
+                pass
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     logger.info("Starting up Chat App...")
-    logger.info("Using in-memory storage for demo")
+    logger.info(f"Using {settings.storage_backend} storage")
+    await repository.start()
+    await seed_rooms()
+    await sequences.restore(await message_writer.start())
+    await manager.start()
+    membership_writer.start()
+    typing_coalescer.start()
+    presence.start()
+    if settings.ws_drain_on_sigterm and drain.handle_signals():
+        logger.info("SIGTERM drains WebSocket connections before shutdown")
     
     yield
     
-    # Shutdown
+    # Shutdown: hand remaining clients off, then flush what they sent
     logger.info("Shutting down Chat App...")
+    await drain.run()
+    await presence.stop()
+    await online_counter.stop()
+    await typing_coalescer.stop()
+    await manager.stop()
+    await membership_writer.stop()
+    await message_writer.stop()
+    await sequences.stop()
+    await repository.stop()
+    await async_engine.dispose()
 
 # Create FastAPI application
 app = FastAPI(
@@ -55,22 +126,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple in-memory storage
-users_db: Dict[str, dict] = {}
-rooms_db: Dict[str, dict] = {
-    "general": {
-        "id": "general",
-        "name": "General",
-        "description": "General chat room",
-        "created_at": datetime.utcnow().isoformat()
-    },
-    "random": {
-        "id": "random",
-        "name": "Random",
-        "description": "Random discussions",
-        "created_at": datetime.utcnow().isoformat()
+app.include_router(messages_routes.router, prefix=settings.api_v1_str, tags=["messages"])
+app.include_router(users_routes.router, prefix=settings.api_v1_str, tags=["users"])
+
+def room_to_dict(room) -> dict:
+    return {
+        "id": room.slug,
+        "name": room.name,
+        "description": room.description,
+        "created_at": room.created_at.isoformat() if room.created_at else None
     }
-}
 
 @app.get("/")
 async def root():
@@ -90,101 +155,144 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    return {
-        "status": "healthy", 
+    """Health check endpoint; 503 while draining so load balancers stop routing here"""
+    health = {
+        "status": "healthy" if not drain.draining else drain.state,
         "service": "chat-app",
         "active_connections": len(manager.active_connections),
-        "rooms": list(rooms_db.keys())
+        "outbound_queues": manager.get_queue_stats(),
+        "rate_limited_frames": rate_limiter.rejected,
+        "inbound_frames": frame_metrics.get_stats(),
+        "token_cache": token_cache.get_stats(),
+        "user_cache": user_cache.get_stats(),
+        "expired_sockets": manager.expired_sockets,
+        "heartbeat": manager.heartbeat.get_stats(),
+        "password_hashing": password_hasher.get_stats(),
+        "message_history": message_store.get_stats(),
+        "persistence": message_writer.get_stats(),
+        "membership_loads": membership_loader.get_stats(),
+        "membership_writes": membership_writer.get_stats(),
+        "presence": presence.get_stats(),
+        "database_pool": get_pool_stats(),
+        "drain": drain.get_stats(),
+        "rooms": [room.slug for room in await repository.list_public_rooms()]
     }
+    if drain.draining:
+        return JSONResponse(health, status_code=503)
+    return health
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
 
 # Authentication endpoints
 @app.post(f"{settings.api_v1_str}/auth/register")
 async def register(username: str, email: str, password: str):
-    if username in users_db:
+    if await repository.get_user_by_username(username) is not None:
         return {"error": "User already exists"}
     
-    users_db[username] = {
-        "id": len(users_db) + 1,
-        "username": username,
-        "email": email,
-        "password_hash": hashlib.sha256(password.encode()).hexdigest(),
-        "created_at": datetime.utcnow().isoformat()
-    }
-    return {"message": "User created successfully", "user_id": users_db[username]["id"]}
+    password_hash = await password_hasher.hash(password)
+    try:
+        user = await repository.create_user(username, email, password_hash)
+    except DuplicateError:
+        # Another registration took the name or email while we were hashing
+        return {"error": "User already exists"}
+    return {"message": "User created successfully", "user_id": user.id}
 
 @app.post(f"{settings.api_v1_str}/auth/login")
 async def login(username: str, password: str):
-    if username not in users_db:
+    user = await repository.get_user_by_username(username)
+    if user is None:
         return {"error": "User not found"}
     
-    password_hash = hashlib.sha256(password.encode()).hexdigest()
-    if users_db[username]["password_hash"] != password_hash:
+    if not await password_hasher.verify(password, user.hashed_password):
         return {"error": "Invalid password"}
     
-    return {"message": "Login successful", "token": f"fake-token-{username}", "user_id": username}
+    token = create_access_token(data={"sub": username})
+    return {"message": "Login successful", "token": token, "token_type": "bearer", "user_id": username}
 
 # Room endpoints
 @app.get(f"{settings.api_v1_str}/rooms")
 async def get_rooms():
-    return {"rooms": list(rooms_db.values())}
+    rooms = [room_to_dict(room) for room in await repository.list_public_rooms()]
+    # Buffered history has the newest messages; the rest come in one batch
+    last_messages = {}
+    for room in rooms:
+        recent = message_store.last(room["id"], 1)
+        if recent:
+            last_messages[room["id"]] = recent[0].to_dict()
+    unbuffered = [room["id"] for room in rooms if room["id"] not in last_messages]
+    if unbuffered:
+        last_messages.update(await repository.get_last_messages(unbuffered))
+    for room in rooms:
+        room["last_message"] = last_messages.get(room["id"])
+    return {"rooms": rooms}
 
 @app.post(f"{settings.api_v1_str}/rooms")
 async def create_room(name: str, description: str = ""):
     room_id = name.lower().replace(" ", "_")
-    if room_id in rooms_db:
+    try:
+        room = await repository.create_room(room_id, name, description)
+    except DuplicateError:
         return {"error": "Room already exists"}
-    
-    rooms_db[room_id] = {
-        "id": room_id,
-        "name": name,
-        "description": description,
-        "created_at": datetime.utcnow().isoformat()
-    }
-    return {"message": "Room created successfully", "room": rooms_db[room_id]}
+    return {"message": "Room created successfully", "room": room_to_dict(room)}
 
 @app.get(f"{settings.api_v1_str}/users")
 async def get_users():
-    return {"users": list(users_db.keys())}
+    return {"users": await repository.list_usernames()}
 
 # WebSocket endpoint
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    await manager.connect(websocket, user_id)
+    # A draining worker takes no new sockets; the client retries elsewhere
+    if drain.draining:
+        await websocket.close(code=SERVICE_RESTART)
+        return
+    
+    # The handshake must carry a JWT issued to this user
+    claims = authenticate(websocket, user_id)
+    if claims is None:
+        await websocket.close(code=POLICY_VIOLATION)
+        return
+    
+    # Clients pick a wire format by offering a subprotocol; JSON otherwise
+    fmt = await manager.connect(websocket, user_id, expires_at=claims.get("exp"))
+    tasks = set()
     
     try:
-        await websocket.send_text(json.dumps({
+        # Rejoin the rooms the user belongs to, batched with other connecting users
+        rooms = await membership_loader.load(user_id)
+        manager.restore_rooms(user_id, rooms)
+        
+        await manager.send_to_socket(websocket, {
             "type": "connected",
             "message": f"Welcome {user_id}! You are now connected.",
+            "rooms": sorted(rooms),
             "timestamp": datetime.utcnow().isoformat()
-        }))
+        })
         
         while True:
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
-            message_type = message_data.get("type")
+            # Text frames are JSON; binary frames use the negotiated format
+            event = await websocket.receive()
+            if event["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(event.get("code", 1000))
+            manager.heartbeat.touch(websocket)
+            data = event.get("text")
+            if data is None:
+                data = event.get("bytes") or b""
             
-            if message_type == "send_message":
-                await handle_send_message(websocket, user_id, message_data)
-            elif message_type == "join_room":
-                await handle_join_room(websocket, user_id, message_data)
-            elif message_type == "leave_room":
-                await handle_leave_room(websocket, user_id, message_data)
-            elif message_type == "typing":
-                await handle_typing_indicator(websocket, user_id, message_data)
-            else:
-                await websocket.send_text(json.dumps({
-                    "type": "error",
-                    "message": f"Unknown message type: {message_type}"
-                }))
+            await dispatcher.dispatch(FrameContext(websocket, user_id, fmt, data, tasks))
                 
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        manager.disconnect(user_id, websocket)
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {e}")
-        manager.disconnect(user_id)
+        manager.disconnect(user_id, websocket)
+    finally:
+        dispatcher.cancel(tasks)
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(app, host="0.0.0.0", port=port, ws_per_message_deflate=settings.ws_per_message_deflate)
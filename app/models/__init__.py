@@ -2,6 +2,7 @@ from app.core.database import Base
 from .base import BaseModel
 from .user import User
 from .room import Room
+from .room_member import RoomMember, MemberRole
 from .message import Message, MessageType
 
 __all__ = [
@@ -9,6 +10,8 @@ __all__ = [
     "BaseModel",
     "User", 
     "Room", 
+    "RoomMember",
+    "MemberRole",
     "Message", 
     "MessageType"
 ]
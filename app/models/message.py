@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, Enum, Index
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
 from .base import BaseModel
@@ -11,11 +11,18 @@ class MessageType(PyEnum):
 
 class Message(BaseModel):
     __tablename__ = "messages"
+    __table_args__ = (
+        # One message per sequence number; keyset pagination walks this index
+        Index("ix_messages_room_id_seq", "room_id", "seq", unique=True),
+    )
     
     content = Column(String(1000), nullable=False)
     message_type = Column(Enum(MessageType), default=MessageType.TEXT)
-    sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
+    # Chat identifiers as used on the WebSocket (user id and room slug)
+    sender_id = Column(String(50), nullable=False)
+    room_id = Column(String(100), nullable=False)
+    # Per-room sequence number, shown to clients as the message id
+    seq = Column(Integer, nullable=False)
     
     # Relationships will be added later
     # sender = relationship("User", back_populates="sent_messages")
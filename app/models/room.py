@@ -5,6 +5,8 @@ from .base import BaseModel
 class Room(BaseModel):
     __tablename__ = "rooms"
     
+    # Room id used on the WebSocket and in message rows
+    slug = Column(String(100), unique=True, index=True, nullable=False)
     name = Column(String(100), nullable=False)
     description = Column(String(500))
     is_private = Column(Boolean, default=False)
@@ -13,4 +15,4 @@ class Room(BaseModel):
     # Relationships will be added later
     # creator = relationship("User", foreign_keys=[created_by])
     # messages = relationship("Message", back_populates="room")
-    # members = relationship("RoomMember", back_populates="room")
+    members = relationship("RoomMember", back_populates="room", cascade="all, delete-orphan")
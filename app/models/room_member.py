@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Enum, DateTime, Index
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
 from .base import BaseModel
@@ -10,6 +10,10 @@ class MemberRole(PyEnum):
 
 class RoomMember(BaseModel):
     __tablename__ = "room_members"
+    __table_args__ = (
+        # One membership per user and room; also serves lookups by user
+        Index("ix_room_members_user_id_room_id", "user_id", "room_id", unique=True),
+    )
     
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     room_id = Column(Integer, ForeignKey("rooms.id"), nullable=False)
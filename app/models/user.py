@@ -14,4 +14,4 @@ class User(BaseModel):
     
     # Relationships will be added later
     # sent_messages = relationship("Message", back_populates="sender")
-    # room_memberships = relationship("RoomMember", back_populates="user")
+    room_memberships = relationship("RoomMember", back_populates="user", cascade="all, delete-orphan")
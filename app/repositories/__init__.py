@@ -0,0 +1,26 @@
+from app.config import get_settings
+from app.repositories.base import DuplicateError, Repository
+from app.repositories.memory import MemoryRepository
+from app.repositories.sql import SqlRepository
+
+settings = get_settings()
+
+def create_repository(kind: str) -> Repository:
+    """Build the repository named in settings ("sql" or "memory")"""
+    if kind == "sql":
+        return SqlRepository()
+    if kind == "memory":
+        return MemoryRepository()
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+__all__ = [
+    "DuplicateError",
+    "Repository",
+    "MemoryRepository",
+    "SqlRepository",
+    "create_repository",
+    "repository"
+]
+
+# Global repository instance
+repository = create_repository(settings.storage_backend)
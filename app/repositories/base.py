@@ -0,0 +1,129 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+class DuplicateError(ValueError):
+    """Raised when a username, email or room slug is already taken"""
+
+class Repository(ABC):
+    """Async storage for users, rooms, memberships and messages.
+    
+    Users are addressed by username and rooms by slug, the identifiers the
+    WebSocket protocol uses; ``get_user``/``update_user`` also accept the
+    numeric user id that REST schemas expose. User and room records carry
+    the attributes of ``app.models.User``/``app.models.Room``. Memberships
+    exist only between known users and rooms.
+    
+    Messages go in as rows with ``seq``, ``room_id``, ``sender_id``,
+    ``content`` and ``created_at`` (as queued by the message writer) and
+    come out as the dicts sent to clients, where ``id`` is the per-room
+    ``seq``. Every implementation must pass ``tests/test_repositories.py``.
+    
+    ``user_listeners`` are called with the username (the old one, after a
+    rename) of every user row an update writes, so caches of user rows can
+    drop their copy.
+    """
+    
+    def __init__(self):
+        self.user_listeners: List[Callable[[str], None]] = []
+    
+    def _users_changed(self, usernames: Iterable[str]):
+        for username in usernames:
+            for listener in self.user_listeners:
+                listener(username)
+    
+    async def start(self):
+        """Prepare the backend (create tables, open pools)"""
+    
+    async def stop(self):
+        """Release the backend's resources"""
+    
+    # Users
+    
+    @abstractmethod
+    async def create_user(self, username: str, email: str, hashed_password: str) -> Any:
+        """Create a user; raises DuplicateError if the username or email is taken"""
+    
+    @abstractmethod
+    async def get_user(self, user_id: int) -> Optional[Any]:
+        ...
+    
+    @abstractmethod
+    async def get_user_by_username(self, username: str) -> Optional[Any]:
+        ...
+    
+    @abstractmethod
+    async def update_user(self, user_id: int, **changes) -> Optional[Any]:
+        """Set the given user attributes; returns None for an unknown user"""
+    
+    @abstractmethod
+    async def list_usernames(self) -> List[str]:
+        """All usernames, oldest account first"""
+    
+    @abstractmethod
+    async def update_presence(self, presence: Mapping[str, Tuple[bool, datetime]]):
+        """Set ``is_online`` and ``last_seen`` of many users, by username, in one operation
+        
+        Unknown usernames are skipped.
+        """
+    
+    # Rooms
+    
+    @abstractmethod
+    async def create_room(
+        self,
+        slug: str,
+        name: str,
+        description: str = "",
+        is_private: bool = False,
+        created_by: Optional[int] = None
+    ) -> Any:
+        """Create a room; raises DuplicateError if the slug is taken"""
+    
+    @abstractmethod
+    async def get_room(self, slug: str) -> Optional[Any]:
+        ...
+    
+    @abstractmethod
+    async def list_public_rooms(self) -> List[Any]:
+        """Public rooms, oldest first"""
+    
+    # Memberships
+    
+    @abstractmethod
+    async def add_member(self, room_id: str, user_id: str) -> bool:
+        """Add a membership; False if it exists or the user or room is unknown"""
+    
+    @abstractmethod
+    async def remove_member(self, room_id: str, user_id: str) -> bool:
+        """Remove a membership; False if there was none"""
+    
+    @abstractmethod
+    async def get_members(self, room_id: str) -> Set[str]:
+        ...
+    
+    @abstractmethod
+    async def load_memberships(self, user_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        """Rooms of many users at once; users without rooms are left out"""
+    
+    # Messages
+    
+    @abstractmethod
+    async def add_messages(self, rows: Sequence[dict]):
+        """Store a batch of messages in one operation"""
+    
+    @abstractmethod
+    async def get_messages_before(self, room_id: str, before: Optional[int], limit: int) -> List[dict]:
+        """Up to ``limit`` newest messages with seq below ``before`` (any when None), oldest first"""
+    
+    @abstractmethod
+    async def get_messages_after(self, room_id: str, after: int, limit: int) -> List[dict]:
+        """Up to ``limit`` oldest messages with seq above ``after``, oldest first"""
+    
+    @abstractmethod
+    async def get_last_messages(self, room_ids: Iterable[str]) -> Dict[str, dict]:
+        """Newest message of each given room; rooms without messages are left out"""
+    
+    @abstractmethod
+    async def get_last_seqs(self) -> Dict[str, int]:
+        """Highest stored seq of every room"""
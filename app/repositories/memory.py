@@ -0,0 +1,172 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from app.core.simple_storage import InMemoryStorage, SimpleRoom, SimpleUser
+from app.repositories.base import DuplicateError, Repository
+
+def _message_dict(row: dict) -> dict:
+    created_at = row.get("created_at")
+    return {
+        "id": row["seq"],
+        "type": "message",
+        "content": row["content"],
+        "sender_id": row["sender_id"],
+        "room_id": row["room_id"],
+        "timestamp": created_at.isoformat() if created_at else None
+    }
+
+class MemoryRepository(Repository):
+    """Repository kept in process memory, for development and tests.
+    
+    Users and rooms live in an indexed ``InMemoryStorage``. Memberships are
+    indexed both ways and each room's messages are kept sorted by seq, so
+    every lookup is a dict access or a bisect. Nothing survives a restart.
+    """
+    
+    def __init__(self, storage: Optional[InMemoryStorage] = None):
+        super().__init__()
+        self.storage = storage or InMemoryStorage()
+        self.members: Dict[str, Set[str]] = {}
+        self.user_rooms: Dict[str, Set[str]] = {}
+        # room_id -> (seqs, messages), both in seq order
+        self.messages: Dict[str, Tuple[List[int], List[dict]]] = {}
+    
+    # Users
+    
+    async def create_user(self, username: str, email: str, hashed_password: str) -> SimpleUser:
+        try:
+            return self.storage.create_user(username, email, hashed_password)
+        except ValueError as e:
+            raise DuplicateError(str(e)) from None
+    
+    async def get_user(self, user_id: int) -> Optional[SimpleUser]:
+        return self.storage.get_user_by_id(user_id)
+    
+    async def get_user_by_username(self, username: str) -> Optional[SimpleUser]:
+        return self.storage.get_user_by_username(username)
+    
+    async def update_user(self, user_id: int, **changes) -> Optional[SimpleUser]:
+        user = self.storage.get_user_by_id(user_id)
+        old_username = user.username if user is not None else None
+        try:
+            user = self.storage.update_user(user_id, **changes)
+        except ValueError as e:
+            raise DuplicateError(str(e)) from None
+        if user is not None:
+            self._users_changed([old_username])
+            if user.username != old_username:
+                self._rename_member(old_username, user.username)
+        return user
+    
+    def _rename_member(self, old: str, new: str):
+        rooms = self.user_rooms.pop(old, None)
+        if rooms is None:
+            return
+        self.user_rooms[new] = rooms
+        for room_id in rooms:
+            members = self.members[room_id]
+            members.discard(old)
+            members.add(new)
+    
+    async def list_usernames(self) -> List[str]:
+        return list(self.storage.users_by_username)
+    
+    async def update_presence(self, presence: Mapping[str, Tuple[bool, datetime]]):
+        for username, (is_online, last_seen) in presence.items():
+            user = self.storage.get_user_by_username(username)
+            if user is not None:
+                user.is_online = is_online
+                user.last_seen = last_seen
+        self._users_changed(presence)
+    
+    # Rooms
+    
+    async def create_room(
+        self,
+        slug: str,
+        name: str,
+        description: str = "",
+        is_private: bool = False,
+        created_by: Optional[int] = None
+    ) -> SimpleRoom:
+        try:
+            return self.storage.create_room(name, description, created_by, is_private, slug)
+        except ValueError as e:
+            raise DuplicateError(str(e)) from None
+    
+    async def get_room(self, slug: str) -> Optional[SimpleRoom]:
+        return self.storage.get_room_by_slug(slug)
+    
+    async def list_public_rooms(self) -> List[SimpleRoom]:
+        return self.storage.get_public_rooms()
+    
+    # Memberships
+    
+    async def add_member(self, room_id: str, user_id: str) -> bool:
+        storage = self.storage
+        if user_id not in storage.users_by_username or room_id not in storage.rooms_by_slug:
+            return False
+        members = self.members.setdefault(room_id, set())
+        if user_id in members:
+            return False
+        members.add(user_id)
+        self.user_rooms.setdefault(user_id, set()).add(room_id)
+        return True
+    
+    async def remove_member(self, room_id: str, user_id: str) -> bool:
+        members = self.members.get(room_id)
+        if members is None or user_id not in members:
+            return False
+        members.discard(user_id)
+        if not members:
+            del self.members[room_id]
+        rooms = self.user_rooms[user_id]
+        rooms.discard(room_id)
+        if not rooms:
+            del self.user_rooms[user_id]
+        return True
+    
+    async def get_members(self, room_id: str) -> Set[str]:
+        return set(self.members.get(room_id, ()))
+    
+    async def load_memberships(self, user_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        user_rooms = self.user_rooms
+        return {user_id: set(user_rooms[user_id]) for user_id in user_ids if user_id in user_rooms}
+    
+    # Messages
+    
+    async def add_messages(self, rows: Sequence[dict]):
+        for row in rows:
+            seqs, messages = self.messages.setdefault(row["room_id"], ([], []))
+            seq = row["seq"]
+            if not seqs or seq >= seqs[-1]:
+                seqs.append(seq)
+                messages.append(_message_dict(row))
+            else:
+                index = bisect_right(seqs, seq)
+                seqs.insert(index, seq)
+                messages.insert(index, _message_dict(row))
+    
+    async def get_messages_before(self, room_id: str, before: Optional[int], limit: int) -> List[dict]:
+        entry = self.messages.get(room_id)
+        if entry is None:
+            return []
+        seqs, messages = entry
+        end = len(seqs) if before is None else bisect_left(seqs, before)
+        return messages[max(0, end - limit):end]
+    
+    async def get_messages_after(self, room_id: str, after: int, limit: int) -> List[dict]:
+        entry = self.messages.get(room_id)
+        if entry is None:
+            return []
+        seqs, messages = entry
+        start = bisect_right(seqs, after)
+        return messages[start:start + limit]
+    
+    async def get_last_messages(self, room_ids: Iterable[str]) -> Dict[str, dict]:
+        messages = self.messages
+        return {room_id: messages[room_id][1][-1] for room_id in room_ids if room_id in messages}
+    
+    async def get_last_seqs(self) -> Dict[str, int]:
+        return {room_id: seqs[-1] for room_id, (seqs, _) in self.messages.items()}
@@ -0,0 +1,265 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+import logging
+import os
+
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import bindparam, delete, func, insert, inspect, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from app.core.database import Base, async_engine
+from app.models import Message, Room, RoomMember, User
+from app.repositories.base import DuplicateError, Repository
+
+logger = logging.getLogger(__name__)
+
+# Alembic scripts at the repository root; their head describes the models
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "migrations")
+
+# Most values bound into one IN (...) list; SQLite allows 999 parameters per statement
+IN_CHUNK = 500
+
+def _chunks(values: Iterable[str]) -> Iterable[List[str]]:
+    values = list(dict.fromkeys(values))
+    for start in range(0, len(values), IN_CHUNK):
+        yield values[start:start + IN_CHUNK]
+
+def message_to_dict(row: Message) -> dict:
+    return {
+        "id": row.seq,
+        "type": "message",
+        "content": row.content,
+        "sender_id": row.sender_id,
+        "room_id": row.room_id,
+        "timestamp": row.created_at.isoformat() if row.created_at else None
+    }
+
+def _create_schema(connection):
+    """Build the tables of an empty database and stamp it with the head revision.
+    
+    A database that already has tables is left to ``alembic upgrade head``.
+    """
+    migrations = MigrationContext.configure(connection)
+    if inspect(connection).get_table_names():
+        if migrations.get_current_revision() is None:
+            logger.warning("Database has tables but no migration stamp; run `alembic stamp` with its revision")
+        return
+    Base.metadata.create_all(connection)
+    migrations.stamp(ScriptDirectory(MIGRATIONS), "head")
+
+class SqlRepository(Repository):
+    """Repository on the async SQLAlchemy engine.
+    
+    Each call runs in its own short session, so returned users and rooms
+    are detached snapshots. Batch operations are one statement per chunk
+    of ``IN_CHUNK`` keys: memberships are a single join, last messages a
+    join against the per-room max(seq), messages one executemany
+    INSERT and presence one executemany UPDATE.
+    """
+    
+    def __init__(self, engine: Optional[AsyncEngine] = None):
+        super().__init__()
+        self.engine = engine if engine is not None else async_engine
+        self.sessions = async_sessionmaker(self.engine, autoflush=False, expire_on_commit=False)
+    
+    async def start(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(_create_schema)
+    
+    # Users
+    
+    async def create_user(self, username: str, email: str, hashed_password: str) -> User:
+        async with self.sessions() as db:
+            user = User(username=username, email=email, hashed_password=hashed_password)
+            db.add(user)
+            try:
+                await db.commit()
+            except IntegrityError:
+                raise DuplicateError(f"Username or email already registered: {username}") from None
+            await db.refresh(user)
+            return user
+    
+    async def get_user(self, user_id: int) -> Optional[User]:
+        async with self.sessions() as db:
+            return await db.get(User, user_id)
+    
+    async def get_user_by_username(self, username: str) -> Optional[User]:
+        async with self.sessions() as db:
+            return await db.scalar(select(User).where(User.username == username))
+    
+    async def update_user(self, user_id: int, **changes) -> Optional[User]:
+        async with self.sessions() as db:
+            user = await db.get(User, user_id)
+            if user is None:
+                return None
+            old_username = user.username
+            for name, value in changes.items():
+                setattr(user, name, value)
+            try:
+                await db.commit()
+            except IntegrityError:
+                raise DuplicateError(f"Username or email already registered: {changes}") from None
+            self._users_changed([old_username])
+            await db.refresh(user)
+            return user
+    
+    async def list_usernames(self) -> List[str]:
+        async with self.sessions() as db:
+            return list(await db.scalars(select(User.username).order_by(User.id)))
+    
+    async def update_presence(self, presence: Mapping[str, Tuple[bool, datetime]]):
+        if not presence:
+            return
+        users = User.__table__
+        statement = (
+            update(users)
+            .where(users.c.username == bindparam("b_username"))
+            .values(is_online=bindparam("b_is_online"), last_seen=bindparam("b_last_seen"))
+        )
+        async with self.engine.begin() as conn:
+            await conn.execute(statement, [
+                {"b_username": username, "b_is_online": is_online, "b_last_seen": last_seen}
+                for username, (is_online, last_seen) in presence.items()
+            ])
+        self._users_changed(presence)
+    
+    # Rooms
+    
+    async def create_room(
+        self,
+        slug: str,
+        name: str,
+        description: str = "",
+        is_private: bool = False,
+        created_by: Optional[int] = None
+    ) -> Room:
+        async with self.sessions() as db:
+            room = Room(slug=slug, name=name, description=description, is_private=is_private, created_by=created_by)
+            db.add(room)
+            try:
+                await db.commit()
+            except IntegrityError:
+                raise DuplicateError(f"Room already exists: {slug}") from None
+            await db.refresh(room)
+            return room
+    
+    async def get_room(self, slug: str) -> Optional[Room]:
+        async with self.sessions() as db:
+            return await db.scalar(select(Room).where(Room.slug == slug))
+    
+    async def list_public_rooms(self) -> List[Room]:
+        async with self.sessions() as db:
+            return list(await db.scalars(select(Room).where(Room.is_private.is_(False)).order_by(Room.id)))
+    
+    # Memberships
+    
+    async def add_member(self, room_id: str, user_id: str) -> bool:
+        # One INSERT ... SELECT: no row for an unknown user or room, and an
+        # existing membership is skipped on the unique (user_id, room_id) index
+        rows = (
+            select(User.id, Room.id, func.now())
+            .join(Room, true())
+            .where(User.username == user_id, Room.slug == room_id)
+        )
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                self._insert_ignore(RoomMember).from_select(["user_id", "room_id", "joined_at"], rows)
+            )
+        return result.rowcount > 0
+    
+    def _insert_ignore(self, model):
+        """INSERT that skips rows conflicting with a unique index"""
+        dialect = self.engine.dialect.name
+        if dialect == "postgresql":
+            return postgresql.insert(model).on_conflict_do_nothing()
+        if dialect == "sqlite":
+            return sqlite.insert(model).on_conflict_do_nothing()
+        return insert(model).prefix_with("IGNORE")
+    
+    async def remove_member(self, room_id: str, user_id: str) -> bool:
+        async with self.sessions() as db:
+            result = await db.execute(
+                delete(RoomMember).where(
+                    RoomMember.user_id == select(User.id).where(User.username == user_id).scalar_subquery(),
+                    RoomMember.room_id == select(Room.id).where(Room.slug == room_id).scalar_subquery()
+                )
+            )
+            await db.commit()
+            return result.rowcount > 0
+    
+    async def get_members(self, room_id: str) -> Set[str]:
+        async with self.sessions() as db:
+            rows = await db.scalars(
+                select(User.username)
+                .join(RoomMember, RoomMember.user_id == User.id)
+                .join(Room, Room.id == RoomMember.room_id)
+                .where(Room.slug == room_id)
+            )
+            return set(rows)
+    
+    async def load_memberships(self, user_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        memberships: Dict[str, Set[str]] = {}
+        async with self.sessions() as db:
+            for chunk in _chunks(user_ids):
+                rows = await db.execute(
+                    select(User.username, Room.slug)
+                    .join(RoomMember, RoomMember.user_id == User.id)
+                    .join(Room, Room.id == RoomMember.room_id)
+                    .where(User.username.in_(chunk))
+                )
+                for username, slug in rows:
+                    memberships.setdefault(username, set()).add(slug)
+        return memberships
+    
+    # Messages
+    
+    async def add_messages(self, rows: Sequence[dict]):
+        if not rows:
+            return
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(Message.__table__), list(rows))
+    
+    async def get_messages_before(self, room_id: str, before: Optional[int], limit: int) -> List[dict]:
+        query = select(Message).where(Message.room_id == room_id)
+        if before is not None:
+            query = query.where(Message.seq < before)
+        async with self.sessions() as db:
+            rows = list(await db.scalars(query.order_by(Message.seq.desc()).limit(limit)))
+        return [message_to_dict(row) for row in reversed(rows)]
+    
+    async def get_messages_after(self, room_id: str, after: int, limit: int) -> List[dict]:
+        async with self.sessions() as db:
+            rows = await db.scalars(
+                select(Message)
+                .where(Message.room_id == room_id, Message.seq > after)
+                .order_by(Message.seq)
+                .limit(limit)
+            )
+            return [message_to_dict(row) for row in rows]
+    
+    async def get_last_messages(self, room_ids: Iterable[str]) -> Dict[str, dict]:
+        last: Dict[str, dict] = {}
+        async with self.sessions() as db:
+            for chunk in _chunks(room_ids):
+                newest = (
+                    select(Message.room_id, func.max(Message.seq).label("seq"))
+                    .where(Message.room_id.in_(chunk))
+                    .group_by(Message.room_id)
+                    .subquery()
+                )
+                rows = await db.scalars(
+                    select(Message).join(
+                        newest, (Message.room_id == newest.c.room_id) & (Message.seq == newest.c.seq)
+                    )
+                )
+                for row in rows:
+                    last[row.room_id] = message_to_dict(row)
+        return last
+    
+    async def get_last_seqs(self) -> Dict[str, int]:
+        async with self.sessions() as db:
+            rows = await db.execute(select(Message.room_id, func.max(Message.seq)).group_by(Message.room_id))
+            return {room_id: seq for room_id, seq in rows}
@@ -0,0 +1,88 @@
+from typing import Annotated, Dict, List, Optional, Union
+import msgspec
+
+# Identifiers and message bodies must not be empty, nor exceed their columns
+RoomId = Annotated[str, msgspec.Meta(min_length=1, max_length=100)]
+Content = Annotated[str, msgspec.Meta(min_length=1, max_length=1000)]
+MessageId = Annotated[int, msgspec.Meta(ge=0)]
+# Most rooms a client may rejoin with one resume frame
+MAX_RESUME_ROOMS = 100
+
+class Frame(msgspec.Struct, tag_field="type", omit_defaults=True):
+    """Base for WebSocket frames; the struct tag is the frame's ``type``"""
+
+# Inbound frames (client -> server)
+
+class SendMessage(Frame, tag="send_message"):
+    room_id: RoomId
+    content: Content
+
+class JoinRoom(Frame, tag="join_room"):
+    room_id: RoomId
+
+class LeaveRoom(Frame, tag="leave_room"):
+    room_id: RoomId
+
+class Typing(Frame, tag="typing"):
+    room_id: RoomId
+    is_typing: bool = False
+
+class Resume(Frame, tag="resume"):
+    # room_id -> last message id the client has seen, or None for a fresh join
+    rooms: Annotated[Dict[RoomId, Optional[MessageId]], msgspec.Meta(max_length=MAX_RESUME_ROOMS)]
+
+class Pong(Frame, tag="pong"):
+    pass
+
+InboundFrame = Union[SendMessage, JoinRoom, LeaveRoom, Typing, Resume, Pong]
+
+# Outbound frames (server -> client)
+
+class MessageFrame(Frame, tag="message"):
+    id: int
+    content: str
+    sender_id: str
+    room_id: str
+    timestamp: str
+
+class RoomJoined(Frame, tag="room_joined"):
+    room_id: str
+    # Already encoded MessageFrame payloads
+    recent_messages: List[msgspec.Raw]
+
+class RoomLeft(Frame, tag="room_left"):
+    room_id: str
+
+class TypingIndicator(Frame, tag="typing_indicator"):
+    room_id: str
+    user_ids: List[str]
+    timestamp: str
+
+class PresenceDiff(Frame, tag="presence"):
+    room_id: str
+    # Members who came online / went offline since the last diff
+    online: List[str]
+    offline: List[str]
+    timestamp: str
+
+class Ping(Frame, tag="ping"):
+    timestamp: str
+
+class Reconnect(Frame, tag="reconnect"):
+    reason: str
+    # Seconds to wait before reconnecting, spread across clients
+    retry_after: float
+
+class ErrorFrame(Frame, tag="error"):
+    message: str
+    code: Optional[str] = None
+
+class ResumedRoom(msgspec.Struct):
+    room_id: str
+    last_seq: int
+    gap_too_large: bool
+    # Already encoded MessageFrame payloads
+    messages: List[msgspec.Raw]
+
+class Resumed(Frame, tag="resumed"):
+    rooms: List[ResumedRoom]
@@ -1,46 +1,39 @@
-from sqlalchemy.orm import Session
-from app.models.user import User
+from app.repositories import DuplicateError, repository
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password, create_access_token
+from app.core.security import create_access_token, password_hasher
 from fastapi import HTTPException, status
 
-def create_user(db: Session, user: UserCreate):
+async def create_user(user: UserCreate):
     """Create a new user"""
     # Check if user already exists
-    db_user = db.query(User).filter(
-        (User.username == user.username) | (User.email == user.email)
-    ).first()
-    
-    if db_user:
+    if await repository.get_user_by_username(user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username or email already registered"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        username=user.username,
-        email=user.email,
-        hashed_password=hashed_password
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    # Create new user; the repository still rejects a name or email taken meanwhile
+    hashed_password = await password_hasher.hash(user.password)
+    try:
+        return await repository.create_user(user.username, user.email, hashed_password)
+    except DuplicateError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
 
-def authenticate_user(db: Session, username: str, password: str):
+async def authenticate_user(username: str, password: str):
     """Authenticate user and return user if valid"""
-    user = db.query(User).filter(User.username == username).first()
+    user = await repository.get_user_by_username(username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
     return user
 
-def login_user(db: Session, username: str, password: str):
+async def login_user(username: str, password: str):
     """Login user and return access token"""
-    user = authenticate_user(db, username, password)
+    user = await authenticate_user(username, password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,271 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+import msgspec
+
+from app.config import get_settings
+from app.repositories import repository
+from app.schemas.websocket import MessageFrame
+from app.websocket import codec
+
+settings = get_settings()
+
+class StoredMessage:
+    """Compact chat message record kept in a room's history buffer"""
+    
+    __slots__ = ("seq", "room_id", "sender_id", "content", "timestamp", "_encoded")
+    
+    def __init__(self, seq: int, room_id: str, sender_id: str, content: str, timestamp: str):
+        self.seq = seq
+        self.room_id = room_id
+        self.sender_id = sender_id
+        self.content = content
+        self.timestamp = timestamp
+        self._encoded: Optional[bytes] = None
+    
+    def to_dict(self) -> dict:
+        return {
+            "id": self.seq,
+            "type": "message",
+            "content": self.content,
+            "sender_id": self.sender_id,
+            "room_id": self.room_id,
+            "timestamp": self.timestamp
+        }
+    
+    def encode(self) -> bytes:
+        """JSON form of the message, serialized once and reused"""
+        if self._encoded is None:
+            self._encoded = codec.encode(MessageFrame(
+                id=self.seq,
+                content=self.content,
+                sender_id=self.sender_id,
+                room_id=self.room_id,
+                timestamp=self.timestamp
+            ))
+        return self._encoded
+
+class RoomHistory:
+    """Fixed-capacity ring buffer of one room's most recent messages.
+    
+    Sequence numbers are contiguous within the buffer, so appending and
+    locating any sequence number are O(1); reads cost only the slice.
+    Numbers come from a shared allocator and relayed messages may arrive
+    out of order: the one just before the oldest is put in front, and one
+    that leaves a gap restarts the buffer, leaving older messages to the
+    repository.
+    """
+    
+    __slots__ = ("capacity", "_slots", "_start", "_count")
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._slots: List[Optional[StoredMessage]] = [None] * capacity
+        self._start = 0
+        self._count = 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    @property
+    def first_seq(self) -> Optional[int]:
+        """Oldest sequence number still held, or None when empty"""
+        if not self._count:
+            return None
+        return self._slots[self._start].seq
+    
+    @property
+    def last_seq(self) -> Optional[int]:
+        if not self._count:
+            return None
+        return self._slots[(self._start + self._count - 1) % self.capacity].seq
+    
+    def add(self, message: StoredMessage) -> int:
+        """Buffer a message; returns the change in the number of messages held"""
+        if not self._count or message.seq > self.last_seq + 1:
+            held = self._count
+            self._slots[self._start] = message
+            self._count = 1
+            return 1 - held
+        if message.seq == self.last_seq + 1:
+            end = (self._start + self._count) % self.capacity
+            self._slots[end] = message
+            if self._count < self.capacity:
+                self._count += 1
+                return 1
+            self._start = (self._start + 1) % self.capacity
+            return 0
+        if message.seq == self.first_seq - 1 and self._count < self.capacity:
+            self._start = (self._start - 1) % self.capacity
+            self._slots[self._start] = message
+            self._count += 1
+            return 1
+        # Already held, or older than the buffer reaches
+        return 0
+    
+    def _range(self, offset: int, end: int = None) -> List[StoredMessage]:
+        """Messages from ``offset`` (0 = oldest held) up to ``end`` (default: all)"""
+        first = self._start + offset
+        last = self._start + (self._count if end is None else end)
+        if last <= self.capacity:
+            return self._slots[first:last]
+        if first >= self.capacity:
+            return self._slots[first - self.capacity:last - self.capacity]
+        return self._slots[first:] + self._slots[:last - self.capacity]
+    
+    def last(self, n: int) -> List[StoredMessage]:
+        """Up to ``n`` newest messages, oldest first"""
+        if n <= 0 or not self._count:
+            return []
+        return self._range(max(self._count - n, 0))
+    
+    def since(self, seq: int) -> List[StoredMessage]:
+        """Messages with a sequence number greater than ``seq``, oldest first.
+        
+        Callers should compare ``seq`` with ``first_seq`` to tell whether
+        older messages have already rolled out of the buffer.
+        """
+        if not self._count:
+            return []
+        offset = max(seq + 1 - self._slots[self._start].seq, 0)
+        if offset >= self._count:
+            return []
+        return self._range(offset)
+    
+    def before(self, seq: int, n: int) -> List[StoredMessage]:
+        """Up to ``n`` newest messages with a sequence number below ``seq``, oldest first"""
+        if n <= 0 or not self._count:
+            return []
+        end = min(seq - self._slots[self._start].seq, self._count)
+        if end <= 0:
+            return []
+        return self._range(max(end - n, 0), end)
+
+class MessageStore:
+    """Per-room message history with a global budget.
+    
+    Each room keeps at most ``room_capacity`` messages. When the total
+    across rooms exceeds ``max_messages``, the least recently used rooms are
+    evicted whole. Sequence numbers are allocated by the caller, see
+    ``app.services.sequence_service``.
+    """
+    
+    def __init__(self, room_capacity: int = None, max_messages: int = None):
+        self.room_capacity = room_capacity or settings.message_history_size
+        self.max_messages = max_messages or settings.message_history_budget
+        # room_id -> history, least recently used first
+        self.rooms: "OrderedDict[str, RoomHistory]" = OrderedDict()
+        self.total_messages = 0
+        self.evicted_rooms = 0
+    
+    def append(self, room_id: str, seq: int, sender_id: str, content: str, timestamp: str = None) -> StoredMessage:
+        """Store a new message under the sequence number allocated for it"""
+        message = StoredMessage(seq, room_id, sender_id, content, timestamp or datetime.utcnow().isoformat())
+        self.add(message)
+        return message
+    
+    def add_relayed(self, room_id: str, payload: str, seq: int):
+        """Store a message another worker accepted, reusing its encoding"""
+        frame = msgspec.json.decode(payload, type=MessageFrame)
+        message = StoredMessage(seq, room_id, frame.sender_id, frame.content, frame.timestamp)
+        message._encoded = payload.encode()
+        self.add(message)
+    
+    def add(self, message: StoredMessage):
+        """Buffer a message that already has its sequence number"""
+        history = self._touch(message.room_id)
+        if history is None:
+            history = self.rooms[message.room_id] = RoomHistory(self.room_capacity)
+        added = history.add(message)
+        self.total_messages += added
+        if added > 0:
+            self._enforce_budget(message.room_id)
+    
+    def last(self, room_id: str, n: int) -> List[StoredMessage]:
+        """Up to ``n`` newest messages of a room, oldest first"""
+        history = self._touch(room_id)
+        return history.last(n) if history is not None else []
+    
+    def since(self, room_id: str, seq: int) -> List[StoredMessage]:
+        """Buffered messages of a room newer than ``seq``, oldest first"""
+        history = self._touch(room_id)
+        return history.since(seq) if history is not None else []
+    
+    def get_history(self, room_id: str) -> Optional[RoomHistory]:
+        return self.rooms.get(room_id)
+    
+    def _touch(self, room_id: str) -> Optional[RoomHistory]:
+        history = self.rooms.get(room_id)
+        if history is not None:
+            self.rooms.move_to_end(room_id)
+        return history
+    
+    def _enforce_budget(self, keep_room: str):
+        while self.total_messages > self.max_messages and len(self.rooms) > 1:
+            room_id, history = next(iter(self.rooms.items()))
+            if room_id == keep_room:
+                break
+            del self.rooms[room_id]
+            self.total_messages -= len(history)
+            self.evicted_rooms += 1
+    
+    def get_stats(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "messages": self.total_messages,
+            "budget": self.max_messages,
+            "evicted_rooms": self.evicted_rooms
+        }
+
+# Global message store instance
+message_store = MessageStore()
+
+async def get_missed_messages(room_id: str, after: int, latest: int, max_gap: int) -> Optional[List[bytes]]:
+    """Encoded messages a client missed between ``after`` and ``latest``, oldest first.
+
+    Returns None when more than ``max_gap`` messages were missed, so the
+    caller can tell the client to refetch history instead. The ring buffer
+    answers what it holds; messages it lacks, older ones or ones this worker
+    never saw, come from the repository.
+    """
+    if after >= latest:
+        return []
+    if latest - after > max_gap:
+        return None
+
+    history = message_store.get_history(room_id)
+    buffered = history.since(after) if history is not None else []
+    if buffered and buffered[0].seq == after + 1 and buffered[-1].seq >= latest:
+        return [message.encode() for message in buffered]
+    encoded = {message.seq: message.encode() for message in buffered}
+    for message in await repository.get_messages_after(room_id, after, latest - after):
+        encoded.setdefault(message["id"], codec.encode(message))
+    return [encoded[seq] for seq in sorted(encoded)]
+
+async def get_message_page(room_id: str, before: Optional[int], limit: int) -> dict:
+    """One page of room history older than ``before`` (newest page when None).
+    
+    The in-memory ring answers whatever part of the page it still holds;
+    only the older remainder is read from the repository (on SQL, using
+    the (room_id, seq) index). ``next_cursor`` is passed back as ``before`` to
+    fetch the previous page and is None once the start is reached.
+    """
+    messages: List[dict] = []
+    history = message_store.get_history(room_id)
+    if history is not None and len(history):
+        cursor = before if before is not None else history.last_seq + 1
+        messages = [message.to_dict() for message in history.before(cursor, limit)]
+        if len(messages) < limit and cursor > history.first_seq:
+            # Everything below the ring comes from the repository
+            before = history.first_seq
+    
+    if len(messages) < limit and (before is None or before > 1):
+        older = await repository.get_messages_before(room_id, before, limit - len(messages))
+        messages = older + messages
+    
+    oldest = messages[0]["id"] if messages else None
+    return {
+        "room_id": room_id,
+        "messages": messages,
+        "next_cursor": oldest if oldest is not None and oldest > 1 else None
+    }
@@ -0,0 +1,169 @@
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+import asyncio
+import logging
+
+from app.config import get_settings
+from app.repositories import Repository, repository as default_repository
+from app.services.message_service import StoredMessage
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Dead-lettered rows kept in memory
+DEAD_LETTER_LIMIT = 1000
+
+class MessageWriter:
+    """Write-behind persistence for chat messages.
+    
+    ``enqueue`` only appends to an in-memory backlog, so the live message
+    path never waits on the database. A background task flushes the backlog
+    in batches of up to ``batch_size`` rows, either when a batch fills up or
+    every ``flush_interval`` seconds. Each batch is one ``add_messages``
+    call on the repository (an executemany INSERT on SQL), and batches are
+    written one at a time so they stay in order. A failed batch is retried
+    on the next flush; after ``max_retries`` failures it is split in halves
+    until the rows that fail on their own are found, and those are logged
+    and moved to ``dead_letters``. Past ``max_backlog`` the oldest pending
+    rows are dropped and counted.
+    """
+    
+    def __init__(
+        self,
+        repository: Optional[Repository] = None,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_backlog: int = None,
+        max_retries: int = None
+    ):
+        self.repository = repository if repository is not None else default_repository
+        self.batch_size = batch_size or settings.persistence_batch_size
+        self.flush_interval = flush_interval or settings.persistence_flush_interval
+        self.max_backlog = max_backlog or settings.persistence_max_backlog
+        self.max_retries = max_retries or settings.persistence_max_retries
+        self._pending: Deque[dict] = deque()
+        # Failed attempts at the batch at the front of the backlog
+        self._retries = 0
+        # Most recent rows that could not be written, kept for inspection
+        self.dead_letters: Deque[dict] = deque(maxlen=DEAD_LETTER_LIMIT)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+    
+    @property
+    def backlog(self) -> int:
+        return len(self._pending)
+    
+    async def start(self) -> Dict[str, int]:
+        """Start flushing.
+        
+        Returns the highest stored sequence number per room so the
+        sequence allocator can continue numbering where it left off.
+        """
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        last_seq = await self.repository.get_last_seqs()
+        self._task = asyncio.create_task(self._flush_loop())
+        return last_seq
+    
+    async def stop(self):
+        """Stop the background task and write everything still pending"""
+        if self._task is not None:
+            # Never cancel a batch mid-write; its rows are no longer pending
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    def enqueue(self, message: StoredMessage):
+        """Schedule a message for persistence without blocking"""
+        self._pending.append({
+            "seq": message.seq,
+            "room_id": message.room_id,
+            "sender_id": message.sender_id,
+            "content": message.content,
+            "created_at": datetime.fromisoformat(message.timestamp)
+        })
+        if len(self._pending) > self.max_backlog:
+            self._pending.popleft()
+            self.dropped += 1
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def flush(self):
+        """Write all pending messages now"""
+        while self._pending:
+            if not await self._write_batch():
+                break
+    
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    async def _write_batch(self) -> bool:
+        async with self._flush_lock:
+            count = min(len(self._pending), self.batch_size)
+            if not count:
+                return True
+            rows = [self._pending.popleft() for _ in range(count)]
+            try:
+                await self.repository.add_messages(rows)
+            except Exception as e:
+                self.failures += 1
+                self._retries += 1
+                logger.error(f"Failed to persist {len(rows)} messages (attempt {self._retries}): {e}")
+                if self._retries < self.max_retries:
+                    # Put the batch back in front and retry on the next tick
+                    self._pending.extendleft(reversed(rows))
+                    return False
+                middle = len(rows) // 2
+                count = await self._salvage(rows[:middle]) + await self._salvage(rows[middle:])
+            self._retries = 0
+            self.written += count
+            self.batches += 1
+            return True
+    
+    async def _salvage(self, rows: List[dict]) -> int:
+        """Write what can be written of a failing batch; returns the rows written"""
+        if not rows:
+            return 0
+        try:
+            await self.repository.add_messages(rows)
+            return len(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                row = rows[0]
+                self.dead_letters.append(row)
+                self.dead_lettered += 1
+                logger.error(f"Dead-lettered message {row['seq']} of room {row['room_id']}: {e}")
+                return 0
+        middle = len(rows) // 2
+        return await self._salvage(rows[:middle]) + await self._salvage(rows[middle:])
+    
+    def get_stats(self) -> dict:
+        return {
+            "backlog": self.backlog,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "dead_lettered": self.dead_lettered
+        }
+
+# Global message writer instance
+message_writer = MessageWriter()
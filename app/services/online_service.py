@@ -0,0 +1,103 @@
+from abc import ABC, abstractmethod
+from typing import Dict
+import hashlib
+
+from app.config import get_settings
+from app.core.resp import RedisPool, RespError
+
+settings = get_settings()
+
+class OnlineCounter(ABC):
+    """Counts, per user, the workers that hold at least one of its sockets.
+    
+    A worker counts a user in when its first local socket is announced and
+    out when its last one has gone. The user is online while the count is
+    above zero, so only the 0 -> 1 and 1 -> 0 changes are announced, by
+    whichever worker makes them.
+    """
+    
+    @abstractmethod
+    async def connected(self, user_id: str) -> int:
+        """Count a worker in; returns the new count"""
+    
+    @abstractmethod
+    async def disconnected(self, user_id: str) -> int:
+        """Count a worker out; returns the new count"""
+    
+    async def stop(self):
+        """Release the counter's resources"""
+
+class LocalOnlineCounter(OnlineCounter):
+    """Counts held in this process, for a single worker"""
+    
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+    
+    async def connected(self, user_id: str) -> int:
+        count = self.counts[user_id] = self.counts.get(user_id, 0) + 1
+        return count
+    
+    async def disconnected(self, user_id: str) -> int:
+        count = self.counts.get(user_id, 0) - 1
+        if count > 0:
+            self.counts[user_id] = count
+        else:
+            self.counts.pop(user_id, None)
+        return max(count, 0)
+
+class RedisOnlineCounter(OnlineCounter):
+    """One Redis counter per user (``<prefix>:<user_id>``), shared by all workers.
+    
+    INCR and the decrement script are atomic, so two workers never both see
+    themselves as the first or the last. The count never drops below zero,
+    so a worker counting out a user it failed to count in cannot hide that
+    user's next connect. A worker that dies without shutting down leaves
+    its users counted in.
+    """
+    
+    # The key stays at zero: deleting it could race with another worker's INCR
+    SCRIPT = """
+local count = redis.call('DECR', KEYS[1])
+if count < 0 then
+    redis.call('SET', KEYS[1], 0)
+    count = 0
+end
+return count
+"""
+    
+    def __init__(self, url: str, prefix: str = "chat:online", timeout: float = None, pool_size: int = None):
+        self.prefix = prefix
+        self.sha = hashlib.sha1(self.SCRIPT.encode()).hexdigest()
+        self.pool = RedisPool(
+            url,
+            pool_size if pool_size is not None else settings.redis_pool_size,
+            timeout if timeout is not None else settings.redis_timeout
+        )
+    
+    def _key(self, user_id: str) -> str:
+        return f"{self.prefix}:{user_id}"
+    
+    async def connected(self, user_id: str) -> int:
+        return await self.pool.execute("INCR", self._key(user_id))
+    
+    async def disconnected(self, user_id: str) -> int:
+        try:
+            return await self.pool.execute("EVALSHA", self.sha, "1", self._key(user_id))
+        except RespError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+            return await self.pool.execute("EVAL", self.SCRIPT, "1", self._key(user_id))
+    
+    async def stop(self):
+        await self.pool.close()
+
+def create_online_counter(kind: str, url: str = "") -> OnlineCounter:
+    """Counter matching the backplane: shared through Redis, or local to one worker"""
+    if kind == "memory":
+        return LocalOnlineCounter()
+    if kind == "redis":
+        return RedisOnlineCounter(url)
+    raise ValueError(f"Unknown backplane: {kind}")
+
+# Global online counter instance
+online_counter = create_online_counter(settings.backplane, settings.redis_url)
@@ -0,0 +1,137 @@
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from app.config import get_settings
+from app.repositories import Repository, repository as default_repository
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class MembershipLoader:
+    """Restores persisted room memberships for connecting users in batches.
+    
+    Users who connect within ``window`` seconds of each other share one
+    ``load_memberships`` call, so a reconnect storm after a deploy costs a
+    few queries instead of one per socket. If the load fails the users get
+    no rooms back rather than a failed connection.
+    """
+    
+    def __init__(self, repository: Optional[Repository] = None, window: float = None):
+        self.repository = repository if repository is not None else default_repository
+        self.window = window if window is not None else settings.membership_load_window
+        # user_id -> futures of the sockets waiting for that user's rooms
+        self._waiting: Dict[str, List[asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loads: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.users = 0
+        self.failures = 0
+    
+    async def load(self, user_id: str) -> Set[str]:
+        """Rooms the user is a member of"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.setdefault(user_id, []).append(future)
+        if self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+    
+    def _flush(self):
+        self._timer = None
+        waiting, self._waiting = self._waiting, {}
+        task = asyncio.create_task(self._load(waiting))
+        self._loads.add(task)
+        task.add_done_callback(self._loads.discard)
+    
+    async def _load(self, waiting: Dict[str, List[asyncio.Future]]):
+        try:
+            memberships = await self.repository.load_memberships(list(waiting))
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Failed to load room memberships for {len(waiting)} users: {e}")
+            memberships = {}
+        self.batches += 1
+        self.users += len(waiting)
+        for user_id, futures in waiting.items():
+            rooms = memberships.get(user_id, set())
+            for future in futures:
+                if not future.done():
+                    future.set_result(set(rooms))
+    
+    def get_stats(self) -> dict:
+        return {"batches": self.batches, "users": self.users, "failures": self.failures}
+
+class MembershipWriter:
+    """Write-behind for room joins and leaves.
+    
+    Handlers record the change and move on, so a join or leave never waits
+    on the database. Every ``flush_interval`` seconds the latest change of
+    each (room, user) pair is written in the order the changes were made;
+    a join followed by a leave costs a single write. A failed write is
+    retried on the next flush unless a newer change replaced it.
+    """
+    
+    def __init__(self, repository: Optional[Repository] = None, flush_interval: float = None):
+        self.repository = repository if repository is not None else default_repository
+        self.flush_interval = flush_interval or settings.membership_flush_interval
+        # (room_id, user_id) -> member or not, oldest change first
+        self.pending: Dict[Tuple[str, str], bool] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failures = 0
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background task and write everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    def add(self, room_id: str, user_id: str):
+        self._record(room_id, user_id, True)
+    
+    def remove(self, room_id: str, user_id: str):
+        self._record(room_id, user_id, False)
+    
+    def _record(self, room_id: str, user_id: str, member: bool):
+        # Re-inserted so the pair moves behind changes made before it
+        self.pending.pop((room_id, user_id), None)
+        self.pending[(room_id, user_id)] = member
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def flush(self):
+        """Write the pending changes now"""
+        batch, self.pending = self.pending, {}
+        for (room_id, user_id), member in batch.items():
+            try:
+                if member:
+                    await self.repository.add_member(room_id, user_id)
+                else:
+                    await self.repository.remove_member(room_id, user_id)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Failed to persist membership of {user_id} in {room_id}: {e}")
+                self.pending.setdefault((room_id, user_id), member)
+                continue
+            self.written += 1
+    
+    def get_stats(self) -> dict:
+        return {"pending": len(self.pending), "written": self.written, "failures": self.failures}
+
+# Global membership loader instance
+membership_loader = MembershipLoader()
+# Global membership writer instance
+membership_writer = MembershipWriter()
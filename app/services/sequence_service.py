@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.core.resp import RedisPool
+
+settings = get_settings()
+
+class SequenceAllocator(ABC):
+    """Hands out per-room message sequence numbers, the ids clients see.
+    
+    Every worker that accepts messages for a room must draw from the same
+    allocator, otherwise two workers hand out the same number.
+    """
+    
+    @abstractmethod
+    async def next(self, room_id: str) -> int:
+        """Allocate the next sequence number of a room"""
+    
+    @abstractmethod
+    async def current(self, room_id: str) -> int:
+        """Last sequence number allocated in a room, 0 if none"""
+    
+    @abstractmethod
+    async def restore(self, last_seq: Dict[str, int]):
+        """Continue numbering after sequence numbers persisted earlier"""
+    
+    async def stop(self):
+        """Release the allocator's resources"""
+
+class LocalSequences(SequenceAllocator):
+    """Counters held in this process, for a single worker"""
+    
+    def __init__(self):
+        self.last_seq: Dict[str, int] = {}
+    
+    async def next(self, room_id: str) -> int:
+        seq = self.last_seq[room_id] = self.last_seq.get(room_id, 0) + 1
+        return seq
+    
+    async def current(self, room_id: str) -> int:
+        return self.last_seq.get(room_id, 0)
+    
+    async def restore(self, last_seq: Dict[str, int]):
+        for room_id, seq in last_seq.items():
+            if seq > self.last_seq.get(room_id, 0):
+                self.last_seq[room_id] = seq
+
+class RedisSequences(SequenceAllocator):
+    """One Redis counter per room (``<prefix>:<room_id>``), shared by all workers.
+    
+    INCR is atomic, so concurrent workers never hand out the same number.
+    On startup counters missing from Redis are seeded from the database;
+    existing ones are already ahead of anything persisted and left alone.
+    """
+    
+    def __init__(self, url: str, prefix: str = "chat:seq", timeout: float = None, pool_size: int = None):
+        self.prefix = prefix
+        self.pool = RedisPool(
+            url,
+            pool_size if pool_size is not None else settings.redis_pool_size,
+            timeout if timeout is not None else settings.redis_timeout
+        )
+    
+    def _key(self, room_id: str) -> str:
+        return f"{self.prefix}:{room_id}"
+    
+    async def next(self, room_id: str) -> int:
+        return await self.pool.execute("INCR", self._key(room_id))
+    
+    async def current(self, room_id: str) -> int:
+        value: Optional[bytes] = await self.pool.execute("GET", self._key(room_id))
+        return int(value) if value is not None else 0
+    
+    async def restore(self, last_seq: Dict[str, int]):
+        for room_id, seq in last_seq.items():
+            await self.pool.execute("SET", self._key(room_id), str(seq), "NX")
+    
+    async def stop(self):
+        await self.pool.close()
+
+def create_sequences(kind: str, url: str = "") -> SequenceAllocator:
+    """Allocator matching the backplane: shared through Redis, or local to one worker"""
+    if kind == "memory":
+        return LocalSequences()
+    if kind == "redis":
+        return RedisSequences(url)
+    raise ValueError(f"Unknown backplane: {kind}")
+
+# Global sequence allocator instance
+sequences = create_sequences(settings.backplane, settings.redis_url)
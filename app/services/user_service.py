@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import time
+
+from fastapi import HTTPException, status
+
+from app.config import get_settings
+from app.core.security import password_hasher
+from app.repositories import DuplicateError, repository
+from app.schemas.user import User as UserSchema, UserUpdate
+
+settings = get_settings()
+
+class UserCache:
+    """Read-through cache of user rows, keyed by id and by username.
+    
+    Entries are immutable ``User`` schema snapshots, never the
+    repository's records, so requests can share them safely. Each lives for ``ttl``
+    seconds, which also bounds how stale another worker's copy can get;
+    every user row the repository writes on this worker is dropped right
+    away through ``invalidate_username``. Lookups that find nothing are
+    not cached.
+    """
+    
+    def __init__(self, max_size: int = 10_000, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # user id -> (snapshot, expiry), least recently used first
+        self.by_id: "OrderedDict[int, Tuple[UserSchema, float]]" = OrderedDict()
+        self.by_username: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, user_id: int) -> Optional[UserSchema]:
+        entry = self.by_id.get(user_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self.invalidate(user_id)
+            return None
+        self.by_id.move_to_end(user_id)
+        return entry[0]
+    
+    def get_by_username(self, username: str) -> Optional[UserSchema]:
+        user_id = self.by_username.get(username)
+        return self.get(user_id) if user_id is not None else None
+    
+    def put(self, user) -> UserSchema:
+        """Cache a snapshot of a repository user and return it"""
+        snapshot = UserSchema.model_validate(user)
+        self.invalidate(snapshot.id)
+        self.by_id[snapshot.id] = (snapshot, time.monotonic() + self.ttl)
+        self.by_username[snapshot.username] = snapshot.id
+        while len(self.by_id) > self.max_size:
+            _, (evicted, _) = self.by_id.popitem(last=False)
+            self.by_username.pop(evicted.username, None)
+        return snapshot
+    
+    def invalidate(self, user_id: int):
+        entry = self.by_id.pop(user_id, None)
+        if entry is not None:
+            self.by_username.pop(entry[0].username, None)
+    
+    def invalidate_username(self, username: str):
+        user_id = self.by_username.get(username)
+        if user_id is not None:
+            self.invalidate(user_id)
+    
+    def clear(self):
+        self.by_id.clear()
+        self.by_username.clear()
+    
+    def get_stats(self) -> dict:
+        return {"size": len(self.by_id), "hits": self.hits, "misses": self.misses}
+
+async def get_user_by_username(username: str) -> Optional[UserSchema]:
+    """Resolve a user, going to the repository only on a cache miss"""
+    cached = user_cache.get_by_username(username)
+    if cached is not None:
+        user_cache.hits += 1
+        return cached
+    
+    user_cache.misses += 1
+    user = await repository.get_user_by_username(username)
+    return user_cache.put(user) if user is not None else None
+
+async def _update_user(user_id: int, **changes):
+    try:
+        user = await repository.update_user(user_id, **changes)
+    except DuplicateError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
+async def update_user(user_id: int, update: UserUpdate) -> UserSchema:
+    """Apply the fields set in ``update`` and refresh the cached copy"""
+    changes = update.model_dump(exclude_none=True, exclude={"password"})
+    if update.password is not None:
+        changes["hashed_password"] = await password_hasher.hash(update.password)
+    user = await _update_user(user_id, **changes)
+    
+    # Replaces the old entry, including the mapping for a changed username
+    return user_cache.put(user)
+
+async def deactivate_user(user_id: int) -> UserSchema:
+    """Mark a user inactive; cached copies stop authenticating immediately"""
+    user = await _update_user(user_id, is_active=False)
+    
+    user_cache.invalidate(user_id)
+    return UserSchema.model_validate(user)
+
+# Global user cache instance
+user_cache = UserCache(settings.user_cache_size, settings.user_cache_ttl)
+repository.user_listeners.append(user_cache.invalidate_username)
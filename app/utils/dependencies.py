@@ -1,17 +1,18 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.core.database import get_db
 from app.core.security import verify_token
-from app.models.user import User
+from app.services.user_service import get_user_by_username
 
 security = HTTPBearer()
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ):
-    """Get current authenticated user"""
+    """Get current authenticated user
+    
+    The user comes from the user cache; the repository is only read on a
+    miss.
+    """
     try:
         payload = verify_token(credentials.credentials)
         username: str = payload.get("sub")
@@ -26,10 +27,15 @@ def get_current_user(
             detail="Invalid token"
         )
     
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_user_by_username(username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user"
+        )
     return user
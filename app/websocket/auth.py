@@ -0,0 +1,41 @@
+from typing import Optional
+from fastapi import HTTPException, WebSocket
+
+from app.config import get_settings
+from app.core.security import VerifiedTokenCache
+
+settings = get_settings()
+
+# Handshake rejected: missing, invalid or mismatched token
+POLICY_VIOLATION = 1008
+# Sent when a connected socket's token expires; clients should re-login and reconnect
+TOKEN_EXPIRED = 4001
+
+def get_token(websocket: WebSocket) -> Optional[str]:
+    """Token from the ``token`` query parameter or an Authorization header.
+    
+    Browsers cannot set headers on a WebSocket, hence the query parameter.
+    """
+    token = websocket.query_params.get("token")
+    if token:
+        return token
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials
+    return None
+
+def authenticate(websocket: WebSocket, user_id: str) -> Optional[dict]:
+    """Claims of the handshake's token if it is valid and issued to ``user_id``"""
+    token = get_token(websocket)
+    if token is None:
+        return None
+    try:
+        claims = token_cache.verify(token)
+    except HTTPException:
+        return None
+    if claims.get("sub") != user_id:
+        return None
+    return claims
+
+# Global verified-token cache instance
+token_cache = VerifiedTokenCache(settings.token_cache_size, settings.token_cache_ttl)
@@ -0,0 +1,219 @@
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional, Set
+import asyncio
+import json
+import logging
+import uuid
+
+from app.config import get_settings
+from app.core.resp import RedisPool, RespError, encode_command, open_connection, parse_url, read_reply
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Called with (room_id, payload, kind, exclude_user, seq) for events from other nodes
+DeliverCallback = Callable[[str, str, Optional[str], Optional[str], Optional[int]], None]
+
+class Backplane(ABC):
+    """Carries room broadcasts between processes.
+    
+    Each node publishes the already encoded payload of a room broadcast and
+    subscribes only to rooms that have local members, so incoming events
+    are handed to ``deliver`` for local fan-out and never reach nodes that
+    have nobody to send them to. Events a node published itself are ignored.
+    Chat messages travel with their room sequence number (``seq``).
+    """
+    
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self.rooms: Set[str] = set()
+        self.deliver: Optional[DeliverCallback] = None
+    
+    async def start(self, deliver: DeliverCallback):
+        self.deliver = deliver
+    
+    async def stop(self):
+        self.deliver = None
+    
+    def subscribe(self, room_id: str):
+        self.rooms.add(room_id)
+    
+    def unsubscribe(self, room_id: str):
+        self.rooms.discard(room_id)
+    
+    @abstractmethod
+    async def publish(
+        self,
+        room_id: str,
+        payload: str,
+        kind: Optional[str] = None,
+        exclude_user: Optional[str] = None,
+        seq: Optional[int] = None
+    ):
+        """Hand a room broadcast to the other nodes"""
+    
+    def _receive(self, room_id: str, payload: str, kind: Optional[str], exclude_user: Optional[str], seq: Optional[int]):
+        if self.deliver is not None and room_id in self.rooms:
+            self.deliver(room_id, payload, kind, exclude_user, seq)
+
+class InProcessHub:
+    """Shared bus for InProcessBackplane instances living in one process"""
+    
+    def __init__(self):
+        self.members: List["InProcessBackplane"] = []
+
+class InProcessBackplane(Backplane):
+    """Backplane between managers in the same process.
+    
+    With its own private hub (the default) it has no peers and publishing
+    costs nothing, which is what a single worker needs.
+    """
+    
+    def __init__(self, hub: Optional[InProcessHub] = None):
+        super().__init__()
+        self.hub = hub or InProcessHub()
+    
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        self.hub.members.append(self)
+    
+    async def stop(self):
+        if self in self.hub.members:
+            self.hub.members.remove(self)
+        await super().stop()
+    
+    async def publish(
+        self,
+        room_id: str,
+        payload: str,
+        kind: Optional[str] = None,
+        exclude_user: Optional[str] = None,
+        seq: Optional[int] = None
+    ):
+        for peer in self.hub.members:
+            if peer is not self:
+                peer._receive(room_id, payload, kind, exclude_user, seq)
+
+class RedisBackplane(Backplane):
+    """Backplane over Redis pub/sub, speaking RESP directly on asyncio streams.
+    
+    One channel per room (``<prefix>:room:<room_id>``). A dedicated
+    subscriber connection follows local room membership and reconnects
+    with backoff, re-subscribing to every local room. Publishing goes
+    through a small connection pool whose round trips are bounded by
+    ``timeout``. Messages carry a one-line JSON header (node, kind,
+    excluded user, seq) followed by the payload.
+    """
+    
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "chat",
+        reconnect_delay: float = 0.5,
+        connect_timeout: float = 5.0,
+        timeout: float = None,
+        pool_size: int = None
+    ):
+        super().__init__()
+        self.host, self.port, self.password, self.db = parse_url(url)
+        self.prefix = prefix
+        self.reconnect_delay = reconnect_delay
+        self.connect_timeout = connect_timeout
+        self.publisher = RedisPool(
+            url,
+            pool_size if pool_size is not None else settings.redis_pool_size,
+            timeout if timeout is not None else settings.redis_timeout
+        )
+        self.publish_failures = 0
+        self._subscriber: Optional[asyncio.StreamWriter] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+    
+    def _channel(self, room_id: str) -> str:
+        return f"{self.prefix}:room:{room_id}"
+    
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        self._listener = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Backplane at {self.host}:{self.port} not reachable yet, retrying in background")
+    
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._subscriber is not None:
+            self._subscriber.close()
+            self._subscriber = None
+        await self.publisher.close()
+        await super().stop()
+    
+    def subscribe(self, room_id: str):
+        if room_id in self.rooms:
+            return
+        super().subscribe(room_id)
+        if self._subscriber is not None:
+            self._subscriber.write(encode_command("SUBSCRIBE", self._channel(room_id)))
+    
+    def unsubscribe(self, room_id: str):
+        if room_id not in self.rooms:
+            return
+        super().unsubscribe(room_id)
+        if self._subscriber is not None:
+            self._subscriber.write(encode_command("UNSUBSCRIBE", self._channel(room_id)))
+    
+    async def publish(
+        self,
+        room_id: str,
+        payload: str,
+        kind: Optional[str] = None,
+        exclude_user: Optional[str] = None,
+        seq: Optional[int] = None
+    ):
+        header = json.dumps([self.node_id, kind, exclude_user, seq])
+        try:
+            await self.publisher.execute("PUBLISH", self._channel(room_id), f"{header}\n{payload}")
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, RespError) as e:
+            # Local members already have it; only other nodes miss this one
+            self.publish_failures += 1
+            logger.warning(f"Backplane publish to room {room_id} failed: {e!r}")
+    
+    async def _listen(self):
+        """Keep the subscriber connection open and dispatch incoming events"""
+        prefix = f"{self.prefix}:room:"
+        while True:
+            try:
+                reader, writer = await asyncio.wait_for(
+                    open_connection(self.host, self.port, self.password, self.db), self.connect_timeout
+                )
+                self._subscriber = writer
+                # The node channel keeps SUBSCRIBE valid before any room is joined
+                channels = [f"{self.prefix}:node:{self.node_id}"] + [self._channel(room) for room in self.rooms]
+                writer.write(encode_command("SUBSCRIBE", *channels))
+                await writer.drain()
+                self._connected.set()
+                while True:
+                    reply = await read_reply(reader)
+                    if not isinstance(reply, list) or len(reply) != 3 or reply[0] != b"message":
+                        continue
+                    channel = reply[1].decode()
+                    header, _, payload = reply[2].decode().partition("\n")
+                    node_id, kind, exclude_user, seq = json.loads(header)
+                    if node_id != self.node_id and channel.startswith(prefix):
+                        self._receive(channel[len(prefix):], payload, kind, exclude_user, seq)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(f"Backplane subscriber lost connection: {e!r}")
+                self._subscriber = None
+                await asyncio.sleep(self.reconnect_delay)
+
+def create_backplane(kind: str, url: str = "") -> Backplane:
+    """Build the backplane named in settings ("memory" or "redis")"""
+    if kind == "memory":
+        return InProcessBackplane()
+    if kind == "redis":
+        return RedisBackplane(url)
+    raise ValueError(f"Unknown backplane: {kind}")
@@ -0,0 +1,129 @@
+from typing import Any, Iterable, Optional, Union
+import zlib
+import msgspec
+
+from app.config import get_settings
+from app.schemas.websocket import ErrorFrame, Frame, InboundFrame
+
+settings = get_settings()
+
+# Wire formats, named by the WebSocket subprotocol that selects them.
+# JSON is the fallback for clients that offer none of these.
+JSON = "chat.json"
+MSGPACK = "chat.msgpack"
+# MessagePack behind a one-byte flag: PLAIN, or DEFLATED (raw deflate) for
+# payloads of at least ``ws_compression_min_size`` bytes
+MSGPACK_DEFLATE = "chat.msgpack.deflate"
+SUBPROTOCOLS = (JSON, MSGPACK, MSGPACK_DEFLATE)
+PLAIN = b"\x00"
+DEFLATED = b"\x01"
+
+class FrameError(ValueError):
+    """Raised when an inbound frame is malformed or fails validation"""
+
+class _TypeOnly(msgspec.Struct):
+    type: Optional[str] = None
+
+_decoder = msgspec.json.Decoder(InboundFrame)
+_type_decoder = msgspec.json.Decoder(_TypeOnly)
+_encoder = msgspec.json.Encoder()
+_msgpack_decoder = msgspec.msgpack.Decoder(InboundFrame)
+_msgpack_type_decoder = msgspec.msgpack.Decoder(_TypeOnly)
+_msgpack_encoder = msgspec.msgpack.Encoder()
+
+def negotiate(offered: Iterable[str]) -> Optional[str]:
+    """Pick the first subprotocol the client offered that we speak"""
+    for subprotocol in offered:
+        if subprotocol in SUBPROTOCOLS:
+            return subprotocol
+    return None
+
+def decode(data: Union[str, bytes], fmt: str = JSON) -> InboundFrame:
+    """Parse and validate one inbound frame in a single pass.
+    
+    Text frames are always JSON; binary frames are JSON too unless the
+    connection negotiated a MessagePack format.
+    """
+    if fmt == JSON or isinstance(data, str):
+        return _decode(data, _decoder, _type_decoder, "JSON")
+    if fmt == MSGPACK_DEFLATE:
+        flag, data = data[:1], data[1:]
+        if flag == DEFLATED:
+            try:
+                data = zlib.decompress(data, -zlib.MAX_WBITS)
+            except zlib.error as e:
+                raise FrameError(f"Invalid compressed frame: {e}") from None
+        elif flag != PLAIN:
+            raise FrameError("Invalid frame flag")
+    return _decode(data, _msgpack_decoder, _msgpack_type_decoder, "MessagePack")
+
+def _decode(data, decoder, type_decoder, name: str) -> InboundFrame:
+    try:
+        return decoder.decode(data)
+    except msgspec.ValidationError as e:
+        # Name the offending type instead of the schema path when it is unknown
+        if str(e).endswith("`$.type`"):
+            try:
+                raise FrameError(f"Unknown message type: {type_decoder.decode(data).type}") from None
+            except msgspec.ValidationError:
+                pass
+        raise FrameError(str(e)) from None
+    except msgspec.DecodeError as e:
+        raise FrameError(f"Invalid {name}: {e}") from None
+
+def encode(frame: Any) -> bytes:
+    """Serialize a frame (Struct or plain dict) to JSON bytes"""
+    return _encoder.encode(frame)
+
+def frame_type(frame: Any) -> Optional[str]:
+    """The ``type`` of a frame, whether a Struct or a plain dict"""
+    if isinstance(frame, Frame):
+        return frame.__struct_config__.tag
+    return frame.get("type")
+
+def error_frame(message: str, code: Optional[str] = None) -> bytes:
+    return encode(ErrorFrame(message=message, code=code))
+
+def deflate(data: bytes) -> bytes:
+    """Flag a MessagePack payload, compressing it if it is large enough"""
+    if len(data) < settings.ws_compression_min_size:
+        return PLAIN + data
+    compressor = zlib.compressobj(settings.ws_compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return DEFLATED + compressor.compress(data) + compressor.flush()
+
+class Payload:
+    """An encoded outbound frame, converted to each wire format at most once.
+    
+    Frames are encoded to JSON by whoever builds them. A fan-out hands the
+    same Payload to every recipient queue, and each writer asks for its
+    connection's format, so a broadcast costs one conversion per format in
+    use rather than one per recipient.
+    """
+    
+    __slots__ = ("_json", "_encoded")
+    
+    def __init__(self, data: Union[str, bytes]):
+        self._json = data
+        # format -> str (text frame) or bytes (binary frame)
+        self._encoded = {}
+    
+    @property
+    def text(self) -> str:
+        """The JSON form as a str, for text frames and the backplane"""
+        if isinstance(self._json, bytes):
+            self._json = self._json.decode()
+        return self._json
+    
+    def encoded(self, fmt: str) -> Union[str, bytes]:
+        data = self._encoded.get(fmt)
+        if data is None:
+            if fmt == JSON:
+                data = self.text
+            elif fmt == MSGPACK:
+                data = _msgpack_encoder.encode(msgspec.json.decode(self._json))
+            elif fmt == MSGPACK_DEFLATE:
+                data = deflate(self.encoded(MSGPACK))
+            else:
+                raise ValueError(f"Unknown wire format: {fmt}")
+            self._encoded[fmt] = data
+        return data
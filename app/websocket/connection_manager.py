@@ -1,35 +1,202 @@
-from typing import Dict, Set
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 from fastapi import WebSocket
-import json
 from datetime import datetime
+import asyncio
+import time
+
+from app.config import get_settings
+from app.core.metrics import CONNECTS, DISCONNECTS, ERROR_FRAMES, FANOUT_RECIPIENTS, FANOUT_SECONDS
+from app.schemas.websocket import Ping
+from app.websocket import codec
+from app.websocket.auth import TOKEN_EXPIRED
+from app.websocket.backplane import Backplane, create_backplane
+from app.websocket.heartbeat import IDLE_TIMEOUT, Heartbeat
+from app.websocket.outbound import OutboundQueue
+
+settings = get_settings()
 
 class ConnectionManager:
-    def __init__(self):
-        # Store active connections: user_id -> websocket
-        self.active_connections: Dict[str, WebSocket] = {}
+    def __init__(
+        self,
+        send_timeout: float = None,
+        queue_size: int = None,
+        queue_policy: str = None,
+        backplane: Optional[Backplane] = None
+    ):
+        # Store active connections: user_id -> sockets (one per tab/device)
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
         # Store room memberships: room_id -> set of user_ids
         self.room_connections: Dict[str, Set[str]] = {}
+        # Reverse membership index: user_id -> set of room_ids
+        self.user_rooms: Dict[str, Set[str]] = {}
+        # Outbound queue per socket, each drained by its own writer task
+        self.outbound: Dict[WebSocket, OutboundQueue] = {}
+        # Sockets per negotiated wire format
+        self.formats: Dict[str, int] = {}
+        # Timers that close each socket when its token expires
+        self.expiry_timers: Dict[WebSocket, asyncio.TimerHandle] = {}
+        self.expired_sockets = 0
+        # Seconds a single send may take before the socket is dropped
+        self.send_timeout = send_timeout if send_timeout is not None else settings.ws_send_timeout
+        self.queue_size = queue_size if queue_size is not None else settings.ws_queue_size
+        self.queue_policy = queue_policy if queue_policy is not None else settings.ws_queue_policy
+        # Frames dropped by queues that have since been closed
+        self.dropped_frames = 0
+        # Relays room broadcasts to and from other workers
+        self.backplane = backplane or create_backplane(settings.backplane, settings.redis_url)
+        # Pings quiet sockets and reaps idle ones, all on one timer wheel
+        self.heartbeat = Heartbeat(self._ping, self._reap)
+        # Called with (user_id, True) on a user's first socket and (user_id, False)
+        # after its last one closes, while its rooms are still known
+        self.user_listeners: List[Callable[[str, bool], None]] = []
+        # Called with (room_id, payload, seq) for chat messages other workers accepted
+        self.message_listeners: List[Callable[[str, str, int], None]] = []
+        # kind -> called with (room_id, payload) for events other workers published
+        # with ``publish_event``; these are state updates, never sent to clients
+        self.event_listeners: Dict[str, Callable[[str, str], None]] = {}
+    
+    async def start(self):
+        """Attach to the backplane and start the heartbeat
+        
+        Events from other workers reach local members only.
+        """
+        await self.backplane.start(self._relay)
+        self.heartbeat.start()
+    
+    async def stop(self):
+        """Stop the heartbeat and detach from the backplane"""
+        await self.heartbeat.stop()
+        await self.backplane.stop()
     
-    async def connect(self, websocket: WebSocket, user_id: str):
-        """Connect a new WebSocket"""
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-        print(f"User {user_id} connected. Total connections: {len(self.active_connections)}")
+    async def connect(self, websocket: WebSocket, user_id: str, expires_at: Optional[float] = None) -> str:
+        """Connect a new WebSocket; returns the negotiated wire format
+        
+        A socket given ``expires_at`` (epoch seconds, the token's ``exp``) is
+        closed by a timer at that moment, so frames never re-check the token.
+        """
+        subprotocol = codec.negotiate(websocket.scope.get("subprotocols", ()))
+        await websocket.accept(subprotocol=subprotocol)
+        fmt = subprotocol or codec.JSON
+        first_socket = user_id not in self.active_connections
+        self.active_connections.setdefault(user_id, set()).add(websocket)
+        self.formats[fmt] = self.formats.get(fmt, 0) + 1
+        CONNECTS.inc()
+        
+        queue = OutboundQueue(
+            websocket,
+            maxsize=self.queue_size,
+            policy=self.queue_policy,
+            send_timeout=self.send_timeout,
+            on_failure=lambda: self.disconnect(user_id, websocket),
+            fmt=fmt
+        )
+        self.outbound[websocket] = queue
+        queue.start()
+        self.heartbeat.add(websocket, user_id)
+        if expires_at is not None:
+            self.expiry_timers[websocket] = asyncio.get_running_loop().call_later(
+                max(0.0, expires_at - time.time()), self._expire, user_id, websocket
+            )
+        if first_socket:
+            self._notify_listeners(user_id, True)
+        print(f"User {user_id} connected. Total connections: {len(self.outbound)}")
+        return fmt
     
-    def disconnect(self, user_id: str):
-        """Disconnect a WebSocket"""
-        if user_id in self.active_connections:
+    def disconnect(self, user_id: str, websocket: Optional[WebSocket] = None):
+        """Disconnect a WebSocket
+        
+        Only ``websocket`` is closed when it is given; otherwise every socket
+        of the user is. Room memberships are dropped once the user has no
+        sockets left.
+        """
+        sockets = self.active_connections.get(user_id)
+        if sockets is None:
+            if websocket is not None:
+                self._close_queue(websocket)
+            return
+        
+        closing = [websocket] if websocket is not None else list(sockets)
+        for socket in closing:
+            sockets.discard(socket)
+            self._close_queue(socket)
+        
+        if not sockets:
             del self.active_connections[user_id]
+            self._notify_listeners(user_id, False)
             # Remove from all rooms
-            for room_id, users in self.room_connections.items():
-                users.discard(user_id)
-            print(f"User {user_id} disconnected. Total connections: {len(self.active_connections)}")
+            for room_id in self.user_rooms.pop(user_id, ()):
+                self._discard_member(room_id, user_id)
+        print(f"User {user_id} disconnected. Total connections: {len(self.outbound)}")
+    
+    def _notify_listeners(self, user_id: str, online: bool):
+        for listener in self.user_listeners:
+            listener(user_id, online)
+    
+    def _expire(self, user_id: str, websocket: WebSocket):
+        self.expiry_timers.pop(websocket, None)
+        self.expired_sockets += 1
+        self.disconnect(user_id, websocket)
+        asyncio.create_task(self._close_socket(websocket, TOKEN_EXPIRED, "Token expired"))
+    
+    def _ping(self, websockets: List[WebSocket]):
+        """Ping sockets that have been quiet; any frame back counts as a pong"""
+        payload = codec.Payload(codec.encode(Ping(timestamp=datetime.utcnow().isoformat())))
+        for websocket in websockets:
+            queue = self.outbound.get(websocket)
+            if queue is not None:
+                queue.put(payload, "ping")
+    
+    def _reap(self, idle: List[Tuple[str, WebSocket]]):
+        """Drop a batch of idle sockets from every index, then close them"""
+        for user_id, websocket in idle:
+            self.disconnect(user_id, websocket)
+        asyncio.create_task(self.close_sockets([websocket for _, websocket in idle], IDLE_TIMEOUT, "Idle timeout"))
+    
+    async def close_sockets(self, websockets: List[WebSocket], code: int, reason: str):
+        """Send close frames concurrently, each bounded by ``send_timeout``"""
+        await asyncio.gather(*(self._close_socket(websocket, code, reason) for websocket in websockets))
+    
+    async def _close_socket(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), self.send_timeout)
+        except Exception:
+            pass
+    
+    def _close_queue(self, websocket: WebSocket):
+        timer = self.expiry_timers.pop(websocket, None)
+        if timer is not None:
+            timer.cancel()
+        self.heartbeat.discard(websocket)
+        queue = self.outbound.pop(websocket, None)
+        if queue is not None:
+            DISCONNECTS.inc()
+            self.dropped_frames += queue.dropped
+            self.formats[queue.fmt] -= 1
+            queue.close()
+    
+    def _discard_member(self, room_id: str, user_id: str):
+        """Remove a user from a room, dropping the room once it is empty"""
+        users = self.room_connections.get(room_id)
+        if users is None:
+            return
+        users.discard(user_id)
+        if not users:
+            del self.room_connections[room_id]
+            self.backplane.unsubscribe(room_id)
     
     async def join_room(self, user_id: str, room_id: str):
-        """Add user to a room"""
+        """Add user to a room
+        
+        Ignored once the user has no socket left, e.g. for a join frame read
+        after its outbound queue already dropped the connection.
+        """
+        if user_id not in self.active_connections:
+            return
         if room_id not in self.room_connections:
             self.room_connections[room_id] = set()
+            self.backplane.subscribe(room_id)
         self.room_connections[room_id].add(user_id)
+        self.user_rooms.setdefault(user_id, set()).add(room_id)
         
         # Notify others in the room
         await self.broadcast_to_room(room_id, {
@@ -39,10 +206,30 @@ class ConnectionManager:
             "timestamp": datetime.utcnow().isoformat()
         }, exclude_user=user_id)
     
+    def restore_rooms(self, user_id: str, room_ids: Iterable[str]):
+        """Subscribe a connected user to rooms it already belongs to, without announcing it"""
+        if user_id not in self.active_connections:
+            return
+        rooms = self.user_rooms.setdefault(user_id, set())
+        for room_id in room_ids:
+            users = self.room_connections.get(room_id)
+            if users is None:
+                users = self.room_connections[room_id] = set()
+                self.backplane.subscribe(room_id)
+            users.add(user_id)
+            rooms.add(room_id)
+        if not rooms:
+            del self.user_rooms[user_id]
+    
     async def leave_room(self, user_id: str, room_id: str):
         """Remove user from a room"""
         if room_id in self.room_connections:
-            self.room_connections[room_id].discard(user_id)
+            self._discard_member(room_id, user_id)
+            rooms = self.user_rooms.get(user_id)
+            if rooms is not None:
+                rooms.discard(room_id)
+                if not rooms:
+                    del self.user_rooms[user_id]
             
             # Notify others in the room
             await self.broadcast_to_room(room_id, {
@@ -52,46 +239,121 @@ class ConnectionManager:
                 "timestamp": datetime.utcnow().isoformat()
             }, exclude_user=user_id)
     
-    async def send_personal_message(self, message: dict, user_id: str):
+    async def send_to_socket(self, websocket: WebSocket, message: Any):
+        """Queue a message (frame Struct or dict) for one specific socket"""
+        await self.send_payload(websocket, codec.encode(message), codec.frame_type(message))
+    
+    async def send_payload(
+        self,
+        websocket: WebSocket,
+        payload: Union[str, bytes, codec.Payload],
+        kind: Optional[str] = None
+    ):
+        """Queue an already encoded frame for one specific socket"""
+        queue = self.outbound.get(websocket)
+        if queue is not None:
+            if not isinstance(payload, codec.Payload):
+                payload = codec.Payload(payload)
+            if kind == "error":
+                ERROR_FRAMES.inc()
+            queue.put(payload, kind)
+    
+    async def send_personal_message(self, message: Any, user_id: str):
         """Send message to a specific user"""
-        if user_id in self.active_connections:
-            try:
-                await self.active_connections[user_id].send_text(json.dumps(message))
-            except:
-                # Connection is broken, remove it
-                self.disconnect(user_id)
-    
-    async def broadcast_to_room(self, room_id: str, message: dict, exclude_user: str = None):
-        """Broadcast message to all users in a room"""
-        if room_id not in self.room_connections:
-            return
+        self._fan_out((user_id,), codec.encode(message), codec.frame_type(message))
+    
+    async def broadcast_to_room(self, room_id: str, message: Any, exclude_user: str = None):
+        """Broadcast message to all users in a room, on every worker"""
+        await self.broadcast_payload(room_id, codec.encode(message), codec.frame_type(message), exclude_user)
+    
+    async def broadcast_payload(
+        self,
+        room_id: str,
+        payload: Union[str, bytes],
+        kind: Optional[str] = None,
+        exclude_user: Optional[str] = None,
+        seq: Optional[int] = None
+    ):
+        """Broadcast an already JSON-encoded frame to a room, on every worker
         
-        disconnected_users = []
-        for user_id in self.room_connections[room_id]:
-            if user_id == exclude_user:
-                continue
-            if user_id in self.active_connections:
-                try:
-                    await self.active_connections[user_id].send_text(json.dumps(message))
-                except:
-                    disconnected_users.append(user_id)
+        Chat messages pass their ``seq`` so other workers can buffer them.
+        """
+        payload = codec.Payload(payload)
+        self._deliver_local(room_id, payload, kind, exclude_user)
+        await self.backplane.publish(room_id, payload.text, kind, exclude_user, seq)
+    
+    async def publish_event(self, room_id: str, payload: Union[str, bytes], kind: str):
+        """Hand a room state update to the other workers' ``event_listeners`` only"""
+        if isinstance(payload, bytes):
+            payload = payload.decode()
+        await self.backplane.publish(room_id, payload, kind)
+    
+    def broadcast_local(self, room_id: str, message: Any):
+        """Send a message to this worker's members of a room, and nowhere else"""
+        self._deliver_local(room_id, codec.encode(message), codec.frame_type(message), None)
+    
+    def _relay(self, room_id: str, payload: str, kind: Optional[str], exclude_user: Optional[str], seq: Optional[int]):
+        """Take in a room event from another worker"""
+        listener = self.event_listeners.get(kind)
+        if listener is not None:
+            listener(room_id, payload)
+            return
+        if seq is not None:
+            for listener in self.message_listeners:
+                listener(room_id, payload, seq)
+        self._deliver_local(room_id, payload, kind, exclude_user)
+    
+    def _deliver_local(self, room_id: str, payload: Union[str, codec.Payload], kind: Optional[str], exclude_user: Optional[str]):
+        """Fan an encoded room event out to this worker's members"""
+        users = self.room_connections.get(room_id)
+        if not users:
+            return
         
-        # Clean up disconnected users
-        for user_id in disconnected_users:
-            self.disconnect(user_id)
+        recipients = [user_id for user_id in users if user_id != exclude_user]
+        self._fan_out(recipients, payload, kind)
     
-    async def broadcast_to_all(self, message: dict):
+    async def broadcast_to_all(self, message: Any):
         """Broadcast message to all connected users"""
-        disconnected_users = []
-        for user_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except:
-                disconnected_users.append(user_id)
+        self._fan_out(list(self.active_connections), codec.encode(message), codec.frame_type(message))
+    
+    def _fan_out(
+        self,
+        user_ids: Iterable[str],
+        payload: Union[str, bytes, codec.Payload],
+        kind: Optional[str] = None
+    ):
+        """Hand an already encoded payload to each recipient's outbound queue.
         
-        # Clean up disconnected users
-        for user_id in disconnected_users:
-            self.disconnect(user_id)
+        The payload is serialized once by the caller and converted at most
+        once per wire format. Queuing never waits on the network; each
+        socket's writer task sends under ``send_timeout`` and slow or broken
+        sockets are dropped by their own queue.
+        """
+        started = time.perf_counter()
+        if not isinstance(payload, codec.Payload):
+            payload = codec.Payload(payload)
+        queued = 0
+        for user_id in user_ids:
+            # Copied: a full queue under the disconnect policy drops its socket from the set
+            for websocket in tuple(self.active_connections.get(user_id, ())):
+                queue = self.outbound.get(websocket)
+                if queue is not None:
+                    queue.put(payload, kind)
+                    queued += 1
+        FANOUT_SECONDS.observe(time.perf_counter() - started)
+        FANOUT_RECIPIENTS.observe(queued)
+    
+    def get_queue_stats(self) -> dict:
+        """Outbound queue depth and drop counters"""
+        depths = [queue.depth for queue in self.outbound.values()]
+        return {
+            "policy": self.queue_policy,
+            "capacity": self.queue_size,
+            "queued_frames": sum(depths),
+            "max_depth": max(depths, default=0),
+            "formats": {fmt: count for fmt, count in self.formats.items() if count},
+            "dropped_frames": self.dropped_frames + sum(q.dropped for q in self.outbound.values())
+        }
     
     def get_room_users(self, room_id: str) -> Set[str]:
         """Get all users in a room"""
@@ -99,11 +361,7 @@ class ConnectionManager:
     
     def get_user_rooms(self, user_id: str) -> Set[str]:
         """Get all rooms a user is in"""
-        user_rooms = set()
-        for room_id, users in self.room_connections.items():
-            if user_id in users:
-                user_rooms.add(room_id)
-        return user_rooms
+        return set(self.user_rooms.get(user_id, ()))
 
 # Global connection manager instance
 manager = ConnectionManager()
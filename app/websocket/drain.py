@@ -0,0 +1,155 @@
+from typing import Optional
+import asyncio
+import logging
+import random
+import signal
+import threading
+import time
+
+from app.config import get_settings
+from app.schemas.websocket import Reconnect
+from app.websocket import codec
+from app.websocket.connection_manager import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Close code for sockets closed by a drain; clients reconnect after their hint
+SERVICE_RESTART = 1012
+
+# Drain states, in order
+SERVING = "serving"
+DRAINING = "draining"
+DRAINED = "drained"
+
+class Drain:
+    """Hands a worker's WebSocket clients over to the rest of the fleet.
+    
+    Once started, new sockets are refused and every client gets a
+    ``reconnect`` frame whose ``retry_after`` is drawn uniformly from
+    ``window`` seconds, so reconnects spread out instead of arriving all at
+    once. Sockets are then closed ``batch_size`` at a time, ``batch_interval``
+    seconds apart, each after its queued frames have gone out (waiting at
+    most ``flush_timeout``).
+    """
+    
+    def __init__(
+        self,
+        connections: ConnectionManager,
+        window: float = None,
+        batch_size: int = None,
+        batch_interval: float = None,
+        flush_timeout: float = None
+    ):
+        self.connections = connections
+        self.window = window if window is not None else settings.ws_drain_window
+        self.batch_size = batch_size or settings.ws_drain_batch_size
+        self.batch_interval = batch_interval if batch_interval is not None else settings.ws_drain_batch_interval
+        self.flush_timeout = flush_timeout if flush_timeout is not None else settings.ws_drain_flush_timeout
+        self.state = SERVING
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.sockets = 0
+        self.closed = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def draining(self) -> bool:
+        """True once the drain has started; new sockets should be refused"""
+        return self.state != SERVING
+    
+    def start(self) -> asyncio.Task:
+        """Start draining, once; returns the drain task"""
+        if self._task is None:
+            self.state = DRAINING
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._drain())
+        return self._task
+    
+    async def run(self):
+        """Drain every socket, or wait for the drain already under way"""
+        await asyncio.shield(self.start())
+    
+    async def _drain(self):
+        sockets = [
+            (user_id, websocket)
+            for user_id, websockets in self.connections.active_connections.items()
+            for websocket in websockets
+        ]
+        self.sockets = len(sockets)
+        logger.info(f"Draining {self.sockets} WebSocket connections over {self.window}s")
+        
+        for _, websocket in sockets:
+            retry_after = round(random.uniform(0, self.window), 3)
+            await self.connections.send_payload(
+                websocket, codec.encode(Reconnect(reason="Server restarting", retry_after=retry_after)), "reconnect"
+            )
+        
+        for start in range(0, len(sockets), self.batch_size):
+            if start:
+                await asyncio.sleep(self.batch_interval)
+            batch = sockets[start:start + self.batch_size]
+            await self._flush([websocket for _, websocket in batch])
+            for user_id, websocket in batch:
+                self.connections.disconnect(user_id, websocket)
+            await self.connections.close_sockets(
+                [websocket for _, websocket in batch], SERVICE_RESTART, "Server restarting"
+            )
+            self.closed += len(batch)
+        
+        self.state = DRAINED
+        self.finished_at = time.monotonic()
+        logger.info(f"Drained {self.closed} WebSocket connections in {self.finished_at - self.started_at:.2f}s")
+    
+    async def _flush(self, websockets):
+        """Wait until these sockets' outbound queues are empty, or the flush timeout"""
+        deadline = time.monotonic() + self.flush_timeout
+        queues = [self.connections.outbound.get(websocket) for websocket in websockets]
+        while any(queue is not None and not queue.closed and queue.pending for queue in queues):
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.01)
+    
+    def handle_signals(self) -> bool:
+        """Drain on SIGTERM, then let the server shut down as on SIGINT.
+        
+        uvicorn closes every socket the moment it sees SIGTERM, before the
+        lifespan shutdown runs, so SIGTERM is taken over here. A second
+        SIGTERM skips the rest of the drain. Signal handlers can only be
+        installed from the main thread; returns whether they were.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._on_sigterm)
+        except (NotImplementedError, RuntimeError):
+            # No loop signal handlers on this platform
+            return False
+        return True
+    
+    def _on_sigterm(self):
+        if self.draining:
+            signal.raise_signal(signal.SIGINT)
+        else:
+            self.start().add_done_callback(self._exit)
+    
+    @staticmethod
+    def _exit(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"WebSocket drain failed: {task.exception()}")
+        signal.raise_signal(signal.SIGINT)
+    
+    def get_stats(self) -> dict:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.monotonic()) - self.started_at, 3)
+        return {
+            "state": self.state,
+            "sockets": self.sockets,
+            "closed": self.closed,
+            "remaining": self.sockets - self.closed,
+            "elapsed_seconds": elapsed
+        }
+
+# Global drain instance
+drain = Drain(manager)
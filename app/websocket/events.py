@@ -0,0 +1,128 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Union
+import asyncio
+import logging
+
+from app.config import get_settings
+from app.websocket import codec
+from app.websocket.connection_manager import manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+Handler = Callable[..., Awaitable[None]]
+Next = Callable[["FrameContext"], Awaitable[None]]
+Middleware = Callable[["FrameContext", Next], Awaitable[None]]
+
+class FrameContext:
+    """One inbound frame on its way through the middleware chain"""
+    
+    __slots__ = ("websocket", "user_id", "fmt", "data", "frame", "kind", "error", "tasks")
+    
+    def __init__(self, websocket, user_id: str, fmt: str, data: Union[str, bytes], tasks: Set[asyncio.Task]):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.fmt = fmt
+        # Raw frame as received; ``frame`` is filled in once it is decoded
+        self.data = data
+        self.frame = None
+        self.kind: Optional[str] = None
+        # Set instead of ``frame`` when the frame could not be decoded
+        self.error: Optional[str] = None
+        # The connection's in-flight concurrent handlers
+        self.tasks = tasks
+    
+    @property
+    def room_id(self) -> Optional[str]:
+        return getattr(self.frame, "room_id", None)
+
+class HandlerSpec:
+    __slots__ = ("handler", "concurrent")
+    
+    def __init__(self, handler: Handler, concurrent: bool):
+        self.handler = handler
+        self.concurrent = concurrent
+
+class Dispatcher:
+    """Routes decoded frames to handlers by frame type.
+    
+    Handlers are looked up in a dict keyed by ``type`` and called as
+    ``handler(websocket, user_id, frame)``. Every frame first passes through
+    the middleware chain, outermost first; a middleware either awaits
+    ``call_next(ctx)`` or drops the frame by returning. Handlers registered
+    with ``concurrent=True`` run as tasks, up to ``max_concurrent`` per
+    connection, so a slow one does not hold up the receive loop; the rest
+    run inline and in arrival order.
+    """
+    
+    def __init__(self, max_concurrent: int = None):
+        self.max_concurrent = max_concurrent or settings.ws_max_concurrent_handlers
+        self.handlers: Dict[str, HandlerSpec] = {}
+        self.middleware: List[Middleware] = []
+        self._chain: Next = self._invoke
+    
+    def register(self, kind: str, handler: Handler, concurrent: bool = False):
+        if kind in self.handlers:
+            raise ValueError(f"Handler already registered for {kind!r}")
+        self.handlers[kind] = HandlerSpec(handler, concurrent)
+    
+    def on(self, kind: str, concurrent: bool = False):
+        """Decorator form of ``register``"""
+        def decorator(handler: Handler) -> Handler:
+            self.register(kind, handler, concurrent)
+            return handler
+        return decorator
+    
+    def use(self, middleware: Middleware):
+        """Append a middleware; the first one added runs outermost"""
+        self.middleware.append(middleware)
+        # Compose once here rather than per frame
+        chain = self._invoke
+        for mw in reversed(self.middleware):
+            chain = self._bind(mw, chain)
+        self._chain = chain
+    
+    @staticmethod
+    def _bind(middleware: Middleware, call_next: Next) -> Next:
+        async def call(ctx: FrameContext):
+            await middleware(ctx, call_next)
+        return call
+    
+    async def dispatch(self, ctx: FrameContext):
+        await self._chain(ctx)
+    
+    async def _invoke(self, ctx: FrameContext):
+        if ctx.error is not None:
+            await manager.send_payload(ctx.websocket, codec.error_frame(ctx.error, "invalid_frame"), "error")
+            return
+        
+        spec = self.handlers.get(ctx.kind)
+        if spec is None:
+            await manager.send_payload(
+                ctx.websocket, codec.error_frame(f"Unknown message type: {ctx.kind}", "invalid_frame"), "error"
+            )
+            return
+        
+        call = spec.handler(ctx.websocket, ctx.user_id, ctx.frame)
+        if not spec.concurrent or len(ctx.tasks) >= self.max_concurrent:
+            # Inline when the connection already has its share of tasks
+            await call
+            return
+        task = asyncio.create_task(self._run(call, ctx.kind))
+        ctx.tasks.add(task)
+        task.add_done_callback(ctx.tasks.discard)
+    
+    @staticmethod
+    async def _run(call: Awaitable[None], kind: str):
+        try:
+            await call
+        except Exception as e:
+            logger.error(f"Handler for {kind} failed: {e}")
+    
+    @staticmethod
+    def cancel(tasks: Set[asyncio.Task]):
+        """Cancel a closed connection's in-flight handlers"""
+        for task in list(tasks):
+            task.cancel()
+
+# Global dispatcher instance
+dispatcher = Dispatcher()
@@ -0,0 +1,9 @@
+from app.schemas.websocket import Pong
+from app.websocket.events import dispatcher
+
+@dispatcher.on("pong")
+async def handle_pong(websocket, user_id: str, data: Pong):
+    """Handle a heartbeat reply
+    
+    Nothing to do: the receive loop already recorded the socket's activity.
+    """
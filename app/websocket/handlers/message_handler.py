@@ -1,119 +1,73 @@
-import json
-from datetime import datetime
+import msgspec
+from app.schemas.websocket import JoinRoom, LeaveRoom, RoomJoined, RoomLeft, SendMessage
+from app.services.message_service import message_store
+from app.services.message_writer import message_writer
+from app.services.room_service import membership_writer
+from app.services.sequence_service import sequences
 from app.websocket.connection_manager import manager
-from typing import Dict
+from app.websocket.events import dispatcher
 
-# Simple message storage (in production, use database)
-messages_storage: Dict[str, list] = {}
+# Number of recent messages sent to a user joining a room
+JOIN_HISTORY_SIZE = 20
 
-async def handle_send_message(websocket, user_id: str, data: dict):
+# Messages accepted on other workers join this worker's room history too
+manager.message_listeners.append(message_store.add_relayed)
+
+@dispatcher.on("send_message")
+async def handle_send_message(websocket, user_id: str, data: SendMessage):
     """Handle sending a message to a room"""
     try:
-        room_id = data.get("room_id")
-        content = data.get("content")
-        
-        if not room_id or not content:
-            await websocket.send_text(json.dumps({
-                "type": "error",
-                "message": "room_id and content are required"
-            }))
-            return
-        
-        # Create message
-        message = {
-            "id": len(messages_storage.get(room_id, [])) + 1,
-            "type": "message",
-            "content": content,
-            "sender_id": user_id,
-            "room_id": room_id,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+        room_id = data.room_id
         
-        # Store message
-        if room_id not in messages_storage:
-            messages_storage[room_id] = []
-        messages_storage[room_id].append(message)
+        # Number, store and broadcast the message
+        seq = await sequences.next(room_id)
+        message = message_store.append(room_id, seq, user_id, data.content)
+        message_writer.enqueue(message)
         
-        # Broadcast to room
-        await manager.broadcast_to_room(room_id, message)
+        await manager.broadcast_payload(room_id, message.encode(), "message", seq=seq)
         
     except Exception as e:
-        await websocket.send_text(json.dumps({
+        await manager.send_to_socket(websocket, {
             "type": "error",
             "message": f"Error sending message: {str(e)}"
-        }))
+        })
 
-async def handle_join_room(websocket, user_id: str, data: dict):
+@dispatcher.on("join_room")
+async def handle_join_room(websocket, user_id: str, data: JoinRoom):
     """Handle user joining a room"""
     try:
-        room_id = data.get("room_id")
-        if not room_id:
-            await websocket.send_text(json.dumps({
-                "type": "error",
-                "message": "room_id is required"
-            }))
-            return
+        room_id = data.room_id
         
         await manager.join_room(user_id, room_id)
+        # Remembered across reconnects once written; a no-op for unregistered users or rooms
+        membership_writer.add(room_id, user_id)
         
-        # Send recent messages to the user
-        recent_messages = messages_storage.get(room_id, [])[-20:]  # Last 20 messages
-        await websocket.send_text(json.dumps({
-            "type": "room_joined",
-            "room_id": room_id,
-            "recent_messages": recent_messages
-        }))
+        # Send recent messages to the user, reusing each message's cached encoding
+        recent_messages = message_store.last(room_id, JOIN_HISTORY_SIZE)
+        await manager.send_to_socket(websocket, RoomJoined(
+            room_id=room_id,
+            recent_messages=[msgspec.Raw(m.encode()) for m in recent_messages]
+        ))
         
     except Exception as e:
-        await websocket.send_text(json.dumps({
+        await manager.send_to_socket(websocket, {
             "type": "error",
             "message": f"Error joining room: {str(e)}"
-        }))
+        })
 
-async def handle_leave_room(websocket, user_id: str, data: dict):
+@dispatcher.on("leave_room")
+async def handle_leave_room(websocket, user_id: str, data: LeaveRoom):
     """Handle user leaving a room"""
     try:
-        room_id = data.get("room_id")
-        if not room_id:
-            await websocket.send_text(json.dumps({
-                "type": "error",
-                "message": "room_id is required"
-            }))
-            return
+        room_id = data.room_id
         
         await manager.leave_room(user_id, room_id)
+        membership_writer.remove(room_id, user_id)
         
-        await websocket.send_text(json.dumps({
-            "type": "room_left",
-            "room_id": room_id
-        }))
+        await manager.send_to_socket(websocket, RoomLeft(room_id=room_id))
         
     except Exception as e:
-        await websocket.send_text(json.dumps({
+        await manager.send_to_socket(websocket, {
             "type": "error",
             "message": f"Error leaving room: {str(e)}"
-        }))
-
-async def handle_typing_indicator(websocket, user_id: str, data: dict):
-    """Handle typing indicator"""
-    try:
-        room_id = data.get("room_id")
-        is_typing = data.get("is_typing", False)
-        
-        if not room_id:
-            return
-        
-        # Broadcast typing indicator to room (excluding sender)
-        await manager.broadcast_to_room(room_id, {
-            "type": "typing_indicator",
-            "user_id": user_id,
-            "room_id": room_id,
-            "is_typing": is_typing,
-            "timestamp": datetime.utcnow().isoformat()
-        }, exclude_user=user_id)
-        
-    except Exception as e:
-        await websocket.send_text(json.dumps({
-            "type": "error",
-            "message": f"Error handling typing indicator: {str(e)}"
-        }))
+        })
@@ -0,0 +1,50 @@
+import msgspec
+from app.config import get_settings
+from app.schemas.websocket import Resume, Resumed, ResumedRoom
+from app.services.message_service import get_missed_messages, message_store
+from app.services.room_service import membership_writer
+from app.services.sequence_service import sequences
+from app.websocket.connection_manager import manager
+from app.websocket.events import dispatcher
+from app.websocket.handlers.message_handler import JOIN_HISTORY_SIZE
+
+settings = get_settings()
+
+# May read missed messages from the database, so it runs off the receive loop
+@dispatcher.on("resume", concurrent=True)
+async def handle_resume(websocket, user_id: str, data: Resume):
+    """Handle a reconnecting client rejoining its rooms in one frame
+    
+    ``rooms`` maps each room_id to the last message id the client has seen
+    (or null for a fresh join). Only the missed messages are replayed; when
+    too many were missed the room is flagged with ``gap_too_large`` and the
+    client should page history over REST instead. Rooms the user is still
+    in, such as memberships restored on connect, are not announced again.
+    """
+    try:
+        entries = []
+        for room_id, last_seq in data.rooms.items():
+            if room_id not in manager.user_rooms.get(user_id, ()):
+                await manager.join_room(user_id, room_id)
+                membership_writer.add(room_id, user_id)
+            latest = await sequences.current(room_id)
+            
+            if last_seq is None:
+                missed = [m.encode() for m in message_store.last(room_id, JOIN_HISTORY_SIZE)]
+            else:
+                missed = await get_missed_messages(room_id, last_seq, latest, settings.resume_max_gap)
+            
+            entries.append(ResumedRoom(
+                room_id=room_id,
+                last_seq=latest,
+                gap_too_large=missed is None,
+                messages=[msgspec.Raw(m) for m in missed or ()]
+            ))
+        
+        await manager.send_to_socket(websocket, Resumed(rooms=entries))
+    
+    except Exception as e:
+        await manager.send_to_socket(websocket, {
+            "type": "error",
+            "message": f"Error resuming rooms: {str(e)}"
+        })
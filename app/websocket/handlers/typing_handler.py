@@ -0,0 +1,151 @@
+from datetime import datetime
+from typing import Dict, Optional, Set
+import asyncio
+import logging
+import msgspec
+
+from app.config import get_settings
+from app.schemas.websocket import Typing, TypingIndicator
+from app.websocket.connection_manager import ConnectionManager, manager
+from app.websocket.events import dispatcher
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Backplane event kind of the typing updates workers relay to each other
+TYPING_UPDATE = "typing_update"
+
+class TypingUpdate(msgspec.Struct):
+    user_id: str
+    is_typing: bool
+
+_update_decoder = msgspec.json.Decoder(TypingUpdate)
+
+class TypingCoalescer:
+    """Server-side typing state that turns keystroke frames into room diffs.
+    
+    Per (room, user) only changes matter: a repeated "typing" within
+    ``debounce`` seconds is ignored and a later one just extends the expiry.
+    Typing state expires ``timeout`` seconds after the last refresh. Every
+    ``tick`` seconds each room whose set of typing users changed gets one
+    aggregated ``typing_indicator`` frame listing everyone still typing.
+    
+    Updates that pass the debounce are relayed to the other workers, whose
+    coalescers record them as their own, so every worker holds the typing
+    state of the whole room and sends its frames to local members only.
+    """
+    
+    def __init__(
+        self,
+        connections: Optional[ConnectionManager] = None,
+        tick: float = None,
+        debounce: float = None,
+        timeout: float = None
+    ):
+        self.connections = connections if connections is not None else manager
+        self.tick = tick or settings.typing_tick_interval
+        self.debounce = debounce or settings.typing_debounce
+        self.timeout = timeout or settings.typing_timeout
+        # room_id -> user_id -> (last refresh, expiry) in loop time
+        self.typing: Dict[str, Dict[str, tuple]] = {}
+        self.dirty_rooms: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._task is None:
+            self.connections.event_listeners[TYPING_UPDATE] = self.receive
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self.connections.event_listeners.pop(TYPING_UPDATE, None)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def submit(self, room_id: str, user_id: str, is_typing: bool):
+        """Record a local typing frame and relay it to the other workers unless debounced"""
+        if self.update(room_id, user_id, is_typing):
+            payload = msgspec.json.encode(TypingUpdate(user_id=user_id, is_typing=is_typing))
+            await self.connections.publish_event(room_id, payload, TYPING_UPDATE)
+    
+    def receive(self, room_id: str, payload: str):
+        """Record a typing update another worker relayed; it was debounced there"""
+        update = _update_decoder.decode(payload)
+        self.update(room_id, update.user_id, update.is_typing, debounce=False)
+    
+    def update(self, room_id: str, user_id: str, is_typing: bool, debounce: bool = True) -> bool:
+        """Record a typing frame; only state changes mark the room dirty
+        
+        Returns False when the frame changed nothing, i.e. a stop for a user
+        not typing or a refresh within the debounce.
+        """
+        now = asyncio.get_running_loop().time()
+        users = self.typing.get(room_id)
+        
+        if not is_typing:
+            if users is not None and users.pop(user_id, None) is not None:
+                if not users:
+                    del self.typing[room_id]
+                self.dirty_rooms.add(room_id)
+                return True
+            return False
+        
+        if users is None:
+            users = self.typing[room_id] = {}
+        state = users.get(user_id)
+        if state is None:
+            self.dirty_rooms.add(room_id)
+        elif debounce and now - state[0] < self.debounce:
+            return False
+        users[user_id] = (now, now + self.timeout)
+        return True
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Typing indicator tick failed: {e}")
+    
+    async def flush(self):
+        """Expire stale typing state and send one frame per changed room to its local members"""
+        now = asyncio.get_running_loop().time()
+        for room_id in list(self.typing):
+            users = self.typing[room_id]
+            expired = [user_id for user_id, (_, expires) in users.items() if expires <= now]
+            for user_id in expired:
+                del users[user_id]
+            if expired:
+                self.dirty_rooms.add(room_id)
+                if not users:
+                    del self.typing[room_id]
+        
+        dirty, self.dirty_rooms = self.dirty_rooms, set()
+        timestamp = datetime.utcnow().isoformat()
+        for room_id in dirty:
+            self.connections.broadcast_local(room_id, TypingIndicator(
+                room_id=room_id,
+                user_ids=sorted(self.typing.get(room_id, ())),
+                timestamp=timestamp
+            ))
+
+# Global typing coalescer instance
+typing_coalescer = TypingCoalescer()
+
+@dispatcher.on("typing")
+async def handle_typing_indicator(websocket, user_id: str, data: Typing):
+    """Handle typing indicator"""
+    try:
+        # Coalesced and sent to the room on the next tick
+        await typing_coalescer.submit(data.room_id, user_id, data.is_typing)
+    
+    except Exception as e:
+        await manager.send_to_socket(websocket, {
+            "type": "error",
+            "message": f"Error handling typing indicator: {str(e)}"
+        })
@@ -0,0 +1,142 @@
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import math
+import time
+
+from app.config import get_settings
+from app.core.metrics import HEARTBEAT_PINGS, REAPED_SOCKETS
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Close code for sockets reaped as idle; clients may reconnect straight away
+IDLE_TIMEOUT = 4002
+
+class Beat:
+    """Heartbeat state of one socket"""
+    
+    __slots__ = ("user_id", "last_activity", "slot")
+    
+    def __init__(self, user_id: str, last_activity: float):
+        self.user_id = user_id
+        self.last_activity = last_activity
+        self.slot = 0
+
+class Heartbeat:
+    """One timer wheel that pings quiet sockets and reaps idle ones.
+    
+    Every socket sits in one slot of a wheel that advances each ``tick``
+    seconds, so there is no task or timer per connection. ``touch`` only
+    records when the socket last sent a frame; when the wheel reaches the
+    socket's slot it is checked. Quiet for ``ping_interval`` seconds, it
+    gets a ping; quiet for ``idle_timeout``, it is reaped; otherwise it is
+    re-slotted for the moment it could next be due. At most ``reap_batch``
+    idle sockets are handed to ``on_idle`` per tick, the rest wait for the
+    next one.
+    """
+    
+    def __init__(
+        self,
+        on_ping: Callable[[List[Any]], None],
+        on_idle: Callable[[List[Tuple[str, Any]]], None],
+        ping_interval: float = None,
+        idle_timeout: float = None,
+        tick: float = None,
+        reap_batch: int = None
+    ):
+        self.on_ping = on_ping
+        self.on_idle = on_idle
+        self.ping_interval = ping_interval or settings.ws_ping_interval
+        self.idle_timeout = max(idle_timeout or settings.ws_idle_timeout, self.ping_interval)
+        self.tick = tick or settings.ws_heartbeat_tick
+        self.reap_batch = reap_batch or settings.ws_reap_batch
+        # Long enough that no socket is ever due more than one turn ahead
+        self.slots: List[Set[Any]] = [set() for _ in range(math.ceil(self.idle_timeout / self.tick) + 1)]
+        self.position = 0
+        self.beats: Dict[Any, Beat] = {}
+        # Idle sockets waiting for a reap batch: (user_id, websocket)
+        self.idle: Deque[Tuple[str, Any]] = deque()
+        self.pings = 0
+        self.reaped = 0
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def add(self, websocket, user_id: str):
+        """Start watching a newly connected socket"""
+        beat = self.beats[websocket] = Beat(user_id, time.monotonic())
+        self._schedule(websocket, beat, self.ping_interval)
+    
+    def touch(self, websocket):
+        """Record inbound activity; cheap enough to call on every frame"""
+        beat = self.beats.get(websocket)
+        if beat is not None:
+            beat.last_activity = time.monotonic()
+    
+    def discard(self, websocket):
+        """Stop watching a closed socket"""
+        beat = self.beats.pop(websocket, None)
+        if beat is not None:
+            self.slots[beat.slot].discard(websocket)
+    
+    def _schedule(self, websocket, beat: Beat, delay: float):
+        ticks = min(len(self.slots) - 1, max(1, math.ceil(delay / self.tick)))
+        beat.slot = (self.position + ticks) % len(self.slots)
+        self.slots[beat.slot].add(websocket)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                self.advance()
+            except Exception as e:
+                logger.error(f"Heartbeat tick failed: {e}")
+    
+    def advance(self):
+        """Turn the wheel one slot: ping, re-slot or reap the sockets due in it"""
+        self.position = (self.position + 1) % len(self.slots)
+        due, self.slots[self.position] = self.slots[self.position], set()
+        now = time.monotonic()
+        quiet = []
+        for websocket in due:
+            beat = self.beats[websocket]
+            idle = now - beat.last_activity
+            if idle >= self.idle_timeout:
+                del self.beats[websocket]
+                self.idle.append((beat.user_id, websocket))
+            elif idle >= self.ping_interval:
+                quiet.append(websocket)
+                self._schedule(websocket, beat, self.idle_timeout - idle)
+            else:
+                self._schedule(websocket, beat, self.ping_interval - idle)
+        
+        if quiet:
+            self.pings += len(quiet)
+            HEARTBEAT_PINGS.inc(len(quiet))
+            self.on_ping(quiet)
+        if self.idle:
+            batch = [self.idle.popleft() for _ in range(min(self.reap_batch, len(self.idle)))]
+            self.reaped += len(batch)
+            REAPED_SOCKETS.inc(len(batch))
+            self.on_idle(batch)
+    
+    def get_stats(self) -> dict:
+        return {
+            "tracked_sockets": len(self.beats),
+            "pings": self.pings,
+            "reaped": self.reaped,
+            "awaiting_reap": len(self.idle)
+        }
@@ -0,0 +1,75 @@
+from typing import Dict
+import time
+
+from app.core.metrics import DISPATCH_SECONDS, FRAME_DECODE_SECONDS, HistogramChild
+from app.websocket import codec
+from app.websocket.connection_manager import manager
+from app.websocket.events import FrameContext, Next
+from app.websocket.rate_limiter import rate_limiter
+
+# Pre-encoded so rejecting a throttled frame costs next to nothing
+RATE_LIMITED_FRAME = codec.Payload(codec.error_frame("Rate limit exceeded", "rate_limited"))
+
+# Decode timings per wire format, bound once
+DECODE_SECONDS = {fmt: FRAME_DECODE_SECONDS.labels(fmt) for fmt in codec.SUBPROTOCOLS}
+
+class FrameMetrics:
+    """Counts inbound frames and time spent in the chain below, per frame type.
+    
+    Timings go to the ``chat_ws_dispatch_seconds`` histogram, one child per
+    frame type. Concurrent handlers are timed only up to the point they
+    are scheduled.
+    """
+    
+    def __init__(self):
+        # type -> histogram child
+        self.frames: Dict[str, HistogramChild] = {}
+        self.invalid = 0
+    
+    async def __call__(self, ctx: FrameContext, call_next: Next):
+        started = time.perf_counter()
+        try:
+            await call_next(ctx)
+        finally:
+            if ctx.error is not None:
+                self.invalid += 1
+            elif ctx.kind is not None:
+                histogram = self.frames.get(ctx.kind)
+                if histogram is None:
+                    histogram = self.frames[ctx.kind] = DISPATCH_SECONDS.labels(ctx.kind)
+                histogram.observe(time.perf_counter() - started)
+    
+    def get_stats(self) -> dict:
+        return {
+            "invalid": self.invalid,
+            "by_type": {
+                kind: {"frames": histogram.count, "avg_ms": round(histogram.sum / histogram.count * 1000, 3)}
+                for kind, histogram in self.frames.items()
+            }
+        }
+
+async def validate(ctx: FrameContext, call_next: Next):
+    """Decode the raw frame against the frame schemas.
+    
+    A frame that fails validation carries on with ``error`` set and kind
+    ``"*"``, so it is still rate limited before the error reply goes out.
+    """
+    started = time.perf_counter()
+    try:
+        ctx.frame = codec.decode(ctx.data, ctx.fmt)
+        ctx.kind = codec.frame_type(ctx.frame)
+    except codec.FrameError as e:
+        ctx.error = str(e)
+        ctx.kind = "*"
+    DECODE_SECONDS[ctx.fmt].observe(time.perf_counter() - started)
+    await call_next(ctx)
+
+async def rate_limit(ctx: FrameContext, call_next: Next):
+    """Drop frames over the sender's or the room's token-bucket limit"""
+    if not await rate_limiter.allow(ctx.user_id, ctx.kind, ctx.room_id):
+        await manager.send_payload(ctx.websocket, RATE_LIMITED_FRAME, "error")
+        return
+    await call_next(ctx)
+
+# Global frame metrics instance
+frame_metrics = FrameMetrics()
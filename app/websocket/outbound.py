@@ -0,0 +1,161 @@
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from app.core.metrics import SEND_FAILURES, SEND_SECONDS, CounterChild
+from app.websocket.codec import JSON, Payload
+
+logger = logging.getLogger(__name__)
+
+# What to do when a connection's outbound queue is full
+DROP_OLDEST = "drop_oldest"
+DROP_TYPING = "drop_typing"
+DISCONNECT = "disconnect"
+QUEUE_POLICIES = (DROP_OLDEST, DROP_TYPING, DISCONNECT)
+
+# Frame types that may be discarded first under the drop_typing policy
+TYPING_FRAMES = frozenset({"typing_indicator"})
+
+# Why a socket was dropped, bound once
+FAILED_QUEUE_FULL = SEND_FAILURES.labels("queue_full")
+FAILED_TIMEOUT = SEND_FAILURES.labels("timeout")
+FAILED_ERROR = SEND_FAILURES.labels("error")
+
+class OutboundQueue:
+    """Bounded outbound buffer for one WebSocket, drained by its own writer task.
+    
+    Producers never await the network: ``put`` appends to the buffer and
+    returns immediately, and the writer task sends frames in order. When the
+    buffer is full the configured policy decides what gives way. A send that
+    fails or exceeds ``send_timeout`` ends the writer and calls ``on_failure``.
+    Frames are converted to the connection's wire format ``fmt`` as they are
+    sent.
+    """
+    
+    def __init__(
+        self,
+        websocket,
+        maxsize: int,
+        policy: str = DROP_TYPING,
+        send_timeout: float = 5.0,
+        on_failure: Optional[Callable[[], None]] = None,
+        fmt: str = JSON
+    ):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown outbound queue policy: {policy}")
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.on_failure = on_failure
+        self.fmt = fmt
+        self._send_seconds = SEND_SECONDS.labels(fmt)
+        # Pending frames: (payload, frame type)
+        self._items: Deque[Tuple[Payload, Optional[str]]] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # True while the writer awaits a send
+        self._sending = False
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+    
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+    
+    @property
+    def pending(self) -> int:
+        """Frames not yet handed to the socket, including one being sent"""
+        return len(self._items) + (1 if self._sending else 0)
+    
+    def start(self):
+        """Start the writer task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._writer())
+    
+    def put(self, payload: Payload, kind: Optional[str] = None) -> bool:
+        """Queue a frame for sending; returns False if it was not accepted"""
+        if self.closed:
+            return False
+        
+        if len(self._items) >= self.maxsize:
+            if self.policy == DISCONNECT:
+                self._fail("outbound queue full", FAILED_QUEUE_FULL)
+                return False
+            if self.policy == DROP_TYPING and not self._drop_typing(kind):
+                # The incoming frame was itself the cheapest thing to lose
+                self.dropped += 1
+                return False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+        
+        self._items.append((payload, kind))
+        self._ready.set()
+        return True
+    
+    def _drop_typing(self, kind: Optional[str]) -> bool:
+        """Make room by discarding the oldest queued typing frame.
+        
+        Returns False when the incoming frame should be dropped instead.
+        """
+        for index, (_, queued_kind) in enumerate(self._items):
+            if queued_kind in TYPING_FRAMES:
+                del self._items[index]
+                self.dropped += 1
+                return True
+        return kind not in TYPING_FRAMES
+    
+    async def _writer(self):
+        """Send queued frames in order until closed or the socket fails"""
+        try:
+            while not self.closed:
+                if not self._items:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                payload, _ = self._items.popleft()
+                data = payload.encoded(self.fmt)
+                if isinstance(data, str):
+                    send = self.websocket.send_text(data)
+                else:
+                    send = self.websocket.send_bytes(data)
+                started = time.perf_counter()
+                self._sending = True
+                await asyncio.wait_for(send, self.send_timeout)
+                self._sending = False
+                self._send_seconds.observe(time.perf_counter() - started)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._fail("send timed out", FAILED_TIMEOUT)
+        except Exception as e:
+            self._fail(f"send failed: {e!r}", FAILED_ERROR)
+    
+    def _fail(self, reason: str, counter: CounterChild):
+        if self.closed:
+            return
+        counter.inc()
+        logger.info(f"Dropping slow or broken WebSocket ({reason})")
+        self.close()
+        asyncio.create_task(self._close_socket())
+        if self.on_failure is not None:
+            self.on_failure()
+    
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=1013), self.send_timeout)
+        except Exception:
+            pass
+    
+    def close(self):
+        """Stop the writer and discard anything still pending"""
+        self.closed = True
+        self._items.clear()
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+
@@ -0,0 +1,206 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from app.config import get_settings
+from app.repositories import Repository, repository as default_repository
+from app.schemas.websocket import PresenceDiff
+from app.services.online_service import OnlineCounter, online_counter
+from app.websocket.connection_manager import ConnectionManager, manager
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class PresenceTracker:
+    """Online state per user, announced to rooms as batched diffs.
+    
+    The connection manager reports a user's first socket opening and last
+    socket closing, so extra tabs and devices change nothing. Coming online
+    is announced on the next tick; going offline only after the user has
+    stayed disconnected for ``debounce`` seconds, so a client that drops and
+    reconnects never flaps. Every ``tick`` seconds each room with changes
+    gets one ``presence`` frame listing who came online and who went
+    offline. ``is_online``/``last_seen`` reach the repository in one bulk
+    update every ``persist_interval`` seconds, not on every connect.
+    
+    With several workers, a user's sockets may be spread over them. Each
+    worker counts the user in and out of a shared ``OnlineCounter`` as its
+    local changes come due, and only the worker that takes the count from
+    0 to 1, or back to 0, announces and persists the change.
+    """
+    
+    def __init__(
+        self,
+        connections: Optional[ConnectionManager] = None,
+        repository: Optional[Repository] = None,
+        tick: float = None,
+        debounce: float = None,
+        persist_interval: float = None,
+        counter: Optional[OnlineCounter] = None
+    ):
+        self.connections = connections if connections is not None else manager
+        self.repository = repository if repository is not None else default_repository
+        self.counter = counter if counter is not None else online_counter
+        self.tick = tick or settings.presence_tick_interval
+        self.debounce = debounce if debounce is not None else settings.presence_offline_debounce
+        self.persist_interval = persist_interval if persist_interval is not None else settings.presence_persist_interval
+        # Users counted in as online from this worker
+        self.online: Set[str] = set()
+        # user_id -> loop time at which its change of state is announced
+        self.pending: Dict[str, float] = {}
+        # Rooms of users waiting to be announced offline, as of their last disconnect
+        self.offline_rooms: Dict[str, Set[str]] = {}
+        # user_id -> (is_online, last_seen) not yet written to the repository
+        self.unsaved: Dict[str, Tuple[bool, datetime]] = {}
+        self.diffs = 0
+        self.persisted = 0
+        self.persist_failures = 0
+        self.counter_failures = 0
+        self._persisted_at = 0.0
+        self._persisting: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if self._task is None:
+            self.connections.user_listeners.append(self.update)
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop announcing, count this worker's users out and persist what is left.
+        
+        Users are recorded as offline only when no other worker holds them;
+        one drained from here may already be connected elsewhere.
+        """
+        if self._task is not None:
+            self.connections.user_listeners.remove(self.update)
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._persisting is not None:
+            await self._persisting
+        now = datetime.utcnow()
+        elsewhere = 0
+        for user_id in self.online:
+            if await self._count(user_id, False) == 0:
+                self.unsaved[user_id] = (False, now)
+            else:
+                elsewhere += 1
+        if elsewhere:
+            logger.info(f"Leaving presence of {elsewhere} users to the other workers")
+        self.online.clear()
+        self.pending.clear()
+        self.offline_rooms.clear()
+        await self.persist()
+    
+    def update(self, user_id: str, online: bool):
+        """A user's first socket opened (online) or its last one closed"""
+        if online == (user_id in self.online):
+            # Back where it was announced before the change went out
+            self.pending.pop(user_id, None)
+            self.offline_rooms.pop(user_id, None)
+            return
+        now = asyncio.get_running_loop().time()
+        if online:
+            self.pending[user_id] = now
+        else:
+            self.pending[user_id] = now + self.debounce
+            self.offline_rooms[user_id] = self.connections.get_user_rooms(user_id)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Presence tick failed: {e}")
+    
+    async def _count(self, user_id: str, online: bool) -> int:
+        """Count this worker in or out for a user; the new count across workers"""
+        try:
+            if online:
+                return await self.counter.connected(user_id)
+            return await self.counter.disconnected(user_id)
+        except Exception as e:
+            # Fall back to this worker's own view of the user
+            self.counter_failures += 1
+            logger.error(f"Failed to count {user_id} {'in' if online else 'out'}: {e}")
+            return 1 if online else 0
+    
+    async def flush(self):
+        """Announce the changes that are due, one frame per room, and persist now and then"""
+        now = asyncio.get_running_loop().time()
+        due = [user_id for user_id, at in self.pending.items() if at <= now]
+        if due:
+            timestamp = datetime.utcnow()
+            # room_id -> (came online, went offline)
+            rooms: Dict[str, Tuple[List[str], List[str]]] = {}
+            for user_id in due:
+                # Counting awaits, and a user may reconnect or drop meanwhile
+                at = self.pending.get(user_id)
+                if at is None or at > now:
+                    continue
+                del self.pending[user_id]
+                if user_id in self.online:
+                    self.online.discard(user_id)
+                    member_of = self.offline_rooms.pop(user_id, ())
+                    change = 1
+                    announce = await self._count(user_id, False) == 0
+                else:
+                    self.online.add(user_id)
+                    member_of = self.connections.get_user_rooms(user_id)
+                    change = 0
+                    announce = await self._count(user_id, True) == 1
+                if not announce:
+                    # Another worker holds the user and speaks for it
+                    continue
+                self.unsaved[user_id] = (change == 0, timestamp)
+                for room_id in member_of:
+                    rooms.setdefault(room_id, ([], []))[change].append(user_id)
+            
+            for room_id, (came_online, went_offline) in rooms.items():
+                await self.connections.broadcast_to_room(room_id, PresenceDiff(
+                    room_id=room_id,
+                    online=sorted(came_online),
+                    offline=sorted(went_offline),
+                    timestamp=timestamp.isoformat()
+                ))
+            self.diffs += len(rooms)
+        
+        if self.unsaved and now - self._persisted_at >= self.persist_interval:
+            if self._persisting is None or self._persisting.done():
+                self._persisted_at = now
+                self._persisting = asyncio.create_task(self.persist())
+    
+    async def persist(self):
+        """Write the unsaved presence changes in one bulk update"""
+        if not self.unsaved:
+            return
+        batch, self.unsaved = self.unsaved, {}
+        try:
+            await self.repository.update_presence(batch)
+        except Exception as e:
+            self.persist_failures += 1
+            logger.error(f"Failed to persist presence of {len(batch)} users: {e}")
+            # Retry with the next batch; changes made since then win
+            batch.update(self.unsaved)
+            self.unsaved = batch
+            return
+        self.persisted += len(batch)
+    
+    def get_stats(self) -> dict:
+        return {
+            "online_users": len(self.online),
+            "pending_changes": len(self.pending),
+            "diffs_sent": self.diffs,
+            "unsaved": len(self.unsaved),
+            "persisted": self.persisted,
+            "persist_failures": self.persist_failures,
+            "counter_failures": self.counter_failures
+        }
+
+# Global presence tracker instance
+presence = PresenceTracker()
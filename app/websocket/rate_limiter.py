@@ -0,0 +1,148 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+import asyncio
+import hashlib
+import logging
+import time
+
+from app.config import get_settings
+from app.core.resp import RedisPool, RespError
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+class MemoryBucketBackend:
+    """Token buckets held in this process.
+    
+    Each check is O(1). Buckets are kept in least-recently-used order; a
+    bucket that has been idle long enough to refill completely carries no
+    state worth keeping, so such buckets are dropped from the front as
+    checks go by, and ``max_keys`` caps the total regardless.
+    """
+    
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [tokens, last refill time, time the bucket becomes full]
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()
+    
+    async def acquire(self, key: str, rate: float, burst: float) -> bool:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            tokens = burst
+        else:
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            self.buckets.move_to_end(key)
+        
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = [tokens, now, now + (burst - tokens) / rate]
+        self._evict(now)
+        return allowed
+    
+    def _evict(self, now: float):
+        buckets = self.buckets
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if oldest[2] > now and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+class RedisBucketBackend:
+    """Token buckets shared by all workers, kept in Redis.
+    
+    The refill-and-take step runs as one Lua script on the Redis clock, so
+    concurrent workers see a single bucket. Keys expire once they would
+    have refilled, which keeps idle users from accumulating state. Checks
+    share a small connection pool and are bounded by ``timeout``; when
+    Redis is slow or down, frames are let through.
+    """
+    
+    SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return allowed
+"""
+    
+    def __init__(self, url: str, prefix: str = "chat:ratelimit", timeout: float = None, pool_size: int = None):
+        self.prefix = prefix
+        self.sha = hashlib.sha1(self.SCRIPT.encode()).hexdigest()
+        self.pool = RedisPool(
+            url,
+            pool_size if pool_size is not None else settings.redis_pool_size,
+            timeout if timeout is not None else settings.redis_timeout
+        )
+        self.failures = 0
+    
+    async def acquire(self, key: str, rate: float, burst: float) -> bool:
+        args = (f"{self.prefix}:{key}", str(rate), str(burst))
+        try:
+            try:
+                result = await self.pool.execute("EVALSHA", self.sha, "1", *args)
+            except RespError as e:
+                if not str(e).startswith("NOSCRIPT"):
+                    raise
+                result = await self.pool.execute("EVAL", self.SCRIPT, "1", *args)
+            return result == 1
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            # Fail open: a limiter outage must not take chat down with it
+            self.failures += 1
+            logger.warning(f"Rate limit backend unavailable: {e!r}")
+            return True
+
+class RateLimiter:
+    """Per-user and per-room token-bucket limits for inbound frame types.
+    
+    ``user_rules`` and ``room_rules`` map a message type to a rule of
+    (tokens refilled per second, bucket capacity); the ``"*"`` entry applies to types without their own rule. A frame
+    is allowed only if every bucket it falls into has a token.
+    """
+    
+    def __init__(self, user_rules: Dict[str, Sequence[float]], room_rules: Dict[str, Sequence[float]], backend):
+        self.user_rules = {kind: tuple(rule) for kind, rule in user_rules.items()}
+        self.room_rules = {kind: tuple(rule) for kind, rule in room_rules.items()}
+        self.backend = backend
+        self.rejected = 0
+    
+    async def allow(self, user_id: str, message_type: str, room_id: Optional[str] = None) -> bool:
+        # Types without their own rule share the "*" bucket, so clients cannot mint keys
+        kind = message_type if message_type in self.user_rules else "*"
+        rule = self.user_rules.get(kind)
+        if rule is not None and not await self.backend.acquire(f"u:{user_id}:{kind}", *rule):
+            self.rejected += 1
+            return False
+        
+        if room_id is not None:
+            kind = message_type if message_type in self.room_rules else "*"
+            rule = self.room_rules.get(kind)
+            if rule is not None and not await self.backend.acquire(f"r:{room_id}:{kind}", *rule):
+                self.rejected += 1
+                return False
+        return True
+
+def create_rate_limiter() -> RateLimiter:
+    """Build the rate limiter described in settings"""
+    if settings.rate_limit_backend == "redis":
+        backend = RedisBucketBackend(settings.redis_url)
+    elif settings.rate_limit_backend == "memory":
+        backend = MemoryBucketBackend(settings.rate_limit_max_keys)
+    else:
+        raise ValueError(f"Unknown rate limit backend: {settings.rate_limit_backend}")
+    return RateLimiter(settings.rate_limits_per_user, settings.rate_limits_per_room, backend)
+
+# Global rate limiter instance
+rate_limiter = create_rate_limiter()
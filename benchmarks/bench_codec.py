@@ -0,0 +1,52 @@
+"""Compare the stdlib json round trip with the msgspec frame codec.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_codec
+"""
+import json
+import timeit
+
+from app.schemas.websocket import MessageFrame
+from app.websocket import codec
+
+INBOUND = b'{"type": "send_message", "room_id": "general", "content": "hello there, how is everyone doing today?"}'
+OUTBOUND = {
+    "id": 12345,
+    "type": "message",
+    "content": "hello there, how is everyone doing today?",
+    "sender_id": "alice",
+    "room_id": "general",
+    "timestamp": "2024-01-01T12:00:00.000000"
+}
+OUTBOUND_FRAME = MessageFrame(
+    id=OUTBOUND["id"],
+    content=OUTBOUND["content"],
+    sender_id=OUTBOUND["sender_id"],
+    room_id=OUTBOUND["room_id"],
+    timestamp=OUTBOUND["timestamp"]
+)
+OUTBOUND_JSON = codec.encode(OUTBOUND_FRAME)
+
+def json_decode():
+    data = json.loads(INBOUND)
+    # The old handlers validated by hand after parsing
+    if not data.get("room_id") or not data.get("content"):
+        raise ValueError
+
+CASES = {
+    "decode  stdlib json": json_decode,
+    "decode  codec": lambda: codec.decode(INBOUND),
+    "encode  stdlib json": lambda: json.dumps(OUTBOUND),
+    "encode  codec (dict)": lambda: codec.encode(OUTBOUND),
+    "encode  codec (struct)": lambda: codec.encode(OUTBOUND_FRAME),
+    "convert json -> msgpack": lambda: codec.Payload(OUTBOUND_JSON).encoded(codec.MSGPACK),
+}
+
+def main(number: int = 200_000):
+    for name, fn in CASES.items():
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{name:<24} {best / number * 1e9:8.0f} ns/op")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Microbenchmarks for the WebSocket hot paths, against in-memory sockets.
+
+Covers ``ConnectionManager.broadcast_to_room``, ``handle_join_room`` and a
+JSON ``send_message`` frame through the whole inbound pipeline, for rooms
+of a few sizes. "queue" timings stop once every recipient's frame is
+queued; "queue + send" also waits for the writer tasks to hand each frame
+to its socket.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_hotpaths
+    python -m benchmarks.bench_hotpaths 10 100 1000 5000
+"""
+import os
+import sys
+
+# Settings are read on import: keep storage in memory and lift rate limits
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("rate_limits_per_user", '{"*": [1e9, 1e9]}')
+os.environ.setdefault("rate_limits_per_room", "{}")
+
+import asyncio  # noqa: E402
+import contextlib  # noqa: E402
+import io  # noqa: E402
+import logging  # noqa: E402
+import time  # noqa: E402
+
+import app.main  # noqa: E402,F401  (builds the inbound pipeline)
+from app.schemas.websocket import JoinRoom  # noqa: E402
+from app.services.message_service import message_store  # noqa: E402
+from app.websocket import codec  # noqa: E402
+from app.websocket.connection_manager import manager  # noqa: E402
+from app.websocket.events import FrameContext, dispatcher  # noqa: E402
+from app.websocket.handlers.message_handler import JOIN_HISTORY_SIZE, handle_join_room  # noqa: E402
+
+ROOM = "bench"
+# Recipient frames per timed run; larger rooms get fewer operations
+FRAMES = 20_000
+# Operations between drains, so outbound queues never overflow
+BATCH = 100
+SEND_MESSAGE = '{"type": "send_message", "room_id": "bench", "content": "hello there, how is everyone doing today?"}'
+USER_JOINED = {"type": "user_joined", "user_id": "someone", "room_id": ROOM, "timestamp": "2024-01-01T12:00:00"}
+
+class NullSocket:
+    """Accepts and discards frames, like an idle client on a fast link"""
+    
+    sent = 0
+    
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+    
+    async def accept(self, subprotocol=None):
+        pass
+    
+    async def send_text(self, data: str):
+        NullSocket.sent += 1
+    
+    async def send_bytes(self, data: bytes):
+        NullSocket.sent += 1
+    
+    async def close(self, code: int = 1000, reason: str = None):
+        pass
+
+async def drain():
+    """Wait until the writer tasks have sent everything queued"""
+    while any(queue.depth for queue in manager.outbound.values()):
+        await asyncio.sleep(0)
+
+async def measure(op, number: int, include_send: bool = False) -> float:
+    """Seconds per call of ``op``, best of three runs"""
+    best = float("inf")
+    for _ in range(3):
+        elapsed = 0.0
+        for start in range(0, number, BATCH):
+            started = time.perf_counter()
+            for _ in range(min(BATCH, number - start)):
+                await op()
+            if include_send:
+                await drain()
+            elapsed += time.perf_counter() - started
+            if not include_send:
+                await drain()
+        best = min(best, elapsed / number)
+    return best
+
+async def populate(members: int):
+    """Fill the bench room with connected members and recent history"""
+    for i in range(members):
+        user_id = f"member{i}"
+        await manager.connect(NullSocket(), user_id)
+        manager.restore_rooms(user_id, [ROOM])
+    for i in range(JOIN_HISTORY_SIZE):
+        message_store.append(ROOM, i + 1, "member0", f"message {i}")
+    await drain()
+
+async def clear():
+    for user_id in list(manager.active_connections):
+        manager.disconnect(user_id)
+    await asyncio.sleep(0)
+
+async def run(members: int) -> list:
+    await populate(members)
+    
+    async def broadcast():
+        await manager.broadcast_to_room(ROOM, USER_JOINED)
+    
+    joiner = NullSocket()
+    await manager.connect(joiner, "joiner")
+    join = JoinRoom(room_id=ROOM)
+    
+    async def join_room():
+        await handle_join_room(joiner, "joiner", join)
+        # Leave silently so every call is a fresh join
+        manager._discard_member(ROOM, "joiner")
+        manager.user_rooms.pop("joiner", None)
+    
+    tasks = set()
+    
+    async def send_message():
+        await dispatcher.dispatch(FrameContext(joiner, "joiner", codec.JSON, SEND_MESSAGE, tasks))
+    
+    number = max(10, FRAMES // max(members, 1))
+    cases = {
+        "broadcast_to_room (queue)": await measure(broadcast, number),
+        "broadcast_to_room (queue + send)": await measure(broadcast, number, include_send=True),
+        "handle_join_room (queue)": await measure(join_room, number),
+        "send_message JSON pipeline (queue)": await measure(send_message, number),
+        "send_message JSON pipeline (queue + send)": await measure(send_message, number, include_send=True),
+    }
+    await clear()
+    return [
+        f"{members:>6} members  {name:<42} {seconds * 1e6:9.2f} us/op  "
+        f"{seconds * 1e9 / max(members, 1):8.0f} ns/recipient"
+        for name, seconds in cases.items()
+    ]
+
+async def run_all(sizes) -> list:
+    lines = []
+    for members in sizes:
+        lines.extend(await run(members))
+    return lines
+
+def main(sizes=(10, 100, 1000)):
+    logging.getLogger().setLevel(logging.WARNING)
+    # The connection manager prints every connect and disconnect
+    with contextlib.redirect_stdout(io.StringIO()):
+        lines = asyncio.run(run_all(sizes))
+    print("\n".join(lines))
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (10, 100, 1000))
@@ -0,0 +1,111 @@
+"""Memory and lookup cost of InMemoryStorage against its old unindexed layout.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_storage            # 1,000,000 users
+    python -m benchmarks.bench_storage 100000
+"""
+from datetime import datetime
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.core.simple_storage import InMemoryStorage, SimpleUser
+
+ROOMS = 10_000
+LOOKUPS = 1_000
+
+class LegacyUser:
+    """The record layout before __slots__, with a per-instance __dict__"""
+    
+    def __init__(self, id: int, username: str, email: str, hashed_password: str):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.hashed_password = hashed_password
+        self.is_active = True
+        self.is_online = False
+        self.created_at = datetime.utcnow()
+
+class LegacyRoom:
+    def __init__(self, id: int, name: str, is_private: bool):
+        self.id = id
+        self.name = name
+        self.is_private = is_private
+        self.created_at = datetime.utcnow()
+
+class LegacyStorage:
+    """Linear scans, as InMemoryStorage did before it was indexed"""
+    
+    def __init__(self):
+        self.users = {}
+        self.rooms = {}
+    
+    def create_user(self, username: str, email: str, hashed_password: str):
+        user = LegacyUser(len(self.users) + 1, username, email, hashed_password)
+        self.users[user.id] = user
+        return user
+    
+    def create_room(self, name: str, is_private: bool):
+        room = LegacyRoom(len(self.rooms) + 1, name, is_private)
+        self.rooms[room.id] = room
+        return room
+    
+    def get_user_by_username(self, username: str):
+        for user in self.users.values():
+            if user.username == username:
+                return user
+        return None
+    
+    def get_public_rooms(self):
+        return [room for room in self.rooms.values() if not room.is_private]
+
+def populate(storage, users: int) -> float:
+    """Fill a storage and return the MiB it allocated"""
+    gc.collect()
+    tracemalloc.start()
+    for i in range(users):
+        storage.create_user(f"user{i}", f"user{i}@example.com", "x" * 60)
+    for i in range(ROOMS):
+        if isinstance(storage, LegacyStorage):
+            storage.create_room(f"room{i}", i % 4 == 0)
+        else:
+            storage.create_room(f"room{i}", "", 1, i % 4 == 0)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / 2**20
+
+def record_memory(cls, users: int) -> float:
+    """MiB taken by ``users`` bare user records, without any storage around them"""
+    gc.collect()
+    tracemalloc.start()
+    records = [cls(i, f"user{i}", f"user{i}@example.com", "x" * 60) for i in range(users)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size / 2**20
+
+def time_per_call(fn, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls
+
+def run(name: str, storage, record_class, users: int, lookups: int):
+    records = record_memory(record_class, users)
+    memory = populate(storage, users)
+    # Worst case for a scan: the most recently created user
+    username = f"user{users - 1}"
+    lookup = time_per_call(lambda: storage.get_user_by_username(username), lookups)
+    public = time_per_call(storage.get_public_rooms, 100)
+    print(f"{name:<8} records {records:7.1f} MiB   storage {memory:7.1f} MiB   "
+          f"username lookup {lookup * 1e6:10.2f} us   public rooms {public * 1e6:8.1f} us")
+
+def main(users: int = 1_000_000):
+    # A full scan of 1M users takes tens of milliseconds; keep the legacy run short
+    run("legacy", LegacyStorage(), LegacyUser, users, lookups=max(1, LOOKUPS * 1000 // users))
+    run("indexed", InMemoryStorage(), SimpleUser, users, lookups=LOOKUPS * 100)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
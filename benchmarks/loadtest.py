@@ -0,0 +1,308 @@
+"""WebSocket load test: N clients across M rooms, end to end.
+
+Every client joins one room, sends chat messages at ``--rate`` per second
+(with optional typing noise) and reads everything the server pushes. The
+report gives delivery latency percentiles, messages/sec and server RSS.
+
+Run from the repository root::
+
+    python -m benchmarks.loadtest                      # server in this process
+    python -m benchmarks.loadtest --spawn              # server in a local uvicorn
+    python -m benchmarks.loadtest --url ws://127.0.0.1:8000 --pid 12345
+    python -m benchmarks.loadtest --clients 500 --rooms 25 --rate 0.5 --typing 2 --duration 30
+
+Inbound rate limits are lifted for in-process and spawned servers unless
+``--keep-limits`` is given; a server passed with ``--url`` keeps its own.
+The clients mint tokens with this process's SECRET_KEY.
+"""
+from contextlib import redirect_stdout
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import io
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import msgspec
+import websockets
+
+# Rate limits that never trigger, so the run measures the server rather than the limiter
+UNLIMITED = {
+    "rate_limits_per_user": '{"*": [1e9, 1e9]}',
+    "rate_limits_per_room": "{}",
+}
+
+class Stats:
+    def __init__(self, clients: int):
+        self.clients = clients
+        self.joined = 0
+        self.all_joined = asyncio.Event()
+        self.measuring = False
+        self.measured_from = float("inf")
+        # message content -> perf_counter() when it was sent
+        self.sent_at: Dict[str, float] = {}
+        self.sent = 0
+        self.delivered = 0
+        self.expected = 0
+        self.latencies: List[float] = []
+        self.errors: Dict[str, int] = {}
+        self.failed_clients = 0
+    
+    def mark_joined(self):
+        self.joined += 1
+        if self.joined == self.clients:
+            self.all_joined.set()
+
+class Client:
+    def __init__(self, index: int, room_id: str, room_size: int, args, stats: Stats):
+        self.user_id = f"load{index}"
+        self.room_id = room_id
+        self.room_size = room_size
+        self.args = args
+        self.stats = stats
+        self.msgpack = args.format == "msgpack"
+        self.seq = 0
+    
+    def _encode(self, frame: dict):
+        return msgspec.msgpack.encode(frame) if self.msgpack else msgspec.json.encode(frame).decode()
+    
+    def _decode(self, data):
+        if isinstance(data, str):
+            return msgspec.json.decode(data)
+        return msgspec.msgpack.decode(data)
+    
+    async def run(self, url: str, stop: asyncio.Event, connecting: asyncio.Semaphore):
+        from app.core.security import create_access_token
+        
+        token = create_access_token({"sub": self.user_id})
+        subprotocols = ["chat.msgpack"] if self.msgpack else None
+        try:
+            async with connecting:
+                ws = await websockets.connect(
+                    f"{url}/ws/{self.user_id}?token={token}", subprotocols=subprotocols, max_size=None
+                )
+            try:
+                await ws.send(self._encode({"type": "join_room", "room_id": self.room_id}))
+                while self._decode(await ws.recv()).get("type") != "room_joined":
+                    pass
+                self.stats.mark_joined()
+                await self.stats.all_joined.wait()
+                
+                tasks = [asyncio.create_task(self._send_messages(ws, stop))]
+                if self.args.typing > 0:
+                    tasks.append(asyncio.create_task(self._send_typing(ws, stop)))
+                receiver = asyncio.create_task(self._receive(ws))
+                await asyncio.gather(*tasks)
+                # Give the last messages time to arrive
+                await asyncio.sleep(self.args.drain)
+                receiver.cancel()
+            finally:
+                await ws.close()
+        except Exception as e:
+            self.stats.failed_clients += 1
+            if self.stats.failed_clients <= 3:
+                print(f"client {self.user_id} failed: {e!r}", file=sys.stderr)
+    
+    async def _send_messages(self, ws, stop: asyncio.Event):
+        interval = 1 / self.args.rate
+        # Spread the clients' send times over the first interval
+        await asyncio.sleep(random.uniform(0, interval))
+        while not stop.is_set():
+            self.seq += 1
+            content = f"{self.user_id}:{self.seq}"
+            self.stats.sent_at[content] = time.perf_counter()
+            if self.stats.measuring:
+                self.stats.sent += 1
+                self.stats.expected += self.room_size
+            await ws.send(self._encode({"type": "send_message", "room_id": self.room_id, "content": content}))
+            await asyncio.sleep(interval)
+    
+    async def _send_typing(self, ws, stop: asyncio.Event):
+        interval = 1 / self.args.typing
+        await asyncio.sleep(random.uniform(0, interval))
+        while not stop.is_set():
+            await ws.send(self._encode({"type": "typing", "room_id": self.room_id, "is_typing": True}))
+            await asyncio.sleep(interval)
+    
+    async def _receive(self, ws):
+        stats = self.stats
+        async for data in ws:
+            frame = self._decode(data)
+            kind = frame.get("type")
+            if kind == "message":
+                sent_at = stats.sent_at.get(frame["content"])
+                if sent_at is not None and sent_at >= stats.measured_from:
+                    stats.delivered += 1
+                    stats.latencies.append(time.perf_counter() - sent_at)
+            elif kind == "error":
+                code = frame.get("code") or "other"
+                stats.errors[code] = stats.errors.get(code, 0) + 1
+            elif kind == "ping":
+                await ws.send(self._encode({"type": "pong"}))
+
+def rss_mib(pid: int) -> Optional[float]:
+    """Resident set size of a process, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def run_clients(url: str, args, server_pid: Optional[int]) -> dict:
+    stats = Stats(args.clients)
+    stop = asyncio.Event()
+    rooms = [f"load-room-{i}" for i in range(args.rooms)]
+    sizes = [len(range(i, args.clients, args.rooms)) for i in range(args.rooms)]
+    clients = [Client(i, rooms[i % args.rooms], sizes[i % args.rooms], args, stats) for i in range(args.clients)]
+    
+    connecting = asyncio.Semaphore(args.connect_concurrency)
+    started = time.perf_counter()
+    runs = asyncio.gather(*(client.run(url, stop, connecting) for client in clients))
+    try:
+        await asyncio.wait_for(stats.all_joined.wait(), args.connect_timeout)
+    except asyncio.TimeoutError:
+        print(f"only {stats.joined}/{args.clients} clients joined", file=sys.stderr)
+        stats.all_joined.set()
+    connect_seconds = time.perf_counter() - started
+    
+    await asyncio.sleep(args.warmup)
+    stats.measuring = True
+    stats.measured_from = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    window = time.perf_counter() - stats.measured_from
+    rss = rss_mib(server_pid) if server_pid else None
+    await runs
+    
+    latencies = sorted(stats.latencies)
+    return {
+        "clients": args.clients,
+        "rooms": args.rooms,
+        "joined": stats.joined,
+        "failed_clients": stats.failed_clients,
+        "connect_seconds": connect_seconds,
+        "window": window,
+        "sent": stats.sent,
+        "delivered": stats.delivered,
+        "expected": stats.expected,
+        "latencies": latencies,
+        "errors": stats.errors,
+        "rss_mib": rss
+    }
+
+def report(result: dict, mode: str):
+    latencies = result["latencies"]
+    window = result["window"]
+    print(f"mode            {mode}")
+    print(f"clients         {result['joined']}/{result['clients']} joined across {result['rooms']} rooms "
+          f"in {result['connect_seconds']:.2f}s ({result['failed_clients']} failed)")
+    print(f"sent            {result['sent']} messages, {result['sent'] / window:.1f}/s")
+    print(f"delivered       {result['delivered']} of {result['expected']} expected, "
+          f"{result['delivered'] / window:.1f}/s")
+    if latencies:
+        print("latency ms      " + "  ".join(
+            f"p{int(p * 100)} {percentile(latencies, p) * 1000:.2f}" for p in (0.5, 0.9, 0.99)
+        ) + f"  max {latencies[-1] * 1000:.2f}")
+    if result["errors"]:
+        print(f"error frames    {result['errors']}")
+    rss = result["rss_mib"]
+    print(f"server RSS      {f'{rss:.1f} MiB' if rss is not None else 'unknown'}")
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _server_env(args) -> dict:
+    env = {"STORAGE_BACKEND": args.storage}
+    if args.storage == "sql":
+        env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    if not args.keep_limits:
+        env.update(UNLIMITED)
+    return env
+
+async def in_process(args) -> dict:
+    # Settings are read on import, so the environment goes first
+    os.environ.update(_server_env(args))
+    import uvicorn
+    from app.main import app
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    # The connection manager prints every connect and disconnect
+    with redirect_stdout(io.StringIO()):
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        try:
+            return await run_clients(f"ws://127.0.0.1:{port}", args, os.getpid())
+        finally:
+            server.should_exit = True
+            await serving
+
+async def spawned(args) -> dict:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ, **_server_env(args)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.time() + 15
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError("uvicorn did not start")
+                await asyncio.sleep(0.1)
+        return await run_clients(f"ws://127.0.0.1:{port}", args, process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1.0, help="messages per client per second")
+    parser.add_argument("--typing", type=float, default=0.0, help="typing frames per client per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of traffic before measuring")
+    parser.add_argument("--drain", type=float, default=1.0, help="seconds to wait for late deliveries")
+    parser.add_argument("--format", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--storage", choices=["memory", "sql"], default="memory")
+    parser.add_argument("--keep-limits", action="store_true", help="keep the configured inbound rate limits")
+    parser.add_argument("--connect-concurrency", type=int, default=50)
+    parser.add_argument("--connect-timeout", type=float, default=60.0)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--spawn", action="store_true", help="run the server in a local uvicorn process")
+    target.add_argument("--url", help="base ws:// URL of a running server")
+    parser.add_argument("--pid", type=int, help="server process id, for RSS with --url")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.url:
+        result, mode = asyncio.run(run_clients(args.url.rstrip("/"), args, args.pid)), f"remote {args.url}"
+    elif args.spawn:
+        result, mode = asyncio.run(spawned(args)), "spawned uvicorn"
+    else:
+        result, mode = asyncio.run(in_process(args)), "in-process (RSS includes the clients)"
+    report(result, mode)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Initial schema: users, rooms, room memberships and messages
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0000"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _base_columns():
+    return [
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    ]
+
+def upgrade():
+    op.create_table(
+        "users",
+        *_base_columns(),
+        sa.Column("username", sa.String(50), nullable=False),
+        sa.Column("email", sa.String(100), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_online", sa.Boolean()),
+        sa.Column("last_seen", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    
+    op.create_table(
+        "rooms",
+        *_base_columns(),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("description", sa.String(500)),
+        sa.Column("is_private", sa.Boolean()),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id")),
+    )
+    op.create_index("ix_rooms_id", "rooms", ["id"])
+    
+    op.create_table(
+        "room_members",
+        *_base_columns(),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("room_id", sa.Integer(), sa.ForeignKey("rooms.id"), nullable=False),
+        sa.Column("role", sa.Enum("MEMBER", "ADMIN", "OWNER", name="memberrole")),
+        sa.Column("joined_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_room_members_id", "room_members", ["id"])
+    
+    op.create_table(
+        "messages",
+        *_base_columns(),
+        sa.Column("content", sa.String(1000), nullable=False),
+        sa.Column("message_type", sa.Enum("TEXT", "IMAGE", "FILE", "SYSTEM", name="messagetype")),
+        sa.Column("sender_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("room_id", sa.Integer(), sa.ForeignKey("rooms.id"), nullable=False),
+    )
+    op.create_index("ix_messages_id", "messages", ["id"])
+
+def downgrade():
+    for table in ("messages", "room_members", "rooms", "users"):
+        op.drop_table(table)
+    sa.Enum(name="messagetype").drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name="memberrole").drop(op.get_bind(), checkfirst=True)
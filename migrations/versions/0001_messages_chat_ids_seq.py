@@ -0,0 +1,64 @@
+"""Key messages by chat identifiers and number them per room
+
+Messages now carry the sender's username and the room slug used on the
+WebSocket instead of foreign keys to users and rooms, plus the per-room
+sequence number clients see as the message id.
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = "0000"
+branch_labels = None
+depends_on = None
+
+# Same derivation the chat API uses for room slugs
+SLUG = "lower(replace(rooms.name, ' ', '_'))"
+
+def upgrade():
+    with op.batch_alter_table("messages") as batch:
+        batch.add_column(sa.Column("sender", sa.String(50)))
+        batch.add_column(sa.Column("room", sa.String(100)))
+        batch.add_column(sa.Column("seq", sa.Integer()))
+    op.execute(
+        "UPDATE messages SET "
+        "sender = COALESCE((SELECT username FROM users WHERE users.id = messages.sender_id), "
+        "CAST(sender_id AS VARCHAR(50))), "
+        f"room = COALESCE((SELECT {SLUG} FROM rooms WHERE rooms.id = messages.room_id), "
+        "CAST(room_id AS VARCHAR(100)))"
+    )
+    # Existing messages are numbered in insertion order within each room
+    op.execute(
+        "UPDATE messages SET seq = (SELECT COUNT(*) FROM messages AS earlier "
+        "WHERE earlier.room_id = messages.room_id AND earlier.id <= messages.id)"
+    )
+    with op.batch_alter_table("messages") as batch:
+        batch.drop_column("sender_id")
+        batch.drop_column("room_id")
+        batch.alter_column("sender", new_column_name="sender_id", existing_type=sa.String(50), nullable=False)
+        batch.alter_column("room", new_column_name="room_id", existing_type=sa.String(100), nullable=False)
+        batch.alter_column("seq", existing_type=sa.Integer(), nullable=False)
+
+def downgrade():
+    with op.batch_alter_table("messages") as batch:
+        batch.add_column(sa.Column("sender", sa.Integer()))
+        batch.add_column(sa.Column("room", sa.Integer()))
+    # Messages of users or rooms that no longer resolve cannot be kept
+    op.execute(
+        "UPDATE messages SET "
+        "sender = (SELECT id FROM users WHERE users.username = messages.sender_id), "
+        f"room = (SELECT id FROM rooms WHERE {SLUG} = messages.room_id)"
+    )
+    op.execute("DELETE FROM messages WHERE sender IS NULL OR room IS NULL")
+    with op.batch_alter_table("messages") as batch:
+        batch.drop_column("seq")
+        batch.drop_column("sender_id")
+        batch.drop_column("room_id")
+        batch.alter_column("sender", new_column_name="sender_id", existing_type=sa.Integer(), nullable=False)
+        batch.alter_column("room", new_column_name="room_id", existing_type=sa.Integer(), nullable=False)
+        batch.create_foreign_key("fk_messages_sender_id_users", "users", ["sender_id"], ["id"])
+        batch.create_foreign_key("fk_messages_room_id_rooms", "rooms", ["room_id"], ["id"])
@@ -0,0 +1,18 @@
+"""Add (room_id, seq) index for message history pagination
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index("ix_messages_room_id_seq", "messages", ["room_id", "seq"])
+
+def downgrade():
+    op.drop_index("ix_messages_room_id_seq", table_name="messages")
@@ -0,0 +1,26 @@
+"""Add rooms.slug, the room id used on the WebSocket
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("rooms", sa.Column("slug", sa.String(100)))
+    # Same derivation the chat API uses for new rooms
+    op.execute("UPDATE rooms SET slug = lower(replace(name, ' ', '_'))")
+    with op.batch_alter_table("rooms") as batch:
+        batch.alter_column("slug", existing_type=sa.String(100), nullable=False)
+    op.create_index("ix_rooms_slug", "rooms", ["slug"], unique=True)
+
+def downgrade():
+    op.drop_index("ix_rooms_slug", table_name="rooms")
+    with op.batch_alter_table("rooms") as batch:
+        batch.drop_column("slug")
@@ -0,0 +1,23 @@
+"""Make room memberships unique per (user_id, room_id)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Keep the oldest row of any duplicated membership
+    op.execute(
+        "DELETE FROM room_members WHERE id NOT IN "
+        "(SELECT MIN(id) FROM room_members GROUP BY user_id, room_id)"
+    )
+    op.create_index("ix_room_members_user_id_room_id", "room_members", ["user_id", "room_id"], unique=True)
+
+def downgrade():
+    op.drop_index("ix_room_members_user_id_room_id", table_name="room_members")
@@ -0,0 +1,37 @@
+"""Make message sequence numbers unique per room
+
+Workers used to number messages independently, so a room may hold several
+messages with the same seq. All but the first of each are renumbered after
+the room's highest seq before the index becomes unique.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    connection = op.get_bind()
+    duplicates = connection.execute(sa.text(
+        "SELECT id, room_id FROM messages WHERE id NOT IN "
+        "(SELECT MIN(id) FROM messages GROUP BY room_id, seq) ORDER BY id"
+    )).all()
+    last_seq = dict(connection.execute(sa.text("SELECT room_id, MAX(seq) FROM messages GROUP BY room_id")).all())
+    for message_id, room_id in duplicates:
+        last_seq[room_id] += 1
+        connection.execute(
+            sa.text("UPDATE messages SET seq = :seq WHERE id = :id"),
+            {"seq": last_seq[room_id], "id": message_id}
+        )
+    op.drop_index("ix_messages_room_id_seq", table_name="messages")
+    op.create_index("ix_messages_room_id_seq", "messages", ["room_id", "seq"], unique=True)
+
+def downgrade():
+    op.drop_index("ix_messages_room_id_seq", table_name="messages")
+    op.create_index("ix_messages_room_id_seq", "messages", ["room_id", "seq"])
@@ -6,4 +6,11 @@ sys.path.insert(0, os.getcwd())
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=False)
+    from app.config import get_settings
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=False,
+        ws_per_message_deflate=get_settings().ws_per_message_deflate
+    )
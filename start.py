@@ -2,7 +2,9 @@
 import os
 import uvicorn
 
+from app.config import get_settings
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     print(f"Starting server on port {port}")
-    uvicorn.run("app.main:app", host="0.0.0.0", port=port)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=port, ws_per_message_deflate=get_settings().ws_per_message_deflate)
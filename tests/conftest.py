@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import json
+import threading
+
+import pytest
+
+from app.core.resp import read_reply
+from app.repositories import MemoryRepository
+
+
+class FakeSocket:
+    """Stands in for a WebSocket; records decoded frames and the close code in order"""
+
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.events = []
+
+    @property
+    def frames(self):
+        return [event for event in self.events if isinstance(event, dict)]
+
+    @property
+    def close_code(self):
+        codes = [event for event in self.events if isinstance(event, int)]
+        return codes[-1] if codes else None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, data: str):
+        self.events.append(json.loads(data))
+
+    async def close(self, code: int = 1000, reason: str = None):
+        self.events.append(code)
+
+
+class CountingRepository(MemoryRepository):
+    """In-memory repository recording the bulk calls made to it"""
+
+    def __init__(self):
+        super().__init__()
+        self.loads = []
+        self.presence_writes = []
+
+    async def load_memberships(self, user_ids):
+        self.loads.append(list(user_ids))
+        return await super().load_memberships(user_ids)
+
+    async def update_presence(self, presence):
+        self.presence_writes.append(dict(presence))
+        await super().update_presence(presence)
+
+
+class RedisStandIn:
+    """Minimal Redis server for tests: pub/sub, plus GET, SET (with NX) and INCR.
+
+    Commands named in ``errors`` get an error reply; while ``stalled`` is
+    set, commands are read and never answered. EVAL runs the Python stand-in
+    registered for the script source in ``scripts`` as ``function(keys, args)``;
+    EVALSHA only finds scripts already sent with EVAL.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.values = {}
+        self.scripts = {}
+        self.loaded = {}
+        self.errors = set()
+        self.stalled = False
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}"
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self._server = self.loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _shutdown(self):
+        """Close the listener and the connections clients left open"""
+        self._server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+
+    async def _handle(self, reader, writer):
+        channels = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                name, args = command[0].upper(), [arg.decode() for arg in command[1:]]
+                if self.stalled:
+                    continue
+                if name.decode() in self.errors:
+                    writer.write(f"-ERR {name.decode()} refused\r\n".encode())
+                elif name == b"SUBSCRIBE":
+                    for channel in args:
+                        channels.add(channel)
+                        self.subscribers.setdefault(channel, set()).add(writer)
+                        writer.write(_bulk_array(b"subscribe", channel.encode(), len(channels)))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in args:
+                        channels.discard(channel)
+                        self.subscribers.get(channel, set()).discard(writer)
+                        writer.write(_bulk_array(b"unsubscribe", channel.encode(), len(channels)))
+                elif name == b"GET":
+                    value = self.values.get(args[0])
+                    writer.write(b"$-1\r\n" if value is None else f"${len(value)}\r\n{value}\r\n".encode())
+                elif name == b"SET":
+                    if "NX" in args[2:] and args[0] in self.values:
+                        writer.write(b"$-1\r\n")
+                    else:
+                        self.values[args[0]] = args[1]
+                        writer.write(b"+OK\r\n")
+                elif name == b"INCR":
+                    value = self.values[args[0]] = str(int(self.values.get(args[0], 0)) + 1)
+                    writer.write(f":{value}\r\n".encode())
+                elif name in (b"EVAL", b"EVALSHA"):
+                    if name == b"EVAL":
+                        script = self.loaded[hashlib.sha1(command[1]).hexdigest()] = args[0]
+                    else:
+                        script = self.loaded.get(args[0])
+                    if script is None:
+                        writer.write(b"-NOSCRIPT No matching script\r\n")
+                    else:
+                        keys = args[2:2 + int(args[1])]
+                        writer.write(f":{self.scripts[script](keys, args[2 + len(keys):])}\r\n".encode())
+                elif name == b"PUBLISH":
+                    receivers = self.subscribers.get(args[0], set())
+                    for receiver in receivers:
+                        receiver.write(_bulk_array(b"message", command[1], command[2]))
+                    writer.write(f":{len(receivers)}\r\n".encode())
+                else:
+                    writer.write(b"+OK\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers.get(channel, set()).discard(writer)
+            writer.close()
+
+
+def _bulk_array(*items) -> bytes:
+    parts = [f"*{len(items)}\r\n".encode()]
+    for item in items:
+        if isinstance(item, int):
+            parts.append(f":{item}\r\n".encode())
+        else:
+            parts.append(f"${len(item)}\r\n".encode() + item + b"\r\n")
+    return b"".join(parts)
+
+
+@pytest.fixture
+def redis_stand_in():
+    server = RedisStandIn()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_socket():
+    return FakeSocket
+
+
+@pytest.fixture
+def counting_repository():
+    return CountingRepository()
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from passlib.context import CryptContext
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app import main
+from app.core.security import PasswordHasher, VerifiedTokenCache, create_access_token
+from app.repositories import MemoryRepository
+from app.websocket import auth
+from app.websocket.auth import POLICY_VIOLATION, TOKEN_EXPIRED
+from app.websocket.connection_manager import ConnectionManager
+
+# Cheaper than production rounds so the test stays quick, still real bcrypt work
+TEST_CONTEXT = CryptContext(schemes=["bcrypt"], bcrypt__rounds=8)
+LOGINS = 100
+
+
+async def _measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - started - interval)
+    return worst
+
+
+async def _login_storm(hasher: PasswordHasher, monkeypatch):
+    repository = MemoryRepository()
+    await repository.create_user("loadtest", "loadtest@example.com", TEST_CONTEXT.hash("secret"))
+    monkeypatch.setattr(main, "password_hasher", hasher)
+    monkeypatch.setattr(main, "repository", repository)
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(_measure_loop_lag(stop))
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/auth/login", params={"username": "loadtest", "password": "secret"})
+            for _ in range(LOGINS)
+        ))
+        elapsed = time.perf_counter() - started
+    stop.set()
+    return responses, await lag, elapsed
+
+
+@pytest.mark.asyncio
+async def test_event_loop_stays_responsive_during_login_storm(monkeypatch):
+    hasher = PasswordHasher(workers=2, max_pending=LOGINS)
+    responses, worst_lag, elapsed = await _login_storm(hasher, monkeypatch)
+
+    assert all(r.status_code == 200 and "token" in r.json() for r in responses)
+    assert hasher.completed == LOGINS
+    # Hashing inline would stall the loop for about the whole storm; on the
+    # pool the loop only ever waits on request handling itself
+    assert worst_lag < elapsed / 4
+
+
+@pytest.mark.asyncio
+async def test_saturated_hasher_rejects_fast_with_503(monkeypatch):
+    hasher = PasswordHasher(workers=1, max_pending=4)
+    responses, _, _ = await _login_storm(hasher, monkeypatch)
+
+    statuses = [r.status_code for r in responses]
+    assert statuses.count(200) >= 4
+    assert statuses.count(200) + statuses.count(503) == LOGINS
+    assert hasher.rejected == statuses.count(503) > 0
+    assert all(r.headers["retry-after"] == "1" for r in responses if r.status_code == 503)
+
+
+def _handshake(token: str = None, headers: dict = None) -> WebSocket:
+    query = f"token={token}" if token else ""
+    scope = {
+        "type": "websocket",
+        "path": "/ws/alice",
+        "query_string": query.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    }
+    return WebSocket(scope, receive=None, send=None)
+
+
+@pytest.mark.parametrize("url", [
+    "/ws/alice",
+    "/ws/alice?token=not-a-jwt",
+    f"/ws/alice?token={create_access_token({'sub': 'bob'})}"
+], ids=["missing", "invalid", "other-user"])
+def test_rejected_handshakes_close_with_policy_violation(url):
+    client = TestClient(main.app)
+
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(url):
+            pass
+
+    assert closed.value.code == POLICY_VIOLATION
+
+
+def test_repeat_handshakes_reuse_verified_tokens(monkeypatch):
+    cache = VerifiedTokenCache(max_size=10, ttl=60)
+    monkeypatch.setattr(auth, "token_cache", cache)
+    token = create_access_token({"sub": "alice"})
+
+    first = auth.authenticate(_handshake(token), "alice")
+    # Reconnecting with the same token in a header skips verification
+    second = auth.authenticate(_handshake(headers={"Authorization": f"Bearer {token}"}), "alice")
+
+    assert first == second and first["sub"] == "alice"
+    assert auth.authenticate(_handshake(token), "bob") is None
+    assert auth.authenticate(_handshake("not-a-jwt"), "alice") is None
+    # Failed verifications are not cached
+    assert cache.get_stats() == {"size": 1, "hits": 2, "misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_socket_is_closed_when_its_token_expires(make_socket):
+    manager = ConnectionManager()
+    expiring, lasting = make_socket(), make_socket()
+    await manager.connect(expiring, "alice", expires_at=time.time() + 0.05)
+    await manager.connect(lasting, "alice", expires_at=time.time() + 3600)
+
+    await asyncio.sleep(0.1)
+
+    assert expiring.close_code == TOKEN_EXPIRED
+    assert lasting.close_code is None
+    assert manager.active_connections == {"alice": {lasting}}
+    assert manager.expired_sockets == 1
+    manager.disconnect("alice")
+    assert not manager.expiry_timers
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from app.websocket.backplane import Backplane, RedisBackplane
+
+
+def test_backplane_requires_publish():
+    class Silent(Backplane):
+        pass
+
+    with pytest.raises(TypeError):
+        Silent()
+
+
+@pytest.mark.asyncio
+async def test_publish_survives_error_replies_and_stalls(redis_stand_in):
+    backplane = RedisBackplane(redis_stand_in.url, timeout=0.1)
+    await backplane.publish("general", '{"type":"message"}')
+    assert backplane.publish_failures == 0
+
+    redis_stand_in.errors.add("PUBLISH")
+    await backplane.publish("general", '{"type":"message"}')
+    assert backplane.publish_failures == 1
+
+    redis_stand_in.errors.clear()
+    redis_stand_in.stalled = True
+    await asyncio.wait_for(
+        asyncio.gather(*(backplane.publish("general", '{"type":"message"}') for _ in range(8))), 1
+    )
+    assert backplane.publish_failures == 9
+
+    redis_stand_in.stalled = False
+    await backplane.publish("general", '{"type":"message"}')
+    assert backplane.publish_failures == 9
+    await backplane.stop()
+
+
+@pytest.mark.asyncio
+async def test_publish_fails_fast_when_redis_is_down():
+    backplane = RedisBackplane("redis://127.0.0.1:1", timeout=0.1)
+    await backplane.publish("general", '{"type":"message"}')
+    assert backplane.publish_failures == 1
+    await backplane.stop()
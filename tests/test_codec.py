@@ -0,0 +1,149 @@
+import asyncio
+import json
+import re
+import zlib
+
+import msgspec
+import pytest
+
+from app.schemas.websocket import JoinRoom, MessageFrame, RoomJoined, SendMessage, Typing
+from app.websocket import codec
+from app.websocket.codec import FrameError, Payload
+from app.websocket.connection_manager import ConnectionManager
+
+
+def test_json_frames_decode_to_typed_structs():
+    assert codec.decode('{"type": "send_message", "room_id": "general", "content": "hi"}') == SendMessage(
+        room_id="general", content="hi"
+    )
+    assert codec.decode(b'{"type": "join_room", "room_id": "random"}') == JoinRoom(room_id="random")
+    # Defaults fill in missing optional fields
+    assert codec.decode('{"type": "typing", "room_id": "general"}') == Typing(room_id="general", is_typing=False)
+
+
+@pytest.mark.parametrize("data, error", [
+    ('{"type": "shout", "room_id": "general"}', "Unknown message type: shout"),
+    ('{"type": "send_message", "room_id": "general"}', "missing required field `content`"),
+    ('{"type": "send_message", "room_id": "", "content": "hi"}', "`$.room_id`"),
+    ('{"type": "send_message", "room_id": "general", "content": ""}', "`$.content`"),
+    ('{"type": "join_room", "room_id": 5}', "Expected `str`, got `int`"),
+    ("{not json", "Invalid JSON"),
+])
+def test_invalid_frames_raise_frame_errors(data, error):
+    with pytest.raises(FrameError, match=re.escape(error)):
+        codec.decode(data)
+
+
+def test_content_longer_than_its_column_is_rejected():
+    frame = {"type": "send_message", "room_id": "general"}
+
+    assert codec.decode(json.dumps({**frame, "content": "x" * 1000})).content == "x" * 1000
+    with pytest.raises(FrameError, match="length <= 1000"):
+        codec.decode(json.dumps({**frame, "content": "x" * 1001}))
+    with pytest.raises(FrameError, match="length <= 100"):
+        codec.decode(json.dumps({"type": "join_room", "room_id": "r" * 101}))
+
+
+def test_outbound_frames_round_trip_through_json():
+    message = MessageFrame(id=7, content="hi", sender_id="alice", room_id="general", timestamp="2026-01-01T00:00:00")
+    encoded = codec.encode(message)
+
+    assert json.loads(encoded) == {
+        "type": "message", "id": 7, "content": "hi", "sender_id": "alice",
+        "room_id": "general", "timestamp": "2026-01-01T00:00:00"
+    }
+    assert msgspec.json.decode(encoded, type=MessageFrame) == message
+    assert codec.frame_type(message) == "message"
+    assert codec.frame_type({"type": "pong"}) == "pong"
+    # Pre-encoded messages are embedded as they are, not re-serialized
+    joined = json.loads(codec.encode(RoomJoined(room_id="general", recent_messages=[msgspec.Raw(encoded)])))
+    assert joined["recent_messages"] == [json.loads(encoded)]
+
+
+def test_error_frames_omit_an_unset_code():
+    assert json.loads(codec.error_frame("nope")) == {"type": "error", "message": "nope"}
+    assert json.loads(codec.error_frame("slow down", "rate_limited"))["code"] == "rate_limited"
+    assert Payload(codec.error_frame("nope")).encoded(codec.JSON) == '{"type":"error","message":"nope"}'
+
+
+@pytest.mark.parametrize("offered, chosen", [
+    ([], None),
+    (["graphql-ws"], None),
+    (["graphql-ws", codec.MSGPACK], codec.MSGPACK),
+    ([codec.MSGPACK_DEFLATE, codec.JSON], codec.MSGPACK_DEFLATE),
+    ([codec.JSON, codec.MSGPACK], codec.JSON),
+])
+def test_first_offered_known_subprotocol_is_chosen(offered, chosen):
+    assert codec.negotiate(offered) == chosen
+
+
+@pytest.mark.parametrize("fmt", [codec.MSGPACK, codec.MSGPACK_DEFLATE])
+def test_messagepack_frames_round_trip(fmt):
+    message = {"type": "send_message", "room_id": "general", "content": "hi " * 300}
+    data = Payload(json.dumps(message)).encoded(fmt)
+
+    assert isinstance(data, bytes)
+    if fmt == codec.MSGPACK_DEFLATE:
+        assert data[:1] == codec.DEFLATED
+    assert codec.decode(data, fmt) == SendMessage(room_id="general", content=message["content"])
+    # Text frames stay JSON whatever the connection negotiated
+    assert codec.decode(json.dumps(message), fmt) == codec.decode(data, fmt)
+
+
+def test_only_large_payloads_are_deflated():
+    small = Payload(codec.encode({"type": "pong"})).encoded(codec.MSGPACK_DEFLATE)
+    large_frame = {"type": "message", "content": "a" * 2000}
+    large = Payload(codec.encode(large_frame)).encoded(codec.MSGPACK_DEFLATE)
+
+    assert small[:1] == codec.PLAIN and msgspec.msgpack.decode(small[1:]) == {"type": "pong"}
+    assert large[:1] == codec.DEFLATED and len(large) < 200
+    assert msgspec.msgpack.decode(zlib.decompress(large[1:], -zlib.MAX_WBITS)) == large_frame
+
+
+def test_payload_converts_each_format_once():
+    payload = Payload(codec.encode({"type": "pong"}))
+
+    assert payload.encoded(codec.MSGPACK) is payload.encoded(codec.MSGPACK)
+    assert payload.encoded(codec.JSON) == payload.text == '{"type":"pong"}'
+    with pytest.raises(ValueError):
+        payload.encoded("chat.xml")
+
+
+@pytest.mark.parametrize("data, error", [
+    (b"\x02" + msgspec.msgpack.encode({"type": "pong"}), "Invalid frame flag"),
+    (codec.DEFLATED + b"not deflate", "Invalid compressed frame"),
+    (codec.PLAIN + b"\xc1", "Invalid MessagePack"),
+])
+def test_corrupt_binary_frames_raise_frame_errors(data, error):
+    with pytest.raises(FrameError, match=error):
+        codec.decode(data, codec.MSGPACK_DEFLATE)
+
+
+@pytest.mark.asyncio
+async def test_connection_sends_binary_frames_in_the_negotiated_format(make_socket):
+    class BinarySocket(make_socket):
+        def __init__(self, subprotocols):
+            super().__init__()
+            self.scope["subprotocols"] = subprotocols
+            self.subprotocol = None
+
+        async def accept(self, subprotocol=None):
+            self.subprotocol = subprotocol
+
+        async def send_bytes(self, data: bytes):
+            self.events.append(msgspec.msgpack.decode(data))
+
+    manager = ConnectionManager()
+    binary, text = BinarySocket(["graphql-ws", codec.MSGPACK]), BinarySocket([])
+    assert await manager.connect(binary, "alice") == codec.MSGPACK
+    assert await manager.connect(text, "bob") == codec.JSON
+    for user_id in ("alice", "bob"):
+        manager.restore_rooms(user_id, ["general"])
+
+    await manager.broadcast_to_room("general", {"type": "message", "content": "hi"})
+    await asyncio.sleep(0.01)
+
+    assert binary.subprotocol == codec.MSGPACK and text.subprotocol is None
+    assert binary.frames == text.frames == [{"type": "message", "content": "hi"}]
+    manager.disconnect("alice")
+    manager.disconnect("bob")
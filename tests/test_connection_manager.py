@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.outbound import DISCONNECT
+
+
+def _assert_indexes_agree(manager):
+    """room_connections and user_rooms describe the same memberships, of connected users only"""
+    by_room = {(room_id, user_id) for room_id, users in manager.room_connections.items() for user_id in users}
+    by_user = {(room_id, user_id) for user_id, rooms in manager.user_rooms.items() for room_id in rooms}
+    assert by_room == by_user
+    assert all(users for users in manager.room_connections.values())
+    assert all(rooms for rooms in manager.user_rooms.values())
+    assert {user_id for _, user_id in by_room} <= set(manager.active_connections)
+    assert set(manager.room_connections) == manager.backplane.rooms
+
+
+@pytest.mark.asyncio
+async def test_join_and_leave_keep_both_indexes_in_step(make_socket):
+    manager = ConnectionManager()
+    alice, bob = make_socket(), make_socket()
+    await manager.connect(alice, "alice")
+    await manager.connect(bob, "bob")
+
+    await manager.join_room("alice", "general")
+    await manager.join_room("bob", "general")
+    await manager.join_room("alice", "random")
+    _assert_indexes_agree(manager)
+    assert manager.get_room_users("general") == {"alice", "bob"}
+    assert manager.get_user_rooms("alice") == {"general", "random"}
+
+    await manager.leave_room("alice", "random")
+    await manager.leave_room("alice", "random")
+    await manager.leave_room("bob", "general")
+    _assert_indexes_agree(manager)
+    assert manager.room_connections == {"general": {"alice"}}
+    assert manager.user_rooms == {"alice": {"general"}}
+    await asyncio.sleep(0.01)
+
+    # Members hear about each other, never about themselves
+    assert [frame["user_id"] for frame in alice.frames] == ["bob", "bob"]
+    assert [frame["type"] for frame in alice.frames] == ["user_joined", "user_left"]
+    assert not bob.frames
+    manager.disconnect("alice")
+    manager.disconnect("bob")
+
+
+@pytest.mark.asyncio
+async def test_rooms_outlive_all_but_the_last_socket(make_socket):
+    manager = ConnectionManager()
+    laptop, phone = make_socket(), make_socket()
+    await manager.connect(laptop, "alice")
+    await manager.connect(phone, "alice")
+    await manager.join_room("alice", "general")
+    manager.restore_rooms("alice", ["random"])
+
+    manager.disconnect("alice", laptop)
+    _assert_indexes_agree(manager)
+    assert manager.get_user_rooms("alice") == {"general", "random"}
+    assert manager.active_connections == {"alice": {phone}}
+
+    manager.disconnect("alice", phone)
+    _assert_indexes_agree(manager)
+    assert not manager.active_connections and not manager.room_connections and not manager.user_rooms
+    assert not manager.outbound
+
+
+@pytest.mark.asyncio
+async def test_frames_read_after_a_dropped_connection_leave_no_members(make_socket):
+    manager = ConnectionManager(queue_size=1, queue_policy=DISCONNECT)
+    bob = make_socket()
+    await manager.connect(bob, "bob")
+    await manager.join_room("bob", "general")
+    # bob's queue overflows and the connection is dropped
+    for _ in range(3):
+        await manager.send_personal_message({"type": "ping"}, "bob")
+    assert "bob" not in manager.active_connections
+
+    # A join still buffered in the receive loop, then the loop's own cleanup
+    await manager.join_room("bob", "random")
+    manager.restore_rooms("bob", ["lobby"])
+    manager.disconnect("bob", bob)
+
+    _assert_indexes_agree(manager)
+    assert not manager.room_connections and not manager.user_rooms
+    await asyncio.sleep(0.01)
+    assert bob.close_code == 1013
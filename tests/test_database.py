@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import database
+from app.core.database import MeteredAsyncQueuePool, _pool_args, _pool_stats, to_async_url
+
+
+def test_sync_urls_map_to_async_drivers():
+    assert to_async_url("sqlite:///./chat.db") == "sqlite+aiosqlite:///./chat.db"
+    assert to_async_url("postgresql://u:p@db/chat") == "postgresql+asyncpg://u:p@db/chat"
+    assert to_async_url("postgresql+asyncpg://u:p@db/chat") == "postgresql+asyncpg://u:p@db/chat"
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_follow_checkouts_and_timeouts(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "POOL_SIZE", 1)
+    monkeypatch.setattr(database, "MAX_OVERFLOW", 0)
+    monkeypatch.setattr(database, "POOL_TIMEOUT", 0.05)
+    url = f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}"
+    engine = create_async_engine(url, **_pool_args(url, MeteredAsyncQueuePool))
+    pool = engine.sync_engine.pool
+
+    async with engine.connect():
+        stats = _pool_stats(pool)
+        assert stats["size"] == 1 and stats["checked_out"] == 1 and stats["checkouts"] == 1
+        # The only connection is taken, so the next caller waits out the timeout
+        with pytest.raises(PoolTimeoutError):
+            async with engine.connect():
+                pass
+    async with engine.connect():
+        pass
+
+    stats = _pool_stats(pool)
+    assert stats["checked_out"] == 0 and stats["checkouts"] == 2 and stats["timeouts"] == 1
+    assert stats["max_wait_ms"] >= stats["avg_wait_ms"] >= 0
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_in_memory_sqlite_is_not_pooled():
+    url = "sqlite+aiosqlite://"
+    engine = create_async_engine(url, **_pool_args(url, MeteredAsyncQueuePool))
+
+    assert _pool_stats(engine.sync_engine.pool) == {"pool": "StaticPool"}
+    await engine.dispose()
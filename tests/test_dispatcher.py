@@ -0,0 +1,159 @@
+import asyncio
+import json
+
+import pytest
+
+from app.schemas.websocket import JoinRoom
+from app.websocket import events, middleware
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.events import Dispatcher, FrameContext
+from app.websocket.middleware import FrameMetrics, rate_limit, validate
+from app.websocket.rate_limiter import MemoryBucketBackend, RateLimiter
+
+
+@pytest.fixture
+def connection(make_socket, monkeypatch):
+    """A connected socket, with error replies going through a private manager"""
+    manager = ConnectionManager()
+    monkeypatch.setattr(events, "manager", manager)
+    monkeypatch.setattr(middleware, "manager", manager)
+    return manager, make_socket()
+
+
+def _context(websocket, frame: dict, tasks=None) -> FrameContext:
+    return FrameContext(websocket, "alice", "chat.json", json.dumps(frame), tasks if tasks is not None else set())
+
+
+def _join(room_id: str) -> dict:
+    return {"type": "join_room", "room_id": room_id}
+
+
+@pytest.mark.asyncio
+async def test_inline_handlers_run_in_order_and_concurrent_ones_do_not_block(connection):
+    manager, websocket = connection
+    await manager.connect(websocket, "alice")
+    dispatcher = Dispatcher(max_concurrent=4)
+    dispatcher.use(validate)
+    log = []
+    release = asyncio.Event()
+
+    @dispatcher.on("send_message", concurrent=True)
+    async def slow(websocket, user_id, frame):
+        log.append(f"start {frame.content}")
+        await release.wait()
+        log.append(f"end {frame.content}")
+
+    @dispatcher.on("join_room")
+    async def inline(websocket, user_id, frame):
+        await asyncio.sleep(0.001)
+        log.append(f"join {frame.room_id}")
+
+    tasks = set()
+    await dispatcher.dispatch(_context(websocket, {"type": "send_message", "room_id": "general", "content": "a"}, tasks))
+    for room_id in ("one", "two"):
+        await dispatcher.dispatch(_context(websocket, _join(room_id), tasks))
+
+    # Both joins finished while the concurrent handler is still waiting
+    assert log == ["start a", "join one", "join two"]
+    assert len(tasks) == 1
+    release.set()
+    await asyncio.sleep(0.01)
+    assert log[-1] == "end a" and not tasks
+    manager.disconnect("alice")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_handlers_run_inline_past_the_per_connection_limit(connection):
+    manager, websocket = connection
+    dispatcher = Dispatcher(max_concurrent=2)
+    dispatcher.use(validate)
+    release = asyncio.Event()
+    started = []
+
+    @dispatcher.on("join_room", concurrent=True)
+    async def blocked(websocket, user_id, frame):
+        started.append(frame.room_id)
+        if frame.room_id != "inline":
+            await release.wait()
+        else:
+            raise RuntimeError("handler failed")
+
+    tasks = set()
+    await dispatcher.dispatch(_context(websocket, _join("one"), tasks))
+    await dispatcher.dispatch(_context(websocket, _join("two"), tasks))
+    await asyncio.sleep(0)
+    assert started == ["one", "two"]
+    # The third frame finds the connection's share used and runs inline
+    with pytest.raises(RuntimeError):
+        await dispatcher.dispatch(_context(websocket, _join("inline"), tasks))
+    assert len(tasks) == 2
+
+    # Closing the connection cancels what is still in flight
+    Dispatcher.cancel(tasks)
+    await asyncio.sleep(0.01)
+    assert not tasks and started == ["one", "two", "inline"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_runs_outermost_first_and_can_drop_frames(connection):
+    manager, websocket = connection
+    dispatcher = Dispatcher()
+    order = []
+    handled = []
+
+    async def outer(ctx, call_next):
+        order.append("outer in")
+        await call_next(ctx)
+        order.append("outer out")
+
+    async def gate(ctx, call_next):
+        order.append(f"gate {ctx.kind}")
+        if ctx.room_id == "blocked":
+            return
+        await call_next(ctx)
+
+    for mw in (outer, validate, gate):
+        dispatcher.use(mw)
+
+    @dispatcher.on("join_room")
+    async def join(websocket, user_id, frame):
+        handled.append(frame)
+
+    await dispatcher.dispatch(_context(websocket, _join("general")))
+    await dispatcher.dispatch(_context(websocket, _join("blocked")))
+
+    assert handled == [JoinRoom(room_id="general")]
+    assert order == ["outer in", "gate join_room", "outer out"] * 2
+    with pytest.raises(ValueError):
+        dispatcher.register("join_room", join)
+
+
+@pytest.mark.asyncio
+async def test_invalid_unknown_and_throttled_frames_get_error_replies(connection, monkeypatch):
+    manager, websocket = connection
+    await manager.connect(websocket, "alice")
+    limiter = RateLimiter({"*": [0.001, 3]}, {}, MemoryBucketBackend())
+    monkeypatch.setattr(middleware, "rate_limiter", limiter)
+    metrics = FrameMetrics()
+    dispatcher = Dispatcher()
+    for mw in (metrics, validate, rate_limit):
+        dispatcher.use(mw)
+    dispatcher.register("join_room", lambda websocket, user_id, frame: asyncio.sleep(0))
+
+    await dispatcher.dispatch(_context(websocket, _join("general")))
+    await dispatcher.dispatch(_context(websocket, {"type": "join_room"}))
+    # A valid frame with no handler registered
+    await dispatcher.dispatch(_context(websocket, {"type": "pong"}))
+    await dispatcher.dispatch(_context(websocket, _join("general")))
+    await asyncio.sleep(0.01)
+
+    errors = [(frame["code"], frame["message"]) for frame in websocket.frames if frame["type"] == "error"]
+    assert errors == [
+        ("invalid_frame", "Object missing required field `room_id`"),
+        ("invalid_frame", "Unknown message type: pong"),
+        ("rate_limited", "Rate limit exceeded")
+    ]
+    assert limiter.rejected == 1
+    stats = metrics.get_stats()
+    assert stats["invalid"] == 1 and stats["by_type"]["join_room"]["frames"] == 2
+    manager.disconnect("alice")
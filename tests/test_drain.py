@@ -0,0 +1,32 @@
+import pytest
+
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.drain import DRAINED, SERVICE_RESTART, Drain
+
+
+@pytest.mark.asyncio
+async def test_drain_hands_off_every_socket_in_batches(make_socket):
+    manager = ConnectionManager()
+    sockets = [make_socket() for _ in range(5)]
+    for i, websocket in enumerate(sockets):
+        await manager.connect(websocket, f"user{i}")
+        manager.restore_rooms(f"user{i}", ["general"])
+    # A frame already queued goes out before the socket is closed
+    await manager.broadcast_to_room("general", {"type": "message", "content": "last words"})
+    drain = Drain(manager, window=5, batch_size=2, batch_interval=0, flush_timeout=1)
+
+    await drain.run()
+
+    for websocket in sockets:
+        message, reconnect, close_code = websocket.events
+        assert message["content"] == "last words"
+        assert reconnect["type"] == "reconnect" and 0 <= reconnect["retry_after"] <= 5
+        assert close_code == SERVICE_RESTART
+    assert not manager.outbound and not manager.room_connections
+    assert drain.draining
+    assert drain.get_stats()["state"] == DRAINED
+    assert drain.closed == 5 and drain.get_stats()["remaining"] == 0
+
+    # Shutdown calls it again; the drain runs once
+    await drain.run()
+    assert all(len(websocket.events) == 3 for websocket in sockets)
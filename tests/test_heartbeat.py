@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.heartbeat import IDLE_TIMEOUT, Heartbeat
+
+
+async def _manager(make_socket, users, reap_batch: int = 10):
+    manager = ConnectionManager()
+    manager.heartbeat = Heartbeat(
+        manager._ping, manager._reap, ping_interval=2, idle_timeout=5, tick=1, reap_batch=reap_batch
+    )
+    sockets = {}
+    for user_id in users:
+        sockets[user_id] = make_socket()
+        await manager.connect(sockets[user_id], user_id)
+        manager.restore_rooms(user_id, ["general"])
+    return manager, sockets
+
+
+def _age(manager, websocket, seconds: float):
+    manager.heartbeat.beats[websocket].last_activity -= seconds
+
+
+@pytest.mark.asyncio
+async def test_quiet_sockets_are_pinged_then_reaped(make_socket):
+    manager, sockets = await _manager(make_socket, ["alice", "bob", "carol"])
+    heartbeat = manager.heartbeat
+    for websocket in sockets.values():
+        _age(manager, websocket, 3)
+    heartbeat.touch(sockets["alice"])
+
+    for _ in range(2):
+        heartbeat.advance()
+    await asyncio.sleep(0.01)
+
+    assert heartbeat.pings == 2
+    assert not sockets["alice"].frames
+    assert sockets["carol"].frames[0]["type"] == "ping"
+
+    # Bob answers the ping, Carol stays silent
+    heartbeat.touch(sockets["bob"])
+    _age(manager, sockets["carol"], 3)
+    for _ in range(2):
+        heartbeat.advance()
+    await asyncio.sleep(0.01)
+
+    assert heartbeat.reaped == 1
+    assert sockets["carol"].close_code == IDLE_TIMEOUT
+    assert set(manager.active_connections) == {"alice", "bob"}
+    assert manager.get_room_users("general") == {"alice", "bob"}
+    assert sockets["carol"] not in heartbeat.beats
+    manager.disconnect("alice")
+    manager.disconnect("bob")
+
+
+@pytest.mark.asyncio
+async def test_idle_sockets_are_reaped_in_batches(make_socket):
+    manager, sockets = await _manager(make_socket, [f"user{i}" for i in range(5)], reap_batch=2)
+    heartbeat = manager.heartbeat
+    for websocket in sockets.values():
+        _age(manager, websocket, 10)
+
+    reaped = []
+    for _ in range(5):
+        heartbeat.advance()
+        reaped.append(heartbeat.reaped)
+
+    await asyncio.sleep(0.01)
+
+    assert reaped == [0, 2, 4, 5, 5]
+    assert all(websocket.close_code == IDLE_TIMEOUT for websocket in sockets.values())
+    assert not manager.active_connections and not manager.room_connections
+    assert heartbeat.get_stats() == {"tracked_sockets": 0, "pings": 0, "reaped": 5, "awaiting_reap": 0}
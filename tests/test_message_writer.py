@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+
+import pytest
+
+from app.repositories import MemoryRepository
+from app.services.message_service import StoredMessage
+from app.services.message_writer import MessageWriter
+
+
+class FlakyRepository(MemoryRepository):
+    """Fails every write that includes a poisoned row, and the first ``outages`` writes"""
+
+    def __init__(self, outages: int = 0, poisoned=()):
+        super().__init__()
+        self.outages = outages
+        self.poisoned = set(poisoned)
+        self.writes = []
+
+    async def add_messages(self, rows):
+        self.writes.append([row["seq"] for row in rows])
+        if self.outages:
+            self.outages -= 1
+            raise ConnectionError("database unavailable")
+        if any(row["seq"] in self.poisoned for row in rows):
+            raise ValueError("value too long")
+        await super().add_messages(rows)
+
+
+def _enqueue(writer, seqs, count: int):
+    for _ in range(count):
+        writer.enqueue(StoredMessage(next(seqs), "general", "alice", "hello", "2026-01-01T00:00:00"))
+
+
+async def _stored(repository):
+    return [message["id"] for message in await repository.get_messages_after("general", 0, 100)]
+
+
+@pytest.mark.asyncio
+async def test_full_batches_flush_early_and_the_rest_on_stop():
+    repository = FlakyRepository()
+    writer = MessageWriter(repository, batch_size=3, flush_interval=3600)
+    seqs = itertools.count(1)
+    await writer.start()
+
+    _enqueue(writer, seqs, 2)
+    await asyncio.sleep(0.01)
+    assert repository.writes == []
+
+    # A full batch wakes the writer before the interval is up
+    _enqueue(writer, seqs, 1)
+    await asyncio.sleep(0.01)
+    assert repository.writes == [[1, 2, 3]]
+
+    _enqueue(writer, seqs, 1)
+    await writer.stop()
+    assert repository.writes == [[1, 2, 3], [4]]
+    assert writer.get_stats() == {
+        "backlog": 0, "written": 4, "batches": 2, "failures": 0, "dropped": 0, "dead_lettered": 0
+    }
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_in_order():
+    repository = FlakyRepository(outages=2)
+    writer = MessageWriter(repository, batch_size=10, flush_interval=3600, max_retries=3)
+    seqs = itertools.count(1)
+    _enqueue(writer, seqs, 4)
+    await writer.start()
+
+    for _ in range(3):
+        await writer.flush()
+
+    assert repository.writes == [[1, 2, 3, 4]] * 3
+    assert await _stored(repository) == [1, 2, 3, 4]
+    assert writer.failures == 2 and writer.dead_lettered == 0
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_batch_failing_past_its_retries_dead_letters_only_bad_rows():
+    repository = FlakyRepository(poisoned={3, 6})
+    writer = MessageWriter(repository, batch_size=8, flush_interval=3600, max_retries=2)
+    seqs = itertools.count(1)
+    _enqueue(writer, seqs, 8)
+    await writer.start()
+
+    await writer.flush()
+    assert writer.backlog == 8
+    await writer.flush()
+
+    assert await _stored(repository) == [1, 2, 4, 5, 7, 8]
+    assert [row["seq"] for row in writer.dead_letters] == [3, 6]
+    assert writer.backlog == 0 and writer.written == 6 and writer.dead_lettered == 2
+
+    # The next batch starts with a clean slate
+    _enqueue(writer, seqs, 1)
+    await writer.stop()
+    assert writer.failures == 2 and writer.written == 7
+
+
+@pytest.mark.asyncio
+async def test_backlog_past_its_limit_drops_the_oldest():
+    repository = FlakyRepository()
+    writer = MessageWriter(repository, batch_size=100, flush_interval=3600, max_backlog=5)
+    seqs = itertools.count(1)
+    _enqueue(writer, seqs, 8)
+    await writer.start()
+
+    await writer.stop()
+
+    assert await _stored(repository) == [4, 5, 6, 7, 8]
+    assert writer.dropped == 3
@@ -0,0 +1,157 @@
+from datetime import datetime
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app import main
+from app.repositories import MemoryRepository
+from app.services import message_service
+from app.services.message_service import MessageStore, RoomHistory, StoredMessage, get_message_page, get_missed_messages
+from app.websocket.backplane import InProcessBackplane, InProcessHub
+from app.websocket.connection_manager import ConnectionManager
+
+MESSAGES = 12
+RING = 5
+
+
+@pytest_asyncio.fixture
+async def history(monkeypatch):
+    """Twelve persisted messages in "general", the newest five still in the ring"""
+    store = MessageStore(room_capacity=RING)
+    repository = MemoryRepository()
+    rows = []
+    for seq in range(1, MESSAGES + 1):
+        message = store.append("general", seq, "alice", "hello")
+        rows.append({
+            "seq": message.seq,
+            "room_id": "general",
+            "sender_id": "alice",
+            "content": f"message {message.seq}",
+            "created_at": datetime(2026, 1, 1)
+        })
+    await repository.add_messages(rows)
+    monkeypatch.setattr(message_service, "message_store", store)
+    monkeypatch.setattr(message_service, "repository", repository)
+    return store
+
+
+def _ids(page):
+    return [message["id"] for message in page["messages"]]
+
+
+@pytest.mark.asyncio
+async def test_pages_walk_back_from_the_ring_into_the_repository(history):
+    newest = await get_message_page("general", None, 4)
+    assert _ids(newest) == [9, 10, 11, 12] and newest["next_cursor"] == 9
+
+    # Straddles the ring: 8 is buffered, 5 to 7 come from the repository
+    middle = await get_message_page("general", newest["next_cursor"], 4)
+    assert _ids(middle) == [5, 6, 7, 8] and middle["next_cursor"] == 5
+    assert middle["messages"][0]["content"] == "message 5"
+
+    oldest = await get_message_page("general", middle["next_cursor"], 50)
+    assert _ids(oldest) == [1, 2, 3, 4] and oldest["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_page_of_unknown_or_emptied_room(history):
+    assert await get_message_page("nowhere", None, 10) == {"room_id": "nowhere", "messages": [], "next_cursor": None}
+    assert _ids(await get_message_page("general", 1, 10)) == []
+
+
+@pytest.mark.asyncio
+async def test_messages_route(history):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        page = (await client.get("/api/v1/rooms/general/messages", params={"before": 11, "limit": 3})).json()
+        assert _ids(page) == [8, 9, 10] and page["next_cursor"] == 8
+
+        empty = await client.get("/api/v1/rooms/nowhere/messages")
+        assert empty.status_code == 200 and empty.json()["messages"] == []
+
+        for params in ({"limit": 0}, {"limit": 201}, {"before": 0}):
+            assert (await client.get("/api/v1/rooms/general/messages", params=params)).status_code == 422
+
+
+def _seqs(messages):
+    return [message.seq for message in messages]
+
+
+def _message(seq: int, room_id: str = "general"):
+    return StoredMessage(seq, room_id, "alice", f"message {seq}", "2026-01-01T00:00:00")
+
+
+def test_ring_keeps_the_newest_messages():
+    history = RoomHistory(4)
+    for seq in range(1, 7):
+        history.add(_message(seq))
+
+    assert len(history) == 4 and (history.first_seq, history.last_seq) == (3, 6)
+    assert _seqs(history.last(2)) == [5, 6] and _seqs(history.last(10)) == [3, 4, 5, 6]
+    assert _seqs(history.since(4)) == [5, 6] and _seqs(history.since(0)) == [3, 4, 5, 6]
+    assert history.since(6) == []
+    assert _seqs(history.before(6, 2)) == [4, 5] and _seqs(history.before(4, 10)) == [3]
+    assert history.before(3, 10) == []
+
+
+def test_ring_takes_relayed_messages_out_of_order():
+    history = RoomHistory(4)
+    assert history.add(_message(5)) == 1
+    # The message just before the oldest goes in front; a repeat is ignored
+    assert history.add(_message(4)) == 1
+    assert history.add(_message(5)) == 0
+    assert _seqs(history.last(10)) == [4, 5]
+
+    # A gap restarts the buffer, so it never holds a hole
+    assert history.add(_message(9)) == -1
+    assert _seqs(history.last(10)) == [9]
+    assert history.add(_message(7)) == 0
+
+
+def test_store_buffers_relayed_messages_with_their_encoding():
+    store = MessageStore(room_capacity=4, max_messages=100)
+    sent = store.append("general", 1, "alice", "hello")
+    store.add_relayed("general", sent.encode().decode(), 2)
+
+    relayed = store.last("general", 2)[1]
+    assert (relayed.seq, relayed.sender_id, relayed.content) == (2, "alice", "hello")
+    assert relayed.encode() == sent.encode()
+    assert store.total_messages == 2
+
+
+@pytest.mark.asyncio
+async def test_missed_messages_come_from_the_ring_and_the_repository(history):
+    assert await get_missed_messages("general", 12, 12, 100) == []
+    assert await get_missed_messages("general", 2, 12, 5) is None
+
+    # 8 to 12 are buffered; 6 and 7 only in the repository
+    missed = await get_missed_messages("general", 5, 12, 100)
+    assert [json.loads(message)["id"] for message in missed] == [6, 7, 8, 9, 10, 11, 12]
+
+    # Seen by another worker only: the ring stops at 12, the repository has 13
+    await message_service.repository.add_messages([{
+        "seq": 13, "room_id": "general", "sender_id": "bob", "content": "late", "created_at": datetime(2026, 1, 1)
+    }])
+    missed = await get_missed_messages("general", 11, 13, 100)
+    assert [json.loads(message)["id"] for message in missed] == [12, 13]
+
+
+@pytest.mark.asyncio
+async def test_workers_buffer_messages_relayed_to_them():
+    hub = InProcessHub()
+    sender, receiver = ConnectionManager(backplane=InProcessBackplane(hub)), ConnectionManager(backplane=InProcessBackplane(hub))
+    store = MessageStore()
+    receiver.message_listeners.append(store.add_relayed)
+    await sender.start()
+    await receiver.start()
+    receiver.backplane.subscribe("general")
+
+    message = StoredMessage(7, "general", "alice", "hello", "2026-01-01T00:00:00")
+    await sender.broadcast_payload("general", message.encode(), "message", seq=7)
+    await sender.broadcast_to_room("general", {"type": "typing", "room_id": "general"})
+
+    assert _seqs(store.last("general", 10)) == [7]
+    await sender.stop()
+    await receiver.stop()
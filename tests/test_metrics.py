@@ -0,0 +1,38 @@
+from app.core.metrics import Registry
+
+
+def test_exposition_format():
+    registry = Registry()
+    sends = registry.counter("sends", "Frames sent", ["format"])
+    latency = registry.histogram("latency_seconds", "Send latency", buckets=(0.1, 1.0))
+    registry.gauge("rooms", "Open rooms", function=lambda: 3)
+
+    json_sends = sends.labels("chat.json")
+    json_sends.inc()
+    json_sends.inc(2)
+    assert sends.labels("chat.json") is json_sends
+    for value in (0.05, 0.1, 0.5, 5.0):
+        latency.observe(value)
+
+    assert registry.render().splitlines() == [
+        "# HELP sends Frames sent",
+        "# TYPE sends counter",
+        'sends_total{format="chat.json"} 3',
+        "# HELP latency_seconds Send latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 5.65",
+        "latency_seconds_count 4",
+        "# HELP rooms Open rooms",
+        "# TYPE rooms gauge",
+        "rooms 3",
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("errors", "Errors", ["reason"]).labels('bad "frame"\n').inc()
+
+    assert 'errors_total{reason="bad \\"frame\\"\\n"} 1' in registry.render()
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import Base
+from app.repositories import SqlRepository
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _alembic(path, *args):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    subprocess.run([sys.executable, "-m", "alembic", *args], cwd=ROOT, env=env, check=True, capture_output=True)
+
+
+def _schema_drift(path):
+    with create_engine(f"sqlite:///{path}").connect() as connection:
+        context = MigrationContext.configure(connection)
+        return context.get_current_revision(), compare_metadata(context, Base.metadata)
+
+
+def test_migrations_build_the_models_schema(tmp_path):
+    _alembic(tmp_path / "chat.db", "upgrade", "head")
+
+    assert _schema_drift(tmp_path / "chat.db") == ("0005", [])
+
+
+@pytest.mark.asyncio
+async def test_app_created_database_is_stamped(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}")
+    await SqlRepository(engine).start()
+    await engine.dispose()
+
+    _alembic(tmp_path / "chat.db", "upgrade", "head")
+    assert _schema_drift(tmp_path / "chat.db") == ("0005", [])
+
+
+def test_existing_messages_move_to_chat_ids(tmp_path):
+    _alembic(tmp_path / "chat.db", "upgrade", "0000")
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password) VALUES "
+            "(1, 'alice', 'alice@example.com', 'hash'), (2, 'bob', 'bob@example.com', 'hash')"
+        ))
+        connection.execute(text("INSERT INTO rooms (id, name) VALUES (1, 'General'), (2, 'Tech Talk')"))
+        connection.execute(text(
+            "INSERT INTO messages (id, content, sender_id, room_id) VALUES "
+            "(1, 'a', 1, 1), (2, 'b', 2, 2), (3, 'c', 2, 1), (4, 'd', 1, 2)"
+        ))
+
+    _alembic(tmp_path / "chat.db", "upgrade", "head")
+
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT content, sender_id, room_id, seq FROM messages ORDER BY id")).all()
+    assert [tuple(row) for row in rows] == [
+        ("a", "alice", "general", 1),
+        ("b", "bob", "tech_talk", 1),
+        ("c", "bob", "general", 2),
+        ("d", "alice", "tech_talk", 2),
+    ]
+    engine.dispose()
+
+
+def test_colliding_sequence_numbers_are_renumbered(tmp_path):
+    _alembic(tmp_path / "chat.db", "upgrade", "0004")
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO messages (id, content, sender_id, room_id, seq) VALUES "
+            "(1, 'a', 'alice', 'general', 1), (2, 'b', 'bob', 'general', 1), "
+            "(3, 'c', 'alice', 'general', 2), (4, 'd', 'bob', 'random', 1)"
+        ))
+
+    _alembic(tmp_path / "chat.db", "upgrade", "head")
+
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT content, room_id, seq FROM messages ORDER BY id")).all()
+    assert [tuple(row) for row in rows] == [("a", "general", 1), ("b", "general", 3), ("c", "general", 2), ("d", "random", 1)]
+    engine.dispose()
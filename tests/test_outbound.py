@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+
+from app.websocket.codec import Payload, encode
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.outbound import DISCONNECT, DROP_OLDEST, DROP_TYPING, OutboundQueue
+
+
+def _frame(kind: str, n: int = 0) -> Payload:
+    return Payload(encode({"type": kind, "n": n}))
+
+
+def _sent(websocket):
+    return [(frame["type"], frame["n"]) for frame in websocket.frames]
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_the_newest_frames(make_socket):
+    websocket = make_socket()
+    queue = OutboundQueue(websocket, maxsize=3, policy=DROP_OLDEST)
+
+    # Nothing is sent before the writer starts, so the buffer fills up
+    accepted = [queue.put(_frame("message", n), "message") for n in range(5)]
+    queue.start()
+    await asyncio.sleep(0.01)
+
+    assert all(accepted)
+    assert _sent(websocket) == [("message", 2), ("message", 3), ("message", 4)]
+    assert queue.dropped == 2 and queue.sent == 3
+    queue.close()
+
+
+@pytest.mark.asyncio
+async def test_drop_typing_gives_up_typing_frames_first(make_socket):
+    websocket = make_socket()
+    queue = OutboundQueue(websocket, maxsize=3, policy=DROP_TYPING)
+    queue.put(_frame("typing_indicator", 0), "typing_indicator")
+    queue.put(_frame("message", 1), "message")
+    queue.put(_frame("message", 2), "message")
+
+    # A queued typing frame makes room for a message
+    assert queue.put(_frame("message", 3), "message")
+    # With none left, an incoming typing frame is the one dropped
+    assert not queue.put(_frame("typing_indicator", 4), "typing_indicator")
+    # and a message pushes out the oldest message
+    assert queue.put(_frame("message", 5), "message")
+    queue.start()
+    await asyncio.sleep(0.01)
+
+    assert _sent(websocket) == [("message", 2), ("message", 3), ("message", 5)]
+    assert queue.dropped == 3
+    queue.close()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_drops_the_socket_when_full(make_socket):
+    websocket = make_socket()
+    failures = []
+    queue = OutboundQueue(websocket, maxsize=2, policy=DISCONNECT, on_failure=lambda: failures.append(True))
+
+    assert queue.put(_frame("message", 0), "message")
+    assert queue.put(_frame("message", 1), "message")
+    assert not queue.put(_frame("message", 2), "message")
+    await asyncio.sleep(0.01)
+
+    assert queue.closed and queue.depth == 0
+    assert failures == [True]
+    assert websocket.close_code == 1013
+    assert not queue.put(_frame("message", 3), "message")
+
+
+@pytest.mark.asyncio
+async def test_fan_out_survives_queues_dropping_their_sockets(make_socket):
+    manager = ConnectionManager(queue_size=1, queue_policy=DISCONNECT)
+    laptop, phone, bob = make_socket(), make_socket(), make_socket()
+    for websocket, user_id in ((laptop, "alice"), (phone, "alice"), (bob, "bob")):
+        await manager.connect(websocket, user_id)
+        manager.restore_rooms(user_id, ["general"])
+
+    # Writers have not run yet, so the second frame overflows every queue
+    for n in range(2):
+        await manager.broadcast_to_room("general", {"type": "message", "n": n})
+    await asyncio.sleep(0.01)
+
+    assert not manager.active_connections and not manager.outbound
+    assert all(websocket.close_code == 1013 for websocket in (laptop, phone, bob))
+
+
+@pytest.mark.asyncio
+async def test_slow_and_broken_sends_end_the_writer(make_socket):
+    class StalledSocket(make_socket):
+        async def send_text(self, data: str):
+            await asyncio.sleep(3600)
+
+    class BrokenSocket(make_socket):
+        async def send_text(self, data: str):
+            raise ConnectionResetError("peer went away")
+
+    failures = []
+    queues = [
+        OutboundQueue(websocket, maxsize=4, send_timeout=0.02, on_failure=lambda: failures.append(True))
+        for websocket in (StalledSocket(), BrokenSocket())
+    ]
+    for queue in queues:
+        queue.start()
+        queue.put(_frame("message"), "message")
+    await asyncio.sleep(0.05)
+
+    assert failures == [True, True]
+    for queue in queues:
+        assert queue.closed and queue._task.done()
+        assert queue.websocket.close_code == 1013
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_the_writer_and_discards_pending_frames(make_socket):
+    class GatedSocket(make_socket):
+        def __init__(self):
+            super().__init__()
+            self.gate = asyncio.Event()
+
+        async def send_text(self, data: str):
+            await self.gate.wait()
+            await super().send_text(data)
+
+    websocket = GatedSocket()
+    queue = OutboundQueue(websocket, maxsize=4)
+    queue.start()
+    for n in range(3):
+        queue.put(_frame("message", n), "message")
+    await asyncio.sleep(0.01)
+    assert queue.pending == 3 and queue.depth == 2
+
+    queue.close()
+    await asyncio.sleep(0)
+    websocket.gate.set()
+    await asyncio.sleep(0.01)
+
+    assert queue._task.cancelled()
+    assert queue.depth == 0 and not websocket.frames
+    assert not queue.put(_frame("message", 3), "message")
+    # Closing the queue is not a failure; the socket is left to its owner
+    assert websocket.close_code is None
+
+
+def test_unknown_policy_is_rejected(make_socket):
+    with pytest.raises(ValueError):
+        OutboundQueue(make_socket(), maxsize=1, policy="drop_everything")
@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.services.online_service import LocalOnlineCounter, RedisOnlineCounter
+from app.websocket.backplane import InProcessBackplane, InProcessHub
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.presence import PresenceTracker
+
+
+async def _connect(manager, websocket, user_id: str):
+    await manager.connect(websocket, user_id)
+    manager.restore_rooms(user_id, ["general"])
+    return websocket
+
+
+def _presence_frames(websocket):
+    return [(frame["online"], frame["offline"]) for frame in websocket.frames if frame["type"] == "presence"]
+
+
+@pytest.mark.asyncio
+async def test_presence_is_debounced_batched_and_persisted_in_bulk(make_socket, counting_repository):
+    repo = counting_repository
+    for user_id in ("alice", "bob", "carol"):
+        await repo.create_user(user_id, f"{user_id}@example.com", "hash")
+    manager = ConnectionManager()
+    tracker = PresenceTracker(manager, repo, tick=3600, debounce=0.05, persist_interval=0, counter=LocalOnlineCounter())
+    tracker.start()
+
+    laptop, phone = await _connect(manager, make_socket(), "alice"), await _connect(manager, make_socket(), "alice")
+    bob = await _connect(manager, make_socket(), "bob")
+    carol = await _connect(manager, make_socket(), "carol")
+    await tracker.flush()
+    await asyncio.sleep(0.01)
+
+    assert _presence_frames(carol) == [(["alice", "bob", "carol"], [])]
+    assert (await repo.get_user_by_username("alice")).is_online
+    assert len(repo.presence_writes) == 1 and len(repo.presence_writes[0]) == 3
+
+    # Closing one of two tabs, or dropping and reconnecting, changes nothing
+    manager.disconnect("alice", laptop)
+    manager.disconnect("bob", bob)
+    await _connect(manager, make_socket(), "bob")
+    await tracker.flush()
+
+    # Going offline waits out the debounce
+    manager.disconnect("alice", phone)
+    await tracker.flush()
+    assert tracker.pending.keys() == {"alice"}
+    await asyncio.sleep(0.06)
+    await tracker.flush()
+    await asyncio.sleep(0.01)
+
+    assert _presence_frames(carol) == [(["alice", "bob", "carol"], []), ([], ["alice"])]
+    assert tracker.diffs == 2
+    alice = await repo.get_user_by_username("alice")
+    assert not alice.is_online and alice.last_seen is not None
+
+    await tracker.stop()
+    assert not (await repo.get_user_by_username("carol")).is_online
+    assert len(repo.presence_writes) == 3
+    assert tracker.get_stats()["persisted"] == 6
+    assert manager.user_listeners == []
+    manager.disconnect("bob")
+    manager.disconnect("carol")
+
+
+def _decrement_script(values):
+    """Python stand-in for RedisOnlineCounter.SCRIPT"""
+    def run(keys, args):
+        count = max(int(values.get(keys[0], 0)) - 1, 0)
+        values[keys[0]] = str(count)
+        return count
+    return run
+
+
+async def _two_workers(repo):
+    hub, counter = InProcessHub(), LocalOnlineCounter()
+    workers = []
+    for _ in range(2):
+        manager = ConnectionManager(backplane=InProcessBackplane(hub))
+        await manager.start()
+        tracker = PresenceTracker(manager, repo, tick=3600, debounce=0, persist_interval=0, counter=counter)
+        tracker.start()
+        workers.append((manager, tracker))
+    return workers
+
+
+@pytest.mark.asyncio
+async def test_user_goes_offline_only_when_its_last_worker_lets_go(make_socket, counting_repository):
+    repo = counting_repository
+    for user_id in ("alice", "carol"):
+        await repo.create_user(user_id, f"{user_id}@example.com", "hash")
+    (first, first_tracker), (second, second_tracker) = await _two_workers(repo)
+
+    carol = await _connect(second, make_socket(), "carol")
+    await second_tracker.flush()
+    await _connect(first, make_socket(), "alice")
+    await _connect(second, make_socket(), "alice")
+    await first_tracker.flush()
+    await second_tracker.flush()
+    await asyncio.sleep(0.01)
+
+    # Alice came online once, from whichever worker counted her first
+    assert _presence_frames(carol) == [(["carol"], []), (["alice"], [])]
+
+    # Her socket on the first worker closes; the second one still holds her
+    first.disconnect("alice")
+    await first_tracker.flush()
+    await asyncio.sleep(0.01)
+    assert _presence_frames(carol) == [(["carol"], []), (["alice"], [])]
+    assert (await repo.get_user_by_username("alice")).is_online
+    assert all(write["alice"][0] for write in repo.presence_writes if "alice" in write)
+
+    second.disconnect("alice")
+    await second_tracker.flush()
+    await asyncio.sleep(0.01)
+    assert _presence_frames(carol)[-1] == ([], ["alice"])
+    assert not (await repo.get_user_by_username("alice")).is_online
+
+    second.disconnect("carol")
+    for manager, tracker in ((first, first_tracker), (second, second_tracker)):
+        await tracker.stop()
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_leaves_users_to_the_other_workers(make_socket, counting_repository):
+    repo = counting_repository
+    await repo.create_user("alice", "alice@example.com", "hash")
+    (draining, draining_tracker), (staying, staying_tracker) = await _two_workers(repo)
+
+    # Alice is drained from one worker and has already reconnected to the other
+    await _connect(draining, make_socket(), "alice")
+    await _connect(staying, make_socket(), "alice")
+    await draining_tracker.flush()
+    await staying_tracker.flush()
+    draining.disconnect("alice")
+    await draining_tracker.stop()
+
+    assert (await repo.get_user_by_username("alice")).is_online
+    assert all(write["alice"][0] for write in repo.presence_writes)
+
+    # The last worker to stop records her as offline
+    await staying_tracker.stop()
+    assert not (await repo.get_user_by_username("alice")).is_online
+    staying.disconnect("alice")
+    await draining.stop()
+    await staying.stop()
+
+
+@pytest.mark.asyncio
+async def test_workers_share_redis_online_counts(redis_stand_in):
+    redis_stand_in.scripts[RedisOnlineCounter.SCRIPT] = _decrement_script(redis_stand_in.values)
+    workers = [RedisOnlineCounter(redis_stand_in.url), RedisOnlineCounter(redis_stand_in.url)]
+
+    assert await workers[0].connected("alice") == 1
+    assert await workers[1].connected("alice") == 2
+    assert await workers[0].disconnected("alice") == 1
+    assert await workers[1].disconnected("alice") == 0
+
+    # Counting out a user nobody counted in never goes below zero
+    assert await workers[0].disconnected("bob") == 0
+    assert await workers[1].connected("bob") == 1
+    for worker in workers:
+        await worker.stop()
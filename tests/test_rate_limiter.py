@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+
+from app.websocket.rate_limiter import MemoryBucketBackend, RateLimiter, RedisBucketBackend
+
+
+def _bucket_script(buckets):
+    """Python stand-in for RedisBucketBackend.SCRIPT"""
+    def run(keys, args):
+        rate, burst = float(args[0]), float(args[1])
+        now = time.monotonic()
+        tokens, ts = buckets.get(keys[0], (burst, now))
+        tokens = min(burst, tokens + (now - ts) * rate)
+        allowed = tokens >= 1
+        buckets[keys[0]] = (tokens - allowed, now)
+        return int(allowed)
+    return run
+
+
+@pytest_asyncio.fixture(params=["memory", "redis"])
+async def backend(request):
+    if request.param == "memory":
+        yield MemoryBucketBackend()
+        return
+    server = request.getfixturevalue("redis_stand_in")
+    server.scripts[RedisBucketBackend.SCRIPT] = _bucket_script({})
+    backend = RedisBucketBackend(server.url, timeout=0.5)
+    yield backend
+    await backend.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_a_burst_then_refills(backend):
+    assert [await backend.acquire("u:alice:*", 50, 3) for _ in range(4)] == [True, True, True, False]
+    # Other keys have buckets of their own
+    assert await backend.acquire("u:bob:*", 50, 3)
+
+    await asyncio.sleep(0.05)
+    assert await backend.acquire("u:alice:*", 50, 3)
+    assert await backend.acquire("u:alice:*", 50, 3)
+    assert not await backend.acquire("u:alice:*", 50, 3)
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_loads_its_script_once(redis_stand_in):
+    redis_stand_in.scripts[RedisBucketBackend.SCRIPT] = _bucket_script({})
+    backend = RedisBucketBackend(redis_stand_in.url, timeout=0.5)
+
+    assert await backend.acquire("u:alice:*", 1, 1)
+    assert not await backend.acquire("u:alice:*", 1, 1)
+    assert list(redis_stand_in.loaded) == [backend.sha]
+    assert backend.failures == 0
+    await backend.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_bucket_fails_open(redis_stand_in):
+    down = RedisBucketBackend("redis://127.0.0.1:1", timeout=0.1)
+    assert all([await down.acquire("u:alice:*", 1, 1) for _ in range(3)])
+    assert down.failures == 3
+
+    # A Redis that stops answering costs at most the timeout per check
+    redis_stand_in.stalled = True
+    stalled = RedisBucketBackend(redis_stand_in.url, timeout=0.1)
+    started = time.monotonic()
+    assert all(await asyncio.gather(*(stalled.acquire(f"u:user{i}:*", 1, 1) for i in range(4))))
+    assert time.monotonic() - started < 0.5
+    assert stalled.failures == 4
+    await stalled.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_limiter_checks_user_and_room_buckets():
+    limiter = RateLimiter(
+        user_rules={"send_message": (0.001, 2), "*": (0.001, 1)},
+        room_rules={"send_message": (0.001, 3)},
+        backend=MemoryBucketBackend()
+    )
+
+    assert await limiter.allow("alice", "send_message", "general")
+    assert await limiter.allow("alice", "send_message", "general")
+    assert not await limiter.allow("alice", "send_message", "general")
+    # The room bucket has one token left for everybody else
+    assert await limiter.allow("bob", "send_message", "general")
+    assert not await limiter.allow("carol", "send_message", "general")
+    # Types without a rule of their own share the "*" bucket
+    assert await limiter.allow("alice", "typing_start")
+    assert not await limiter.allow("alice", "made_up_type")
+    assert limiter.rejected == 3
@@ -0,0 +1,195 @@
+"""Conformance and batch-cost suite every Repository backend must pass"""
+from datetime import datetime, timedelta
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.database import _set_sqlite_pragmas
+from app.repositories import DuplicateError, MemoryRepository, SqlRepository
+
+# More users than fit in one IN list, so membership loads span two chunks
+BULK = 600
+
+
+@pytest_asyncio.fixture(params=["memory", "sql"])
+async def repo(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryRepository()
+        return
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'repo.db'}")
+    event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+    repository = SqlRepository(engine)
+    await repository.start()
+    yield repository
+    await repository.stop()
+    await engine.dispose()
+
+
+def _rows(room_id: str, seqs, started: datetime = datetime(2026, 1, 1)):
+    return [
+        {
+            "seq": seq,
+            "room_id": room_id,
+            "sender_id": "alice",
+            "content": f"message {seq}",
+            "created_at": started + timedelta(seconds=seq)
+        }
+        for seq in seqs
+    ]
+
+
+def _count_statements(repo):
+    """Statements the repository sends to the database, or None for in-memory backends"""
+    if not isinstance(repo, SqlRepository):
+        return None
+    statements = []
+    event.listen(repo.engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_users(repo):
+    alice = await repo.create_user("alice", "alice@example.com", "hash")
+    await repo.create_user("bob", "bob@example.com", "hash")
+
+    assert alice.id and alice.is_active and alice.created_at
+    assert (await repo.get_user(alice.id)).username == "alice"
+    assert (await repo.get_user_by_username("alice")).email == "alice@example.com"
+    assert await repo.get_user_by_username("carol") is None
+    assert await repo.list_usernames() == ["alice", "bob"]
+
+    with pytest.raises(DuplicateError):
+        await repo.create_user("alice", "other@example.com", "hash")
+    with pytest.raises(DuplicateError):
+        await repo.create_user("carol", "bob@example.com", "hash")
+
+
+@pytest.mark.asyncio
+async def test_update_user(repo):
+    alice = await repo.create_user("alice", "alice@example.com", "hash")
+    await repo.create_user("bob", "bob@example.com", "hash")
+    changed = []
+    repo.user_listeners.append(changed.append)
+
+    updated = await repo.update_user(alice.id, username="alicia", is_active=False)
+    assert updated.username == "alicia" and not updated.is_active
+    assert await repo.get_user_by_username("alice") is None
+    assert (await repo.get_user_by_username("alicia")).id == alice.id
+    assert await repo.update_user(999, username="nobody") is None
+    with pytest.raises(DuplicateError):
+        await repo.update_user(alice.id, username="bob")
+    # Listeners hear the name the row was cached under, once per successful write
+    assert changed == ["alice"]
+
+
+@pytest.mark.asyncio
+async def test_update_presence(repo):
+    await repo.create_user("alice", "alice@example.com", "hash")
+    await repo.create_user("bob", "bob@example.com", "hash")
+    seen = datetime(2026, 1, 1, 12)
+    changed = []
+    repo.user_listeners.append(changed.append)
+
+    await repo.update_presence({"alice": (True, seen), "bob": (False, seen), "nobody": (True, seen)})
+    await repo.update_presence({})
+
+    assert {"alice", "bob"} <= set(changed)
+
+    alice = await repo.get_user_by_username("alice")
+    bob = await repo.get_user_by_username("bob")
+    assert alice.is_online and alice.last_seen.replace(tzinfo=None) == seen
+    assert not bob.is_online and bob.last_seen.replace(tzinfo=None) == seen
+
+
+@pytest.mark.asyncio
+async def test_rooms(repo):
+    alice = await repo.create_user("alice", "alice@example.com", "hash")
+    general = await repo.create_room("general", "General", "General chat room")
+    await repo.create_room("secret", "Secret", is_private=True, created_by=alice.id)
+    await repo.create_room("random", "Random")
+
+    assert general.slug == "general" and general.description == "General chat room"
+    assert (await repo.get_room("secret")).created_by == alice.id
+    assert await repo.get_room("missing") is None
+    assert [room.slug for room in await repo.list_public_rooms()] == ["general", "random"]
+    with pytest.raises(DuplicateError):
+        await repo.create_room("general", "General again")
+
+
+@pytest.mark.asyncio
+async def test_memberships(repo):
+    await repo.create_user("alice", "alice@example.com", "hash")
+    await repo.create_user("bob", "bob@example.com", "hash")
+    await repo.create_room("general", "General")
+    await repo.create_room("random", "Random")
+
+    assert await repo.add_member("general", "alice")
+    assert not await repo.add_member("general", "alice")
+    assert not await repo.add_member("general", "nobody")
+    assert not await repo.add_member("missing", "alice")
+    assert await repo.add_member("random", "alice")
+    assert await repo.add_member("general", "bob")
+
+    assert await repo.get_members("general") == {"alice", "bob"}
+    assert await repo.load_memberships(["alice", "bob", "nobody"]) == {
+        "alice": {"general", "random"},
+        "bob": {"general"}
+    }
+
+    assert await repo.remove_member("general", "alice")
+    assert not await repo.remove_member("general", "alice")
+    assert await repo.get_members("general") == {"bob"}
+    assert await repo.load_memberships(["alice"]) == {"alice": {"random"}}
+
+
+@pytest.mark.asyncio
+async def test_messages(repo):
+    await repo.add_messages(_rows("general", range(1, 11)) + _rows("random", range(1, 4)))
+
+    page = await repo.get_messages_before("general", None, 3)
+    assert [m["id"] for m in page] == [8, 9, 10]
+    assert page[-1] == {
+        "id": 10,
+        "type": "message",
+        "content": "message 10",
+        "sender_id": "alice",
+        "room_id": "general",
+        "timestamp": "2026-01-01T00:00:10"
+    }
+    assert [m["id"] for m in await repo.get_messages_before("general", 3, 5)] == [1, 2]
+    assert [m["id"] for m in await repo.get_messages_after("general", 7, 2)] == [8, 9]
+    assert await repo.get_messages_after("general", 10, 5) == []
+    assert await repo.get_messages_before("missing", None, 5) == []
+
+    last = await repo.get_last_messages(["general", "random", "missing"])
+    assert {room: m["id"] for room, m in last.items()} == {"general": 10, "random": 3}
+    assert await repo.get_last_seqs() == {"general": 10, "random": 3}
+
+
+@pytest.mark.asyncio
+async def test_batch_operations_cost_one_statement_per_chunk(repo):
+    usernames = [f"user{i}" for i in range(BULK)]
+    rooms = [f"room{i}" for i in range(20)]
+    for room in rooms:
+        await repo.create_room(room, room)
+    for i, username in enumerate(usernames):
+        await repo.create_user(username, f"{username}@example.com", "hash")
+        await repo.add_member(rooms[i % len(rooms)], username)
+
+    statements = _count_statements(repo)
+    started = time.perf_counter()
+    await repo.add_messages([row for room in rooms for row in _rows(room, range(1, 51))])
+    memberships = await repo.load_memberships(usernames)
+    last = await repo.get_last_messages(rooms)
+    elapsed = time.perf_counter() - started
+
+    assert len(memberships) == BULK and memberships["user21"] == {"room1"}
+    assert all(message["id"] == 50 for message in last.values()) and len(last) == len(rooms)
+    # 1,000 messages, 600 users and 20 rooms, each a constant number of round trips
+    assert elapsed < 2.0
+    if statements is not None:
+        assert len(statements) == 1 + 2 + 1
@@ -0,0 +1,113 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+import pytest_asyncio
+
+from app.repositories import MemoryRepository
+from app.schemas.websocket import MAX_RESUME_ROOMS, Resume
+from app.services import message_service
+from app.services.message_service import MessageStore
+from app.services.room_service import MembershipWriter
+from app.services.sequence_service import LocalSequences
+from app.websocket import codec
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.handlers import room_handler
+
+MESSAGES = 30
+
+
+@pytest_asyncio.fixture
+async def chat(monkeypatch):
+    """Thirty messages in "general", the newest ten in the ring, all of them persisted"""
+    manager, store, sequences, repository = ConnectionManager(), MessageStore(room_capacity=10), LocalSequences(), MemoryRepository()
+    for seq in range(1, MESSAGES + 1):
+        store.append("general", seq, "alice", f"message {seq}")
+    await repository.add_messages([
+        {"seq": seq, "room_id": "general", "sender_id": "alice", "content": f"message {seq}", "created_at": datetime(2026, 1, 1)}
+        for seq in range(1, MESSAGES + 1)
+    ])
+    await sequences.restore({"general": MESSAGES})
+    await repository.create_user("bob", "bob@example.com", "hash")
+    for room_id in ("general", "random"):
+        await repository.create_room(room_id, room_id.title())
+    for module in (room_handler, message_service):
+        monkeypatch.setattr(module, "message_store", store)
+    monkeypatch.setattr(room_handler, "manager", manager)
+    monkeypatch.setattr(room_handler, "sequences", sequences)
+    monkeypatch.setattr(room_handler, "membership_writer", MembershipWriter(repository, flush_interval=3600))
+    monkeypatch.setattr(message_service, "repository", repository)
+    monkeypatch.setattr(room_handler.settings, "resume_max_gap", 25)
+    return manager
+
+
+async def _resume(manager, websocket, user_id: str, rooms: dict) -> dict:
+    await room_handler.handle_resume(websocket, user_id, Resume(rooms=rooms))
+    await asyncio.sleep(0.01)
+    return {room["room_id"]: room for room in websocket.frames[-1]["rooms"]}
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_only_missed_messages(chat, make_socket):
+    manager = chat
+    websocket, watcher = make_socket(), make_socket()
+    await manager.connect(websocket, "bob")
+    await manager.connect(watcher, "carol")
+    manager.restore_rooms("carol", ["general", "random"])
+
+    rooms = await _resume(manager, websocket, "bob", {"general": 12, "random": None})
+
+    general = rooms["general"]
+    assert [message["id"] for message in general["messages"]] == list(range(13, MESSAGES + 1))
+    assert general["last_seq"] == MESSAGES and not general["gap_too_large"]
+    assert rooms["random"] == {"room_id": "random", "last_seq": 0, "gap_too_large": False, "messages": []}
+    assert manager.get_user_rooms("bob") == {"general", "random"}
+    assert [frame["type"] for frame in watcher.frames] == ["user_joined", "user_joined"]
+    # Remembered for the next connect, like rooms joined one at a time
+    writer = room_handler.membership_writer
+    await writer.flush()
+    assert await writer.repository.load_memberships(["bob"]) == {"bob": {"general", "random"}}
+    manager.disconnect("bob")
+    manager.disconnect("carol")
+
+
+@pytest.mark.asyncio
+async def test_resume_too_far_behind_asks_for_a_refetch(chat, make_socket):
+    manager = chat
+    websocket = make_socket()
+    await manager.connect(websocket, "bob")
+
+    rooms = await _resume(manager, websocket, "bob", {"general": 2})
+
+    assert rooms["general"]["gap_too_large"] and rooms["general"]["messages"] == []
+    assert rooms["general"]["last_seq"] == MESSAGES
+    manager.disconnect("bob")
+
+
+@pytest.mark.asyncio
+async def test_resume_does_not_announce_restored_rooms(chat, make_socket):
+    manager = chat
+    websocket, watcher = make_socket(), make_socket()
+    await manager.connect(watcher, "carol")
+    manager.restore_rooms("carol", ["general"])
+    await manager.connect(websocket, "bob")
+    manager.restore_rooms("bob", ["general"])
+
+    rooms = await _resume(manager, websocket, "bob", {"general": MESSAGES - 1})
+
+    assert [message["id"] for message in rooms["general"]["messages"]] == [MESSAGES]
+    assert watcher.frames == []
+    # Restored rooms are already stored
+    assert not room_handler.membership_writer.pending
+    manager.disconnect("bob")
+    manager.disconnect("carol")
+
+
+def test_resume_frame_is_capped():
+    rooms = {f"room{i}": None for i in range(MAX_RESUME_ROOMS + 1)}
+    with pytest.raises(codec.FrameError):
+        codec.decode(json.dumps({"type": "resume", "rooms": rooms}))
+    with pytest.raises(codec.FrameError):
+        codec.decode(json.dumps({"type": "resume", "rooms": {"": 1}}))
+    assert len(codec.decode(json.dumps({"type": "resume", "rooms": dict(list(rooms.items())[1:])})).rooms) == MAX_RESUME_ROOMS
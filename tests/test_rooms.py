@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.repositories import MemoryRepository
+from app.services.room_service import MembershipLoader, MembershipWriter
+
+USERS = 200
+
+
+async def _populate(repo: MemoryRepository):
+    await repo.create_room("general", "General")
+    await repo.create_room("random", "Random")
+    for i in range(USERS):
+        await repo.create_user(f"user{i}", f"user{i}@example.com", "hash")
+        await repo.add_member("general", f"user{i}")
+        if i % 2:
+            await repo.add_member("random", f"user{i}")
+
+
+@pytest.mark.asyncio
+async def test_reconnect_storm_shares_one_membership_query(counting_repository):
+    repo = counting_repository
+    await _populate(repo)
+    loader = MembershipLoader(repo, window=0.01)
+
+    # Two sockets for user0, as with a second tab
+    rooms = await asyncio.gather(loader.load("user0"), *(loader.load(f"user{i}") for i in range(USERS)))
+
+    assert len(repo.loads) == 1 and len(repo.loads[0]) == USERS
+    assert rooms[0] == rooms[1] == {"general"}
+    assert rooms[2] == {"general", "random"}
+    assert loader.get_stats() == {"batches": 1, "users": USERS, "failures": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_load_restores_no_rooms():
+    class BrokenRepository(MemoryRepository):
+        async def load_memberships(self, user_ids):
+            raise ConnectionError("database unavailable")
+
+    loader = MembershipLoader(BrokenRepository(), window=0)
+
+    assert await loader.load("user0") == set()
+    assert loader.failures == 1
+
+
+@pytest.mark.asyncio
+async def test_membership_changes_are_written_behind_and_coalesced():
+    repo = MemoryRepository()
+    await _populate(repo)
+    writer = MembershipWriter(repo, flush_interval=3600)
+    writer.start()
+
+    writer.add("random", "user0")
+    writer.add("random", "user2")
+    writer.remove("general", "user1")
+    # Joined and left again before the flush: only the leave is written
+    writer.remove("random", "user2")
+
+    assert await repo.load_memberships(["user0"]) == {"user0": {"general"}}
+    await writer.stop()
+
+    memberships = await repo.load_memberships(["user0", "user1", "user2"])
+    assert memberships["user0"] == {"general", "random"}
+    assert memberships["user1"] == {"random"}
+    assert memberships["user2"] == {"general"}
+    assert writer.get_stats() == {"pending": 0, "written": 3, "failures": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_membership_write_is_retried_unless_superseded():
+    class FlakyRepository(MemoryRepository):
+        failing = False
+
+        async def add_member(self, room_id, user_id):
+            if self.failing:
+                raise ConnectionError("database unavailable")
+            return await super().add_member(room_id, user_id)
+
+    repo = FlakyRepository()
+    await _populate(repo)
+    repo.failing = True
+    writer = MembershipWriter(repo, flush_interval=3600)
+
+    writer.add("random", "user0")
+    writer.add("random", "user2")
+    await writer.flush()
+    assert writer.failures == 2 and set(writer.pending) == {("random", "user0"), ("random", "user2")}
+
+    # Left again while the database was down: the failed join is dropped
+    writer.remove("random", "user2")
+    repo.failing = False
+    await writer.flush()
+
+    memberships = await repo.load_memberships(["user0", "user2"])
+    assert memberships["user0"] == {"general", "random"}
+    assert memberships["user2"] == {"general"}
+    assert writer.get_stats() == {"pending": 0, "written": 2, "failures": 2}
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app.services.sequence_service import LocalSequences, RedisSequences
+
+
+@pytest.mark.asyncio
+async def test_local_sequences_continue_after_restore():
+    sequences = LocalSequences()
+    await sequences.restore({"general": 41})
+
+    assert [await sequences.next("general") for _ in range(2)] == [42, 43]
+    assert await sequences.next("random") == 1
+    assert await sequences.current("general") == 43 and await sequences.current("nowhere") == 0
+
+    # Restoring never moves a counter back
+    await sequences.restore({"general": 10})
+    assert await sequences.next("general") == 44
+
+
+@pytest.mark.asyncio
+async def test_workers_share_redis_sequences(redis_stand_in):
+    workers = [RedisSequences(redis_stand_in.url), RedisSequences(redis_stand_in.url)]
+    await workers[0].restore({"general": 41})
+
+    seqs = await asyncio.gather(*(workers[i % 2].next("general") for i in range(20)))
+
+    assert sorted(seqs) == list(range(42, 62))
+    assert await workers[1].current("general") == 61
+
+    # A restarting worker does not rewind the shared counter
+    await workers[1].restore({"general": 50, "random": 3})
+    assert await workers[1].next("general") == 62
+    assert await workers[0].next("random") == 4
+    for worker in workers:
+        await worker.stop()
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from app.websocket.backplane import InProcessBackplane, InProcessHub
+from app.websocket.connection_manager import ConnectionManager
+from app.websocket.handlers.typing_handler import TypingCoalescer
+
+
+async def _room(make_socket, users, manager=None):
+    manager = manager or ConnectionManager()
+    sockets = {}
+    for user_id in users:
+        sockets[user_id] = make_socket()
+        await manager.connect(sockets[user_id], user_id)
+        manager.restore_rooms(user_id, ["general"])
+    return manager, sockets
+
+
+def _indicators(websocket):
+    return [frame["user_ids"] for frame in websocket.frames if frame["type"] == "typing_indicator"]
+
+
+@pytest.mark.asyncio
+async def test_keystrokes_coalesce_into_one_frame_per_change(make_socket):
+    manager, sockets = await _room(make_socket, ["alice", "bob", "carol"])
+    coalescer = TypingCoalescer(manager, tick=3600, debounce=0.05, timeout=60)
+
+    for _ in range(10):
+        coalescer.update("general", "alice", True)
+        coalescer.update("general", "bob", True)
+    await coalescer.flush()
+    # Still typing within the debounce: no change, no frame
+    coalescer.update("general", "alice", True)
+    await coalescer.flush()
+    await asyncio.sleep(0.01)
+
+    assert _indicators(sockets["carol"]) == [["alice", "bob"]]
+
+    coalescer.update("general", "bob", False)
+    coalescer.update("general", "bob", False)
+    await coalescer.flush()
+    await asyncio.sleep(0.01)
+
+    assert _indicators(sockets["carol"]) == [["alice", "bob"], ["alice"]]
+    for user_id in sockets:
+        manager.disconnect(user_id)
+
+
+@pytest.mark.asyncio
+async def test_refreshes_extend_typing_until_it_times_out(make_socket):
+    manager, sockets = await _room(make_socket, ["alice", "bob"])
+    coalescer = TypingCoalescer(manager, tick=3600, debounce=0.01, timeout=0.1)
+
+    coalescer.update("general", "alice", True)
+    await coalescer.flush()
+    await asyncio.sleep(0.06)
+    # Past the debounce, the refresh pushes the expiry back without a frame
+    coalescer.update("general", "alice", True)
+    await asyncio.sleep(0.06)
+    await coalescer.flush()
+    assert "alice" in coalescer.typing["general"]
+
+    await asyncio.sleep(0.06)
+    await coalescer.flush()
+    await asyncio.sleep(0.01)
+
+    assert _indicators(sockets["bob"]) == [["alice"], []]
+    assert not coalescer.typing and not coalescer.dirty_rooms
+    for user_id in sockets:
+        manager.disconnect(user_id)
+
+
+@pytest.mark.asyncio
+async def test_background_task_flushes_every_tick_until_stopped(make_socket):
+    manager, sockets = await _room(make_socket, ["alice", "bob"])
+    coalescer = TypingCoalescer(manager, tick=0.01, debounce=1, timeout=60)
+    coalescer.start()
+
+    coalescer.update("general", "alice", True)
+    await asyncio.sleep(0.05)
+    await coalescer.stop()
+    coalescer.update("general", "alice", False)
+    await asyncio.sleep(0.03)
+
+    assert _indicators(sockets["bob"]) == [["alice"]]
+    assert coalescer._task is None and coalescer.dirty_rooms == {"general"}
+    for user_id in sockets:
+        manager.disconnect(user_id)
+
+
+@pytest.mark.asyncio
+async def test_workers_share_typing_state_and_send_it_to_local_members(make_socket):
+    hub = InProcessHub()
+    first, second = ConnectionManager(backplane=InProcessBackplane(hub)), ConnectionManager(backplane=InProcessBackplane(hub))
+    await first.start()
+    await second.start()
+    _, here = await _room(make_socket, ["alice", "carol"], first)
+    _, there = await _room(make_socket, ["bob", "dave"], second)
+    coalescers = [TypingCoalescer(manager, tick=3600, debounce=0.05, timeout=60) for manager in (first, second)]
+    for coalescer in coalescers:
+        coalescer.start()
+
+    await coalescers[0].submit("general", "alice", True)
+    await coalescers[1].submit("general", "bob", True)
+    # Debounced here, so not relayed either
+    await coalescers[0].submit("general", "alice", True)
+    for coalescer in coalescers:
+        await coalescer.flush()
+    await coalescers[0].submit("general", "alice", False)
+    for coalescer in coalescers:
+        await coalescer.flush()
+    await asyncio.sleep(0.01)
+
+    # Each watcher gets one frame per change, from its own worker only
+    for watcher in (here["carol"], there["dave"]):
+        assert _indicators(watcher) == [["alice", "bob"], ["bob"]]
+    for coalescer in coalescers:
+        await coalescer.stop()
+        assert not coalescer.connections.event_listeners
+    for manager, sockets in ((first, here), (second, there)):
+        for user_id in sockets:
+            manager.disconnect(user_id)
+        await manager.stop()
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app import main
+from app.core.security import create_access_token
+from app.services import user_service
+from app.services.user_service import UserCache
+
+
+@pytest_asyncio.fixture
+async def users(counting_repository, monkeypatch):
+    repo = counting_repository
+    cache = UserCache(max_size=100, ttl=60)
+    repo.user_listeners.append(cache.invalidate_username)
+    monkeypatch.setattr(user_service, "repository", repo)
+    monkeypatch.setattr(user_service, "user_cache", cache)
+    await repo.create_user("alice", "alice@example.com", "hash")
+    return repo, cache
+
+
+@pytest.mark.asyncio
+async def test_repeat_lookups_hit_the_cache(users):
+    repo, cache = users
+
+    first = await user_service.get_user_by_username("alice")
+    second = await user_service.get_user_by_username("alice")
+
+    assert first is second and first.username == "alice"
+    assert await user_service.get_user_by_username("nobody") is None
+    # Unknown users are looked up again every time
+    assert await user_service.get_user_by_username("nobody") is None
+    assert cache.get_stats() == {"size": 1, "hits": 1, "misses": 3}
+
+
+@pytest.mark.asyncio
+async def test_repository_writes_invalidate_cached_users(users):
+    repo, cache = users
+    alice = await user_service.get_user_by_username("alice")
+    assert not alice.is_online
+
+    # Presence goes straight to the repository, never through the service
+    await repo.update_presence({"alice": (True, datetime.utcnow())})
+    assert cache.get_stats()["size"] == 0
+    assert (await user_service.get_user_by_username("alice")).is_online
+
+    await repo.update_user(alice.id, username="alicia")
+    assert await user_service.get_user_by_username("alice") is None
+    assert (await user_service.get_user_by_username("alicia")).id == alice.id
+
+
+@pytest.mark.asyncio
+async def test_cached_users_expire_after_the_ttl(users):
+    repo, cache = users
+    cache.ttl = 0.01
+    await user_service.get_user_by_username("alice")
+    await user_service.get_user_by_username("alice")
+    await asyncio.sleep(0.02)
+
+    assert cache.get_by_username("alice") is None
+    await user_service.get_user_by_username("alice")
+    assert cache.get_stats() == {"size": 1, "hits": 1, "misses": 2}
+
+
+@pytest.mark.asyncio
+async def test_profile_changes_take_effect_on_the_next_request(users):
+    repo, cache = users
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': 'alice'})}"}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        me = await client.get("/api/v1/users/me", headers=headers)
+        assert me.status_code == 200 and me.json()["email"] == "alice@example.com"
+
+        changed = await client.patch("/api/v1/users/me", headers=headers, json={"email": "alice@example.org"})
+        assert changed.status_code == 200
+        assert (await client.get("/api/v1/users/me", headers=headers)).json()["email"] == "alice@example.org"
+
+        assert (await client.delete("/api/v1/users/me", headers=headers)).status_code == 200
+        rejected = await client.get("/api/v1/users/me", headers=headers)
+        assert rejected.status_code == 401 and rejected.json()["detail"] == "Inactive user"
@@ -0,0 +1,82 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+from websockets.sync.client import connect
+
+from app.core.security import create_access_token
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_worker(port: int, redis_url: str, database_url: str) -> subprocess.Popen:
+    env = dict(os.environ, BACKPLANE="redis", REDIS_URL=redis_url, DATABASE_URL=database_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    pytest.fail(f"worker on port {port} did not start")
+
+
+def _receive_until(ws, message_type: str) -> dict:
+    while True:
+        frame = json.loads(ws.recv(timeout=5))
+        if frame["type"] == message_type:
+            return frame
+
+
+@pytest.fixture
+def two_workers(redis_stand_in, tmp_path):
+    ports = [_free_port(), _free_port()]
+    database_url = f"sqlite:///{tmp_path / 'chat.db'}"
+    workers = [_start_worker(port, redis_stand_in.url, database_url) for port in ports]
+    yield ports
+    for worker in workers:
+        worker.terminate()
+        worker.wait()
+
+
+def _ws_url(port: int, user_id: str) -> str:
+    return f"ws://127.0.0.1:{port}/ws/{user_id}?token={create_access_token({'sub': user_id})}"
+
+
+def test_message_sent_on_one_worker_reaches_another(two_workers):
+    port_a, port_b = two_workers
+    with connect(_ws_url(port_a, "alice")) as alice, \
+            connect(_ws_url(port_b, "bob")) as bob:
+        for ws in (alice, bob):
+            _receive_until(ws, "connected")
+            ws.send(json.dumps({"type": "join_room", "room_id": "general"}))
+            _receive_until(ws, "room_joined")
+
+        alice.send(json.dumps({"type": "send_message", "room_id": "general", "content": "hello"}))
+
+        message = _receive_until(bob, "message")
+        assert message["content"] == "hello"
+        assert message["sender_id"] == "alice"
+        assert _receive_until(alice, "message") == message
+
+        # Numbered from one shared counter, whichever worker takes the message
+        bob.send(json.dumps({"type": "send_message", "room_id": "general", "content": "hi"}))
+        reply = _receive_until(alice, "message")
+        assert reply["id"] == message["id"] + 1
+        assert _receive_until(bob, "message") == reply